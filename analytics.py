@@ -0,0 +1,512 @@
+"""Sales analytics for the admin area, served from precomputed rollups.
+
+sales_daily, sales_hourly and sales_items are maintained incrementally: a
+refresh folds in the orders past the 'sales' watermark in rollup_state, in
+the same transaction that advances it, so each order is counted exactly once
+however many workers refresh. Cancelled orders count only in the
+cancelled_orders/cancelled_revenue columns, and apply_status_changes() moves
+an already folded order across when its status changes to or from
+'cancelled'. The analytics page reads only these small tables, never
+orders/order_items.
+
+Heavier breakdowns (weekday x hour demand, basket size percentiles, status
+and payment mix, items bought together) are computed by the same background
+job from a columnar extract of the last ANALYTICS_WINDOW_DAYS with NumPy, and
+stored as one JSON snapshot that pages read until the next refresh. At most
+one worker recomputes it per interval.
+
+    ANALYTICS_REFRESH_SECONDS=300   seconds between refreshes (one job thread per worker)
+    ANALYTICS_WINDOW_DAYS=90        days the breakdowns cover
+    ANALYTICS_SETTLE_SECONDS=60     orders younger than this wait for the next refresh
+
+    python analytics.py [--rollups-only]    run one refresh, e.g. from cron
+
+Orders are folded in by ascending order ID once their row was inserted
+(orders.created_at) at least SETTLE ago, so an order whose transaction
+committed a lower ID late is not skipped over. NumPy is optional: without it
+the page shows the rollups only.
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from array import array
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from init_database import get_db_connection, get_dedicated_connection
+from metrics import register_callback, ANALYTICS_JOB_SECONDS
+from order_queries import ORDER_STATUSES, PAYMENT_METHODS
+
+try:
+    import numpy as np
+except ImportError:  # optional: rollups only without it
+    np = None
+
+logger = logging.getLogger(__name__)
+
+REFRESH_SECONDS = float(os.getenv('ANALYTICS_REFRESH_SECONDS', '300'))
+WINDOW_DAYS = int(os.getenv('ANALYTICS_WINDOW_DAYS', '90'))
+SETTLE = timedelta(seconds=float(os.getenv('ANALYTICS_SETTLE_SECONDS', '60')))
+
+RANGES = (7, 30, 90)
+ROLLUP_BATCH = 2000
+EXTRACT_CHUNK_ROWS = 5000
+# Orders per slice of the order x item matrix when counting pairs
+PAIR_CHUNK_ORDERS = 50000
+DAILY_VALUES = ('orders', 'items', 'revenue', 'delivery_fees', 'cancelled_orders', 'cancelled_revenue')
+HOURLY_VALUES = ('orders', 'revenue', 'cancelled_orders', 'cancelled_revenue')
+TOP_ITEMS = 10
+TOP_PAIRS = 10
+BASKET_BOUNDS = (10, 20, 30, 50, 75, 100, 150)
+MAX_UNITS_BUCKET = 10
+WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+
+# --- rollups ----------------------------------------------------------------
+
+def _ensure_state(cursor, name: str) -> None:
+    cursor.execute("INSERT IGNORE INTO rollup_state (name) VALUES (%s)", (name,))
+
+def _add(cursor, table: str, keys: Tuple[str, ...], values: Tuple[str, ...],
+         rows: Dict[tuple, List[Any]]) -> None:
+    """Add each row's values onto the table's row for its key, creating missing keys"""
+    # UPDATE-then-INSERT rather than ON DUPLICATE KEY UPDATE, which the SQLite stand-in lacks;
+    # the caller holds the watermark lock, so no other refresh inserts the same keys meanwhile
+    update = (f"UPDATE {table} SET {', '.join(f'{c} = {c} + %s' for c in values)} "
+              f"WHERE {' AND '.join(f'{c} = %s' for c in keys)}")
+    insert = (f"INSERT INTO {table} ({', '.join(keys + values)}) "
+              f"VALUES ({', '.join(['%s'] * (len(keys) + len(values)))})")
+    for key, amounts in rows.items():
+        cursor.execute(update, (*amounts, *key))
+        if cursor.rowcount == 0:
+            cursor.execute(insert, (*key, *amounts))
+
+def _aggregate(orders: List[Dict[str, Any]], items: List[Dict[str, Any]], sign: int = 1):
+    """The orders' contributions to the rollups, by their 'status'; sign=-1 takes them back out"""
+    daily: Dict[tuple, List[Any]] = {}
+    hourly: Dict[tuple, List[Any]] = {}
+    per_item: Dict[tuple, List[Any]] = {}
+    counted = {}
+    for order in orders:
+        placed = order['order_date']
+        total = sign * order['total_price']
+        day = daily.setdefault((placed.date(),), [0] * len(DAILY_VALUES))
+        hour = hourly.setdefault((placed.date(), placed.hour), [0] * len(HOURLY_VALUES))
+        if order['status'] == 'cancelled':
+            day[4] += sign
+            day[5] += total
+            hour[2] += sign
+            hour[3] += total
+            continue
+        counted[order['order_id']] = placed.date()
+        day[0] += sign
+        day[2] += total
+        day[3] += sign * (order['delivery_fee'] or 0)
+        hour[0] += sign
+        hour[1] += total
+    for item in items:
+        day = counted.get(item['order_id'])
+        if day is None:
+            continue
+        daily[(day,)][1] += sign * item['quantity']
+        entry = per_item.setdefault((day, item['item_name']), [0, 0])
+        entry[0] += sign * item['quantity']
+        entry[1] += sign * item['item_total']
+    return daily, hourly, per_item
+
+def _write(cursor, daily, hourly, per_item) -> None:
+    _add(cursor, 'sales_daily', ('day',), DAILY_VALUES, daily)
+    _add(cursor, 'sales_hourly', ('day', 'hour'), HOURLY_VALUES, hourly)
+    _add(cursor, 'sales_items', ('day', 'item_name'), ('quantity', 'revenue'), per_item)
+
+def _lock_watermark(cursor) -> int:
+    # Serializes refreshes and status changes across workers; the loser re-reads the advanced watermark
+    cursor.execute("SELECT last_order_id FROM rollup_state WHERE name = 'sales' FOR UPDATE")
+    row = cursor.fetchone()
+    return row['last_order_id'] if row else 0
+
+def _rollup_batch(batch_size: int) -> int:
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        _ensure_state(cursor, 'sales')
+        conn.start_transaction()
+        after = _lock_watermark(cursor)
+        cursor.execute("""
+            SELECT order_id, order_date, total_price, delivery_fee, status, created_at
+            FROM orders
+            WHERE order_id > %s
+            ORDER BY order_id
+            LIMIT %s
+        """, (after, batch_size))
+        orders = cursor.fetchall()
+        # Stop at the first order inserted too recently: an ID below it may still be committing
+        settled_before = datetime.now() - SETTLE
+        for n, order in enumerate(orders):
+            if order['created_at'] > settled_before:
+                orders = orders[:n]
+                break
+        if not orders:
+            conn.rollback()
+            return 0
+
+        last_id = orders[-1]['order_id']
+        cursor.execute("""
+            SELECT order_id, item_name, quantity, item_total
+            FROM order_items
+            WHERE order_id > %s AND order_id <= %s
+        """, (after, last_id))
+        _write(cursor, *_aggregate(orders, cursor.fetchall()))
+        cursor.execute("UPDATE rollup_state SET last_order_id = %s, refreshed_at = %s WHERE name = 'sales'",
+                       (last_id, datetime.now()))
+        conn.commit()
+        return len(orders)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+def apply_status_changes(cursor, changes: List[Tuple[int, str, str]]) -> None:
+    """Move folded orders between the sales and cancelled columns for (order_id, old, new) status changes.
+
+    Call it with a dictionary cursor inside the transaction that changes the
+    statuses, so the rollups and the orders cannot disagree.
+    """
+    flips = {order_id: (old, new) for order_id, old, new in changes
+             if (old == 'cancelled') != (new == 'cancelled')}
+    if not flips:
+        return
+    # Orders past the watermark are folded later, with the status they have by then
+    watermark = _lock_watermark(cursor)
+    folded = [order_id for order_id in flips if order_id <= watermark]
+    if not folded:
+        return
+    in_list = f"({', '.join(['%s'] * len(folded))})"
+    cursor.execute(f"""
+        SELECT order_id, order_date, total_price, delivery_fee
+        FROM orders WHERE order_id IN {in_list}
+    """, folded)
+    orders = cursor.fetchall()
+    cursor.execute(f"""
+        SELECT order_id, item_name, quantity, item_total
+        FROM order_items WHERE order_id IN {in_list}
+    """, folded)
+    items = cursor.fetchall()
+    _write(cursor, *_aggregate([{**order, 'status': flips[order['order_id']][0]} for order in orders], items, -1))
+    _write(cursor, *_aggregate([{**order, 'status': flips[order['order_id']][1]} for order in orders], items))
+
+def refresh_rollups(batch_size: int = ROLLUP_BATCH) -> int:
+    """Fold settled orders past the watermark into the rollups; returns how many were added"""
+    total = 0
+    while True:
+        added = _rollup_batch(batch_size)
+        total += added
+        if added < batch_size:
+            return total
+
+
+# --- page reads ---------------------------------------------------------------
+
+def sales_summary(cursor, days: int) -> Dict[str, Any]:
+    """Totals, daily rows, hourly demand and top items of the last `days` days, from the rollups"""
+    since = date.today() - timedelta(days=days - 1)
+    cursor.execute("""
+        SELECT day, orders, items, revenue, delivery_fees, cancelled_orders, cancelled_revenue
+        FROM sales_daily
+        WHERE day >= %s
+        ORDER BY day DESC
+    """, (since,))
+    daily = cursor.fetchall()
+    cursor.execute("""
+        SELECT hour, SUM(orders) AS orders, SUM(revenue) AS revenue
+        FROM sales_hourly
+        WHERE day >= %s
+        GROUP BY hour
+        ORDER BY hour
+    """, (since,))
+    hourly = cursor.fetchall()
+    cursor.execute("""
+        SELECT item_name, SUM(quantity) AS quantity, SUM(revenue) AS revenue
+        FROM sales_items
+        WHERE day >= %s
+        GROUP BY item_name
+        ORDER BY SUM(revenue) DESC
+        LIMIT %s
+    """, (since, TOP_ITEMS))
+    top_items = cursor.fetchall()
+    cursor.execute("SELECT last_order_id, refreshed_at FROM rollup_state WHERE name = 'sales'")
+    state = cursor.fetchone() or {'last_order_id': 0, 'refreshed_at': None}
+
+    orders = sum(row['orders'] for row in daily)
+    revenue = sum(row['revenue'] for row in daily)
+    items = sum(row['items'] for row in daily)
+    cancelled_orders = sum(row['cancelled_orders'] for row in daily)
+    return {
+        'since': since,
+        'daily': daily,
+        'hourly': hourly,
+        'top_items': top_items,
+        'orders': orders,
+        'revenue': revenue,
+        'cancelled_orders': cancelled_orders,
+        'cancelled_revenue': sum(row['cancelled_revenue'] for row in daily),
+        'average_basket': revenue / orders if orders else 0,
+        'items_per_order': items / orders if orders else 0,
+        'busiest_hour': max(hourly, key=lambda row: row['orders'])['hour'] if hourly else None,
+        'rolled_up_to': state['last_order_id'],
+        'rolled_up_at': state['refreshed_at'],
+    }
+
+def read_breakdowns(cursor) -> Optional[Dict[str, Any]]:
+    """The background job's latest breakdowns, or None before the first run"""
+    cursor.execute("SELECT payload FROM rollup_state WHERE name = 'breakdowns'")
+    row = cursor.fetchone()
+    if not row or not row['payload']:
+        return None
+    return json.loads(row['payload'])
+
+
+# --- breakdowns -------------------------------------------------------------
+
+def _extract(since: datetime) -> Dict[str, Any]:
+    """Orders and items placed since `since` as columns (typed arrays), read in chunks"""
+    status_codes = {status: code for code, status in enumerate(ORDER_STATUSES)}
+    payment_codes = {method: code for code, method in enumerate(PAYMENT_METHODS)}
+    orders = {'order_id': array('q'), 'slot': array('h'), 'total': array('d'),
+              'status': array('b'), 'payment': array('b')}
+    items = {'order_id': array('q'), 'item': array('l'), 'quantity': array('l')}
+    item_names: Dict[str, int] = {}
+
+    conn = get_dedicated_connection()
+    try:
+        cursor = conn.cursor(buffered=False)
+        cursor.execute("""
+            SELECT order_id, order_date, total_price, status, payment_method
+            FROM orders
+            WHERE order_date >= %s
+            ORDER BY order_id
+        """, (since,))
+        while True:
+            rows = cursor.fetchmany(EXTRACT_CHUNK_ROWS)
+            if not rows:
+                break
+            for order_id, placed, total, status, payment in rows:
+                orders['order_id'].append(order_id)
+                orders['slot'].append(placed.weekday() * 24 + placed.hour)
+                orders['total'].append(float(total))
+                orders['status'].append(status_codes.get(status, -1))
+                orders['payment'].append(payment_codes.get(payment, -1))
+        cursor.close()
+
+        cursor = conn.cursor(buffered=False)
+        cursor.execute("""
+            SELECT i.order_id, i.item_name, i.quantity
+            FROM order_items i
+            JOIN orders o ON o.order_id = i.order_id
+            WHERE o.order_date >= %s
+        """, (since,))
+        while True:
+            rows = cursor.fetchmany(EXTRACT_CHUNK_ROWS)
+            if not rows:
+                break
+            for order_id, item_name, quantity in rows:
+                items['order_id'].append(order_id)
+                items['item'].append(item_names.setdefault(item_name, len(item_names)))
+                items['quantity'].append(quantity)
+        cursor.close()
+    finally:
+        conn.close()
+
+    columns = {f'order_{name}': np.frombuffer(values, dtype=values.typecode) if values else
+               np.zeros(0, dtype=values.typecode) for name, values in orders.items()}
+    columns.update({f'item_{name}': np.frombuffer(values, dtype=values.typecode) if values else
+                    np.zeros(0, dtype=values.typecode) for name, values in items.items()})
+    columns['item_names'] = sorted(item_names, key=item_names.get)
+    return columns
+
+def _pair_counts(order_index, item_codes, orders: int, item_count: int):
+    """item x item matrix of how many orders contain both, built a slice of orders at a time"""
+    together = np.zeros((item_count, item_count), dtype=np.int64)
+    order_by = np.argsort(order_index, kind='stable')
+    order_index, item_codes = order_index[order_by], item_codes[order_by]
+    for start in range(0, orders, PAIR_CHUNK_ORDERS):
+        lo, hi = np.searchsorted(order_index, [start, start + PAIR_CHUNK_ORDERS])
+        if lo == hi:
+            continue
+        present = np.zeros((min(PAIR_CHUNK_ORDERS, orders - start), item_count), dtype=np.float32)
+        present[order_index[lo:hi] - start, item_codes[lo:hi]] = 1
+        together += (present.T @ present).astype(np.int64)
+    return together
+
+def compute_breakdowns(columns: Dict[str, Any]) -> Dict[str, Any]:
+    """Aggregate an _extract() result with whole-array operations"""
+    order_ids, totals = columns['order_order_id'], columns['order_total']
+    slots, status = columns['order_slot'].astype(np.intp), columns['order_status']
+    orders = len(order_ids)
+
+    demand = np.bincount(slots, minlength=7 * 24).reshape(7, 24)
+    demand_revenue = np.bincount(slots, weights=totals, minlength=7 * 24).reshape(7, 24)
+
+    known = status >= 0
+    status_orders = np.bincount(status[known].astype(np.intp), minlength=len(ORDER_STATUSES))
+    status_revenue = np.bincount(status[known].astype(np.intp), weights=totals[known],
+                                 minlength=len(ORDER_STATUSES))
+    payment = columns['order_payment']
+    paid = payment >= 0
+    payment_orders = np.bincount(payment[paid].astype(np.intp), minlength=len(PAYMENT_METHODS))
+    payment_revenue = np.bincount(payment[paid].astype(np.intp), weights=totals[paid],
+                                  minlength=len(PAYMENT_METHODS))
+
+    # Baskets that stood: cancelled orders would skew sizes and revenue
+    kept = totals[status != ORDER_STATUSES.index('cancelled')]
+    percentiles = np.percentile(kept, [50, 75, 90, 99]) if len(kept) else np.zeros(4)
+    bounds = np.array(BASKET_BOUNDS, dtype=float)
+    basket_counts = np.bincount(np.searchsorted(bounds, kept, side='right'), minlength=len(bounds) + 1)
+    labels = ([f"under {BASKET_BOUNDS[0]}"] +
+              [f"{lo}-{hi}" for lo, hi in zip(BASKET_BOUNDS, BASKET_BOUNDS[1:])] +
+              [f"{BASKET_BOUNDS[-1]}+"])
+
+    # Item rows -> position of their order in the (sorted) order columns
+    item_orders = columns['item_order_id']
+    position = np.searchsorted(order_ids, item_orders)
+    matched = position < orders
+    matched[matched] = order_ids[position[matched]] == item_orders[matched]
+    position = position[matched]
+    item_codes = columns['item_item'][matched].astype(np.intp)
+    quantities = columns['item_quantity'][matched]
+    units = np.bincount(position, weights=quantities, minlength=orders).astype(np.int64)
+    units_hist = np.bincount(np.minimum(units, MAX_UNITS_BUCKET), minlength=MAX_UNITS_BUCKET + 1)
+
+    names = columns['item_names']
+    pairs = []
+    if len(names) > 1 and len(position):
+        together = np.triu(_pair_counts(position, item_codes, orders, len(names)), k=1)
+        flat = together.ravel()
+        for index in np.argsort(flat)[::-1][:TOP_PAIRS]:
+            if flat[index] == 0:
+                break
+            first, second = divmod(int(index), len(names))
+            pairs.append({'items': [names[first], names[second]], 'orders': int(flat[index])})
+
+    return {
+        'computed_at': datetime.now().strftime('%Y-%m-%d %H:%M'),
+        'window_days': WINDOW_DAYS,
+        'orders': orders,
+        'demand': demand.tolist(),
+        'demand_revenue': np.round(demand_revenue, 2).tolist(),
+        'demand_max': int(demand.max()) if orders else 0,
+        'status': [{'status': name, 'orders': int(n), 'revenue': round(float(r), 2)}
+                   for name, n, r in zip(ORDER_STATUSES, status_orders, status_revenue)],
+        'payment': [{'method': name, 'orders': int(n), 'revenue': round(float(r), 2)}
+                    for name, n, r in zip(PAYMENT_METHODS, payment_orders, payment_revenue)],
+        'basket_percentiles': dict(zip(('p50', 'p75', 'p90', 'p99'), np.round(percentiles, 2).tolist())),
+        'basket_histogram': [{'label': label, 'orders': int(n)} for label, n in zip(labels, basket_counts)],
+        'units_histogram': [{'units': f"{n}+" if n == MAX_UNITS_BUCKET else str(n), 'orders': int(count)}
+                            for n, count in enumerate(units_hist)],
+        'pairs': pairs,
+    }
+
+def _claim_breakdowns(max_age: float) -> bool:
+    """True if this worker should recompute the snapshot now (one worker per interval)"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        _ensure_state(cursor, 'breakdowns')
+        now = datetime.now()
+        cursor.execute("""
+            UPDATE rollup_state SET refreshed_at = %s
+            WHERE name = 'breakdowns' AND (refreshed_at IS NULL OR refreshed_at < %s)
+        """, (now, now - timedelta(seconds=max_age)))
+        return cursor.rowcount == 1
+    finally:
+        cursor.close()
+        conn.close()
+
+def refresh_breakdowns() -> Dict[str, Any]:
+    """Extract the window, compute the breakdowns and store them for the page"""
+    payload = compute_breakdowns(_extract(datetime.now() - timedelta(days=WINDOW_DAYS)))
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        _ensure_state(cursor, 'breakdowns')
+        cursor.execute("UPDATE rollup_state SET payload = %s WHERE name = 'breakdowns'", (json.dumps(payload),))
+    finally:
+        cursor.close()
+        conn.close()
+    return payload
+
+
+# --- background job -----------------------------------------------------------
+
+class AnalyticsJob:
+    def __init__(self, interval: float = REFRESH_SECONDS):
+        self.interval = interval
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.failures = 0
+
+    def ensure_started(self) -> None:
+        """Start (or, after a fork, restart) this process's refresh thread"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='analytics-refresh', daemon=True)
+                self._thread.start()
+
+    def is_alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def started(self) -> bool:
+        """Whether this process has started the refresh thread (on the first analytics page view)"""
+        return self._pid == os.getpid()
+
+    def run_once(self, breakdowns: bool = True) -> int:
+        started = time.perf_counter()
+        added = refresh_rollups()
+        ANALYTICS_JOB_SECONDS.observe(time.perf_counter() - started, job='rollups')
+        if added:
+            logger.info(f"Folded {added} orders into the sales rollups")
+        if breakdowns and np is not None and _claim_breakdowns(self.interval):
+            started = time.perf_counter()
+            refresh_breakdowns()
+            ANALYTICS_JOB_SECONDS.observe(time.perf_counter() - started, job='breakdowns')
+        self.runs += 1
+        return added
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                self.failures += 1
+                logger.error(f"Analytics refresh failed: {e}", exc_info=True)
+            time.sleep(self.interval)
+
+job = AnalyticsJob()
+
+def _job_samples():
+    yield 'analytics_refresh_runs_total', 'counter', 'Analytics refreshes run by this worker', job.runs
+    yield 'analytics_refresh_failures_total', 'counter', 'Analytics refreshes that failed', job.failures
+
+register_callback(_job_samples)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bring the sales rollups and breakdowns up to date")
+    parser.add_argument('--rollups-only', action='store_true', help="skip the NumPy breakdowns")
+    args = parser.parse_args(argv)
+    print(f"Folded {refresh_rollups()} orders into the sales rollups")
+    if not args.rollups_only:
+        if np is None:
+            print("NumPy is not installed; breakdowns skipped")
+        else:
+            payload = refresh_breakdowns()
+            print(f"Breakdowns computed over {payload['orders']} orders")
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,35 @@
-from flask import Flask, render_template, redirect, url_for, flash, request, session
+from flask import Flask, Response, render_template, redirect, url_for, flash, request, session, jsonify
 import logging
-import json
-from init_database import save_order_to_db, get_db_connection, test_order_insertion, create_tables
+from init_database import (save_order_to_db, get_db_connection, close_db_connection,
+                           get_pool_stats, open_probe_connection, create_tables)
 from dotenv import load_dotenv
 import os
 from auth import auth_bp
+from migrate import check_schema
+from logging_setup import configure_logging, init_request_ids
+from user_store import current_user, get_current_user
+from roles import has_role, set_admin
+from menu_catalog import catalog
+from static_assets import init_static_assets
+from http_cache import init_http_cache, cache_control
+from metrics import init_metrics
+import cart_store
+from order_codes import next_order_code
+from order_views import render_order_detail
+import order_feed
+import order_export
+import order_journal
+import analytics
+import kitchen
+import health
+from order_queries import (ORDER_STATUSES, PAYMENT_METHODS, DASHBOARD_PAGE_SIZE, BULK_LIMIT, BulkLimitError,
+                           parse_order_filters, fetch_orders_page, count_orders, estimate_table_rows,
+                           estimate_table_sizes, fetch_users_page, fetch_user_orders_page, fetch_order_version,
+                           bulk_update_orders)
 from functools import wraps
-import random
-import string
+import secrets
 import time
+from datetime import datetime, timedelta
 
 load_dotenv()
 
@@ -17,34 +38,40 @@ app.secret_key = os.getenv('SECRET_KEY', 'default_secret_key')
 
 app.register_blueprint(auth_bp, url_prefix='/auth')
 
+# X-Request-ID on every request, stamped onto its log records
+init_request_ids(app)
+
+# Return each request's pooled database connection once the request is done
+app.teardown_appcontext(close_db_connection)
+
+# responsive_image()/image_set() template helpers and immutable caching for built assets
+init_static_assets(app)
+
+# gzip/brotli, weak ETags with 304s, and per-route Cache-Control (see @cache_control)
+init_http_cache(app)
+
+# Per-route latency, per-request DB time and pool gauges at /metrics
+init_metrics(app, get_pool_stats, lambda: has_role('admin'))
+
+# Write-behind order ingestion (ORDER_INGEST=journal); replays unwritten orders on start
+if order_journal.enabled():
+    @app.before_request
+    def start_order_journal():
+        order_journal.ensure_started()
+
 # Check if running on PythonAnywhere
 IS_PYTHONANYWHERE = 'PYTHONANYWHERE_DOMAIN' in os.environ
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('app.log'),
-        logging.StreamHandler()
-    ]
-)
+# Configure logging (queued, rotating; see logging_setup.py)
+configure_logging()
 logger = logging.getLogger(__name__)
 
-ITEM_PRICES = {
-    "Pasta": 120.00,
-    "Chi-Momo": 160.00,
-    "Burger": 220.00,
-    "Coffee": 120.00,
-    "Tea": 30.00,
-    "Chowmein": 180.00,
-    "Samosa": 35.00,
-    "Keema Noodles": 190.00,
-    "Laphing": 120.00,
-    "Corn Dog": 220.00,
-    "Sauces": 330.00,
-    "Momo": 150.00
-}
+# One cheap query at startup to flag a database that needs `python migrate.py apply`;
+# a single short connect attempt, so a database that is down does not hold up the import
+try:
+    check_schema(open_probe_connection(health.POOL_TIMEOUT))
+except Exception as e:
+    logger.error(f"Schema version check failed: {e}")
 
 DELIVERY_FEE = 10.00
 
@@ -72,14 +99,8 @@ def admin_required(f):
             flash("Please log in to access this page.", "error")
             return redirect(url_for('auth.login', next=request.url))
         
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT is_admin FROM users WHERE id = %s", (user_id,))
-        user = cursor.fetchone()
-        cursor.close()
-        conn.close()
-        
-        if not user or not user['is_admin']:
+        # Roles ride in the signed session; the database is only consulted when stale
+        if not has_role('admin'):
             flash("You don't have permission to access this page.", "error")
             return redirect(url_for('index'))
             
@@ -88,21 +109,7 @@ def admin_required(f):
 
 @app.context_processor
 def inject_user():
-    user = None
-    if 'user_id' in session:
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute("SELECT * FROM users WHERE id = %s", (session['user_id'],))
-            user = cursor.fetchone()
-            cursor.close()
-            conn.close()
-        except Exception as e:
-            logger.error(f"Error fetching user: {e}")
-    return {'user': user}
-
-def generate_order_code():
-    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
+    return {'user': current_user}
 
 @app.route('/')
 @app.route('/index.html')
@@ -122,7 +129,8 @@ def aboutus():
 def view_menu():
     if request.method == 'POST':
         items = {}
-        for item in ITEM_PRICES:
+        for menu_item in catalog.items():
+            item = menu_item['name']
             qty = request.form.get(item, 0)
             try:
                 qty = int(qty)
@@ -134,10 +142,56 @@ def view_menu():
         if not items:
             flash("Please select at least one item!", "error")
             return redirect(url_for('view_menu'))
-        session['items'] = json.dumps(items)
-        logger.info(f"Menu items saved to session: {items}")
+        try:
+            cart_store.replace_cart(items)
+        except ValueError as e:
+            flash(str(e), "error")
+            return redirect(url_for('view_menu'))
+        logger.debug(f"Cart replaced from menu form: {len(items)} items")
         return redirect(url_for('select_payment'))
-    return render_template('viewMenu.html')
+    return render_template('viewMenu.html', menu_items=catalog.items(), cart=cart_store.get_cart())
+
+def _cart_json(items):
+    prices = {item: catalog.price(item) for item in items}
+    return jsonify({
+        'items': items,
+        'count': sum(items.values()),
+        'subtotal': round(sum(prices[i] * q for i, q in items.items() if prices[i] is not None), 2),
+    })
+
+@app.route('/cart', methods=['GET'])
+@cache_control(private=True, no_store=True)
+def cart_view():
+    if 'user_id' not in session:
+        return jsonify({'error': 'Please log in.'}), 401
+    return _cart_json(cart_store.get_cart())
+
+@app.route('/cart/<action>', methods=['POST'])
+@cache_control(private=True, no_store=True)
+def cart_update(action):
+    """Change one cart line: {"item": name, "quantity": n} for add/set, {"item": name} for remove"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Please log in.'}), 401
+    data = request.get_json(silent=True) or {}
+    item = data.get('item')
+    if catalog.price(item) is None:
+        return jsonify({'error': 'Unknown or unavailable item.'}), 400
+    try:
+        quantity = int(data.get('quantity', 1 if action == 'add' else 0))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Quantity must be a whole number.'}), 400
+    try:
+        if action == 'add':
+            items = cart_store.add_item(item, quantity)
+        elif action == 'set':
+            items = cart_store.set_quantity(item, quantity)
+        elif action == 'remove':
+            items = cart_store.remove_item(item)
+        else:
+            return jsonify({'error': 'Unknown cart action.'}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return _cart_json(items)
 
 @app.route('/select-payment', methods=['GET', 'POST'])
 @login_required
@@ -156,29 +210,40 @@ def select_payment():
         logger.info(f"Payment method selected: {payment_method}")
         return redirect(url_for('order_details'))
     
-    try:
-        items = json.loads(session.get('items', '{}'))
-    except json.JSONDecodeError:
-        flash("Your session has expired. Please select items again.", "error")
-        return redirect(url_for('view_menu'))
-    
+    items = cart_store.get_cart()
     if not items:
         flash("Please select items first.", "error")
         return redirect(url_for('view_menu'))
     
-    subtotal = sum(ITEM_PRICES[item] * qty for item, qty in items.items())
+    prices = {item: catalog.price(item) for item in items}
+    if None in prices.values():
+        flash("Some items in your order are no longer available. Please select items again.", "error")
+        return redirect(url_for('view_menu'))
+    
+    subtotal = sum(prices[item] * qty for item, qty in items.items())
     logger.info(f"Calculating order - subtotal: {subtotal}")
     return render_template('order_payment.html', 
                          items=items, 
                          subtotal=subtotal,
                          delivery_fee=DELIVERY_FEE,
-                         ITEM_PRICES=ITEM_PRICES)
+                         prices=prices)
 
 @app.route('/order-details', methods=['GET', 'POST'])
 @login_required
 def order_details():
     if request.method == 'POST':
         logger.info("Order details form submitted")
+        # Forms rendered before idempotency keys existed get a one-off key
+        order_key = request.form.get('order_key') or secrets.token_urlsafe(16)
+        if not cart_store.claim_order(order_key):
+            # Double-click or retry: show the original order, touch nothing
+            summary = cart_store.order_receipt(order_key)
+            if summary is None:
+                flash("Your order is still being processed. Please check your profile before ordering again.", "error")
+                return redirect(url_for('user_profile'))
+            logger.info(f"Repeated submit for order {summary['order_code']}")
+            return render_template('order_summary.html', **summary)
+        placed = False
         try:
             # Validate form data
             required_fields = ['customer-name', 'phone-number', 'customer-address']
@@ -193,27 +258,20 @@ def order_details():
             customer_address = request.form['customer-address'].strip()
             house_no = request.form.get('house-no', '').strip()
             
-            # Validate session data
-            if 'items' not in session:
-                logger.error("No items in session")
+            items = cart_store.get_cart()
+            if not items:
+                logger.error("Empty cart at checkout")
                 flash("Your order is empty. Please select items again.", "error")
                 return redirect(url_for('view_menu'))
                 
-            try:
-                items = json.loads(session['items'])
-                if not items:
-                    logger.error("Empty items in session")
-                    flash("Your order is empty. Please select items again.", "error")
-                    return redirect(url_for('view_menu'))
-            except json.JSONDecodeError as je:
-                logger.error(f"Invalid items in session: {je}")
-                flash("Invalid order data. Please try again.", "error")
-                return redirect(url_for('view_menu'))
-                
             payment_method = session.get('payment_method', 'cash_on_delivery')
             
-            # Calculate totals
-            subtotal = sum(ITEM_PRICES.get(item, 0) * qty for item, qty in items.items())
+            # Calculate totals from the current catalog prices
+            prices = {item: catalog.price(item) for item in items}
+            if None in prices.values():
+                flash("Some items in your order are no longer available. Please select items again.", "error")
+                return redirect(url_for('view_menu'))
+            subtotal = sum(prices[item] * qty for item, qty in items.items())
             delivery_fee = DELIVERY_FEE if payment_method == 'cash_on_delivery' else 0
             total_price = subtotal + delivery_fee
             
@@ -221,133 +279,365 @@ def order_details():
             order_details = {
                 item: {
                     'quantity': qty,
-                    'item_total': ITEM_PRICES.get(item, 0) * qty
+                    'item_total': prices[item] * qty
                 }
                 for item, qty in items.items()
             }
             
-            order_code = generate_order_code()
+            order_code = next_order_code()
             user_id = session.get('user_id')
             
-            # Save order
-            order_id = save_order_to_db(
-                customer_name=customer_name,
-                phone_number=phone_number,
-                customer_address=customer_address,
-                order_details=order_details,
-                total_price=total_price,
-                user_id=user_id,
-                payment_method=payment_method,
-                order_code=order_code,
-                delivery_fee=delivery_fee
-            )
-            
-            if not order_id:
-                logger.error("Order save returned None")
-                flash("Failed to save order. Please try again.", "error")
-                return redirect(url_for('view_menu'))
+            if order_journal.enabled():
+                # Durable in the local journal now, in the database within one batch
+                order_journal.submit({
+                    'customer_name': customer_name,
+                    'phone_number': phone_number,
+                    'customer_address': customer_address,
+                    'total_price': total_price,
+                    'order_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                    'user_id': user_id,
+                    'payment_method': payment_method,
+                    'order_code': order_code,
+                    'delivery_fee': delivery_fee,
+                    'status': 'pending',
+                    'items': [(item, d['quantity'], d['item_total']) for item, d in order_details.items()],
+                })
+            else:
+                order_id = save_order_to_db(
+                    customer_name=customer_name,
+                    phone_number=phone_number,
+                    customer_address=customer_address,
+                    order_details=order_details,
+                    total_price=total_price,
+                    user_id=user_id,
+                    payment_method=payment_method,
+                    order_code=order_code,
+                    delivery_fee=delivery_fee
+                )
+                
+                if not order_id:
+                    logger.error("Order save returned None")
+                    flash("Failed to save order. Please try again.", "error")
+                    return redirect(url_for('view_menu'))
+                kitchen.board.order_created(order_id, order_code, customer_name, order_details)
             
-            # Clear session data
-            session.pop('items', None)
+            # Placed: from here on a retry must find this order, never place another
+            placed = True
+            summary = dict(customer_name=customer_name,
+                           customer_address=customer_address,
+                           house_no=house_no if house_no else 'N/A',
+                           phone_number=phone_number,
+                           order_details=order_details,
+                           subtotal=subtotal,
+                           total_price=total_price,
+                           payment_method=payment_method,
+                           order_code=order_code,
+                           delivery_fee=delivery_fee)
+            cart_store.store_receipt(order_key, summary)
+            cart_store.clear_cart()
             session.pop('payment_method', None)
             
-            return render_template('order_summary.html',
-                               customer_name=customer_name,
-                               customer_address=customer_address,
-                               house_no=house_no if house_no else 'N/A',
-                               phone_number=phone_number,
-                               order_details=order_details,
-                               subtotal=subtotal,
-                               total_price=total_price,
-                               payment_method=payment_method,
-                               order_code=order_code,
-                               delivery_fee=delivery_fee)
+            return render_template('order_summary.html', **summary)
             
         except Exception as e:
             logger.error(f"Order processing error: {str(e)}", exc_info=True)
             flash(f"An error occurred: {str(e)}", "error")
             return redirect(url_for('view_menu'))
+        finally:
+            if not placed:
+                cart_store.release_order(order_key)
     
-    return render_template('order.html')
+    return render_template('order.html', order_key=secrets.token_urlsafe(16))
 
 @app.route('/admin')
 @admin_required
 def admin_dashboard():
     try:
+        filters = parse_order_filters(request.args)
+        # Finished orders past ARCHIVE_AFTER_DAYS live in the archive tables, shown on request
+        archived = request.args.get('archived') == '1'
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
         
-        # Get all users
-        cursor.execute("SELECT id, first_name, last_name, username, email, created_at FROM users")
-        users = cursor.fetchall()
-        
-        # Get all orders with user info
-        cursor.execute("""
-            SELECT o.*, u.username, u.email 
-            FROM orders o
-            LEFT JOIN users u ON o.user_id = u.id
-            ORDER BY o.order_date DESC
-        """)
-        orders = cursor.fetchall()
+        # One keyset page of orders; cost is independent of table size
+        orders, next_cursor = fetch_orders_page(cursor, filters, after=request.args.get('after'), archived=archived)
+        order_count, count_capped = count_orders(cursor, filters, archived=archived)
+        user_estimate = estimate_table_rows(cursor, 'users')
         
         cursor.close()
         conn.close()
         
-        return render_template('admin/dashboard.html', users=users, orders=orders)
+        # Filter values echoed back into the form and pagination links
+        filter_args = {k: v for k, v in request.args.items()
+                       if k in ('status', 'payment_method', 'date_from', 'date_to', 'archived') and v}
+        
+        return render_template('admin/dashboard.html',
+                             archived=archived,
+                             orders=orders,
+                             next_cursor=next_cursor,
+                             order_count=order_count,
+                             count_capped=count_capped,
+                             user_estimate=user_estimate,
+                             filter_args=filter_args,
+                             statuses=ORDER_STATUSES,
+                             payment_methods=PAYMENT_METHODS,
+                             page_size=DASHBOARD_PAGE_SIZE)
     except Exception as e:
         logger.error(f"Error in admin dashboard: {str(e)}", exc_info=True)
         flash("An error occurred while loading the admin dashboard.", "error")
         return redirect(url_for('index'))  # Fixed redirect to prevent loop
 
+def _listed(values, limit=10):
+    shown = ', '.join(str(value) for value in values[:limit])
+    return shown + (f" and {len(values) - limit} more" if len(values) > limit else "")
+
+@app.route('/admin/analytics')
+@admin_required
+def admin_analytics():
+    # Reads only the rollup tables and the stored breakdowns, never the order tables
+    days = request.args.get('days', type=int)
+    if days not in analytics.RANGES:
+        days = 30
+    analytics.job.ensure_started()
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        summary = analytics.sales_summary(cursor, days)
+        breakdowns = analytics.read_breakdowns(cursor)
+        cursor.close()
+        conn.close()
+    except Exception as e:
+        logger.error(f"Error in sales analytics: {str(e)}", exc_info=True)
+        flash("An error occurred while loading the sales analytics.", "error")
+        return redirect(url_for('admin_dashboard'))
+    return render_template('admin/analytics.html',
+                         days=days,
+                         ranges=analytics.RANGES,
+                         summary=summary,
+                         breakdowns=breakdowns,
+                         weekdays=analytics.WEEKDAYS,
+                         numpy_available=analytics.np is not None)
+
+@app.route('/admin/kitchen')
+@admin_required
+def admin_kitchen():
+    try:
+        board = kitchen.board.snapshot()
+    except Exception as e:
+        logger.error(f"Error loading the kitchen board: {str(e)}", exc_info=True)
+        flash("An error occurred while loading the kitchen board.", "error")
+        return redirect(url_for('admin_dashboard'))
+    return render_template('admin/kitchen.html', board=board)
+
+@app.route('/admin/kitchen/board')
+@cache_control(private=True, no_store=True)
+@admin_required
+def admin_kitchen_board():
+    # Polled by the kitchen display; served from memory after a cheap catch-up read
+    try:
+        return jsonify(kitchen.board.snapshot())
+    except Exception as e:
+        logger.error(f"Error reading the kitchen board: {e}", exc_info=True)
+        return jsonify({'error': 'The kitchen board is unavailable.'}), 503
+
+@app.route('/admin/orders/bulk', methods=['POST'])
+@admin_required
+def admin_bulk_update():
+    # Closing time: change many orders at once instead of one detail page each
+    # The dashboard's current filters ride along as hidden fields
+    filters = parse_order_filters(request.form)
+    filter_args = {k: v for k, v in request.form.items()
+                   if k in ('status', 'payment_method', 'date_from', 'date_to') and v}
+    back = redirect(url_for('admin_dashboard', **filter_args))
+    new_status = request.form.get('new_status')
+    if new_status not in ORDER_STATUSES:
+        flash("Choose the status to set.", "error")
+        return back
+    admin_notes = request.form.get('admin_notes', '').strip() or None
+
+    order_ids = None
+    if request.form.get('scope') == 'filter':
+        older_than = request.form.get('older_than_hours', type=float)
+        if older_than:
+            filters['placed_before'] = datetime.now() - timedelta(hours=older_than)
+        if not filters:
+            flash("Pick at least one filter before changing every matching order.", "error")
+            return back
+    else:
+        order_ids = sorted(set(request.form.getlist('order_ids', type=int)))
+        if not order_ids:
+            flash("Select the orders to change.", "error")
+            return back
+        if len(order_ids) > BULK_LIMIT:
+            flash(f"Select at most {BULK_LIMIT} orders at a time.", "error")
+            return back
+
+    try:
+        result = bulk_update_orders(get_db_connection(), new_status, admin_notes,
+                                    order_ids=order_ids, filters=filters)
+    except BulkLimitError as e:
+        flash(str(e), "error")
+        return back
+    except Exception as e:
+        logger.error(f"Bulk order update failed: {e}", exc_info=True)
+        flash("The bulk update failed; no orders were changed.", "error")
+        return back
+    # After the commit, as on the single-order path, so the kitchen board never shows a rolled-back status
+    for order_id in result['updated_ids']:
+        kitchen.board.status_changed(order_id, new_status)
+
+    logger.info(f"Bulk update to {new_status}: {len(result['updated'])} changed, "
+                f"{len(result['unchanged'])} unchanged, {len(result['missing'])} missing")
+    flash(f"Updated {len(result['updated'])} order(s) to {new_status}.", "success")
+    if result['unchanged']:
+        flash(f"Skipped {len(result['unchanged'])} already {new_status}: {_listed(result['unchanged'])}", "success")
+    if result['missing']:
+        flash(f"Skipped {len(result['missing'])} not found: {_listed(result['missing'])}", "error")
+    return back
+
+@app.route('/admin/orders/export')
+@cache_control(private=True, no_store=True)
+@admin_required
+def admin_export_orders():
+    # Streams a date range of orders with their items; memory use does not grow with the range
+    try:
+        date_from = datetime.strptime(request.args.get('date_from', ''), '%Y-%m-%d').date()
+        date_to = datetime.strptime(request.args.get('date_to', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'error': 'date_from and date_to must be dates (YYYY-MM-DD).'}), 400
+    fmt = request.args.get('format', 'csv')
+    if fmt not in order_export.FORMATS or date_to < date_from:
+        return jsonify({'error': 'Choose csv or ndjson and a date range that ends after it starts.'}), 400
+    compress = request.args.get('gzip') == '1'
+
+    try:
+        order_export.acquire_slot()
+    except order_export.ExportBusyError as e:
+        logger.warning(f"Refused export: {e}")
+        return jsonify({'error': 'Other exports are running; try again shortly.'}), 503
+    logger.info(f"Exporting orders {date_from} to {date_to} as {fmt}{' (gzip)' if compress else ''}")
+    # The export reads on its own connection; give the request's pooled one back now
+    close_db_connection()
+    mimetype = 'application/gzip' if compress else ('text/csv' if fmt == 'csv' else 'application/x-ndjson')
+    response = Response(order_export.export(date_from, date_to, fmt, compress), mimetype=mimetype,
+                        headers={'Content-Disposition': 'attachment; filename='
+                                 f'"{order_export.filename(date_from, date_to, fmt, compress)}"'})
+    response.call_on_close(order_export.release_slot)
+    return response
+
+@app.route('/admin/orders/stream')
+@cache_control(private=True, no_store=True)
+@admin_required
+def admin_order_stream():
+    # New orders and status changes for open dashboards, from this worker's shared poller
+    try:
+        subscription = order_feed.feed.subscribe()
+    except order_feed.FeedFullError as e:
+        logger.warning(f"Refused live dashboard stream: {e}")
+        return jsonify({'error': 'Too many live dashboards are open.'}), 503
+    # The stream stays open for hours; don't hold a pooled connection for it
+    close_db_connection()
+    return Response(order_feed.stream(subscription), mimetype='text/event-stream',
+                    headers={'X-Accel-Buffering': 'no'})
+
+@app.route('/admin/users')
+@cache_control(private=True, no_store=True)
+@admin_required
+def admin_users():
+    # Loaded on demand by the dashboard instead of with every page view
+    after_id = request.args.get('after', type=int)
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    users, next_id = fetch_users_page(cursor, after_id)
+    cursor.close()
+    conn.close()
+    return jsonify({
+        'users': [{**u, 'created_at': u['created_at'].strftime('%Y-%m-%d')} for u in users],
+        'next': next_id
+    })
+
+@app.route('/admin/users/<int:user_id>/admin', methods=['POST'])
+@cache_control(no_store=True)
+@admin_required
+def admin_set_admin(user_id):
+    # Bumps role_version, so the user's sessions recheck their roles instead of waiting out the TTL
+    if user_id == session.get('user_id'):
+        return jsonify({'error': "You can't change your own admin rights."}), 400
+    make_admin = request.form.get('is_admin') == '1'
+    try:
+        if not set_admin(user_id, make_admin):
+            return jsonify({'error': 'User not found.'}), 404
+    except Exception as e:
+        logger.error(f"Changing admin rights of user {user_id} failed: {e}", exc_info=True)
+        return jsonify({'error': 'Could not change admin rights.'}), 500
+    logger.info(f"User {session.get('user_id')} {'granted' if make_admin else 'revoked'} admin for user {user_id}")
+    return jsonify({'id': user_id, 'is_admin': make_admin})
+
+@app.route('/admin/menu', methods=['GET', 'POST'])
+@admin_required
+def admin_menu():
+    if request.method == 'POST':
+        name = request.form.get('name', '')
+        try:
+            price = float(request.form['price']) if request.form.get('price') else None
+        except ValueError:
+            flash("Invalid price.", "error")
+            return redirect(url_for('admin_menu'))
+        if price is not None and price < 0:
+            flash("Invalid price.", "error")
+            return redirect(url_for('admin_menu'))
+        
+        is_available = 'is_available' in request.form
+        if catalog.update_item(name, price=price, is_available=is_available):
+            flash(f"{name} updated.", "success")
+        else:
+            flash("Menu item not found.", "error")
+        return redirect(url_for('admin_menu'))
+    
+    return render_template('admin/menu.html', menu_items=catalog.items(available_only=False))
+
 @app.route('/admin/order/<int:order_id>', methods=['GET', 'POST'])
 @admin_required
 def admin_order_detail(order_id):
     try:
+        archived = request.args.get('archived') == '1'
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
         
         if request.method == 'POST':
+            if archived:
+                flash("Archived orders can no longer be changed.", "error")
+                return redirect(url_for('admin_order_detail', order_id=order_id, archived=1))
+
             new_status = request.form.get('status')
             admin_notes = request.form.get('admin_notes', '')
             
-            if new_status not in ['pending', 'processing', 'completed', 'cancelled']:
+            if new_status not in ORDER_STATUSES:
                 flash("Invalid status selected.", "error")
                 return redirect(url_for('admin_order_detail', order_id=order_id))
             
-            cursor.execute("""
-                UPDATE orders 
-                SET status = %s, admin_notes = %s 
-                WHERE order_id = %s
-            """, (new_status, admin_notes, order_id))
-            conn.commit()
+            # Bumps the version, retiring every worker's cached copy, and keeps the sales rollups in step
+            result = bulk_update_orders(conn, new_status, admin_notes, order_ids=[order_id])
+            if result['missing']:
+                flash("Order not found.", "error")
+                return redirect(url_for('admin_dashboard'))
+            kitchen.board.status_changed(order_id, new_status)
             
             flash("Order status updated successfully!", "success")
             return redirect(url_for('admin_order_detail', order_id=order_id))
         
-        # Get order details
-        cursor.execute("""
-            SELECT o.*, u.username, u.email 
-            FROM orders o
-            LEFT JOIN users u ON o.user_id = u.id
-            WHERE o.order_id = %s
-        """, (order_id,))
-        order = cursor.fetchone()
+        detail = render_order_detail(cursor, 'admin', order_id, archived=archived)
         
-        if not order:
+        if detail is None:
+            if not archived and fetch_order_version(cursor, order_id, archived=True) is not None:
+                return redirect(url_for('admin_order_detail', order_id=order_id, archived=1))
             flash("Order not found.", "error")
             return redirect(url_for('admin_dashboard'))
         
-        # Get order items
-        cursor.execute("""
-            SELECT * FROM order_items 
-            WHERE order_id = %s
-        """, (order_id,))
-        items = cursor.fetchall()
-        
         cursor.close()
         conn.close()
         
-        return render_template('admin/order_detail.html', order=order, items=items)
+        return render_template('admin/order_detail.html', detail=detail)
     except Exception as e:
         logger.error(f"Error in admin order detail: {str(e)}", exc_info=True)
         flash("An error occurred while processing the order.", "error")
@@ -358,25 +648,19 @@ def admin_order_detail(order_id):
 def user_profile():
     try:
         user_id = session.get('user_id')
+        user = get_current_user()
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
         
-        # Get user details
-        cursor.execute("SELECT * FROM users WHERE id = %s", (user_id,))
-        user = cursor.fetchone()
-        
-        # Get user's orders
-        cursor.execute("""
-            SELECT * FROM orders 
-            WHERE user_id = %s 
-            ORDER BY order_date DESC
-        """, (user_id,))
-        orders = cursor.fetchall()
+        archived = request.args.get('archived') == '1'
+        orders, next_cursor = fetch_user_orders_page(cursor, user_id, after=request.args.get('after'),
+                                                     archived=archived)
         
         cursor.close()
         conn.close()
         
-        return render_template('profile.html', user=user, orders=orders)
+        return render_template('profile.html', user=user, orders=orders, next_cursor=next_cursor,
+                               archived=archived)
     except Exception as e:
         logger.error(f"Error in user profile: {str(e)}", exc_info=True)
         flash("An error occurred while loading your profile.", "error")
@@ -390,76 +674,65 @@ def user_order_detail(order_id):
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
         
-        # Verify the order belongs to the user
-        cursor.execute("""
-            SELECT * FROM orders 
-            WHERE order_id = %s AND user_id = %s
-        """, (order_id, user_id))
-        order = cursor.fetchone()
+        # Only the owner may view the order
+        archived = request.args.get('archived') == '1'
+        detail = render_order_detail(cursor, 'customer', order_id, user_id=user_id, archived=archived)
         
-        if not order:
+        if detail is None:
+            if not archived and fetch_order_version(cursor, order_id, user_id, archived=True) is not None:
+                return redirect(url_for('user_order_detail', order_id=order_id, archived=1))
             flash("Order not found or you don't have permission to view it.", "error")
             return redirect(url_for('user_profile'))
         
-        # Get order items
-        cursor.execute("""
-            SELECT * FROM order_items 
-            WHERE order_id = %s
-        """, (order_id,))
-        items = cursor.fetchall()
-        
         cursor.close()
         conn.close()
         
-        return render_template('order_detail.html', order=order, items=items)
+        return render_template('order_detail.html', detail=detail)
     except Exception as e:
         logger.error(f"Error in user order detail: {str(e)}", exc_info=True)
         flash("An error occurred while loading the order details.", "error")
         return redirect(url_for('user_profile'))
 
-@app.route('/test-db-insert')
-def test_db_insert():
-    try:
-        result = test_order_insertion()
-        return f"Test order insertion result: {result}"
-    except Exception as e:
-        return f"Error during test insertion: {str(e)}"
+@app.route('/admin/db-pool')
+@cache_control(no_store=True)
+@admin_required
+def admin_db_pool():
+    return jsonify(get_pool_stats())
+
+@app.route('/healthz')
+@cache_control(no_store=True)
+def healthz():
+    # Liveness only: answered without touching the database
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz')
+@cache_control(no_store=True)
+def readyz():
+    ready, checks = health.readiness()
+    return jsonify({'status': 'ready' if ready else 'unavailable', 'checks': checks}), 200 if ready else 503
 
 @app.route('/test-db')
+@cache_control(no_store=True)
+@admin_required
 def test_db():
-    conn = get_db_connection()
-    if conn:
-        try:
-            cursor = conn.cursor()
-            cursor.execute("SELECT version()")
-            version = cursor.fetchone()
-            
-            cursor.execute("""
-                SELECT table_name 
-                FROM information_schema.tables 
-                WHERE table_schema = DATABASE()
-            """)
-            tables = [row[0] for row in cursor.fetchall()]
-            
-            counts = {}
-            for table in tables:
-                cursor.execute(f"SELECT COUNT(*) FROM `{table}`")
-                counts[table] = cursor.fetchone()[0]
-            
-            cursor.close()
-            conn.close()
-            
-            return render_template('db_test.html',
-                                 version=version[0],
-                                 tables=tables,
-                                 counts=counts)
-        except Exception as e:
-            return f"Error: {str(e)}"
-    return "Failed to connect to database"
+    # Diagnostics from table statistics; COUNT(*) would scan every table
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("SELECT version() AS version")
+        version = cursor.fetchone()['version']
+        tables = estimate_table_sizes(cursor)
+        cursor.close()
+        return jsonify({'version': version, 'schema': health.readiness()[1].get('schema'),
+                        'estimated_rows': tables})
+    except Exception as e:
+        logger.error(f"Database diagnostics failed: {e}")
+        return jsonify({'error': str(e)}), 503
 
 if __name__ == '__main__':
     # Initialize database tables
     create_tables()
+    order_journal.ensure_started()
     
     if IS_PYTHONANYWHERE:
         app.run()
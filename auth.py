@@ -1,32 +1,62 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
-from init_database import get_user, save_user
-from werkzeug.security import check_password_hash, generate_password_hash
+from init_database import get_user, save_user, update_password_hash
+import logging
 import re
+import time
 from init_database import  get_db_connection
 import os
 import mysql.connector
+from user_store import invalidate_user
+from roles import store_roles, clear_roles
+from password_hasher import hash_password, verify_password, needs_rehash, HasherBusyError
+from metrics import LOGIN_DURATION
+
+logger = logging.getLogger(__name__)
 
 auth_bp = Blueprint('auth', __name__)
 
 @auth_bp.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
+        started = time.perf_counter()
         username = request.form.get('username')
         password = request.form.get('password')
         user = get_user(username)
-        if user and check_password_hash(user['password_hash'], password):
+        try:
+            valid = bool(user) and verify_password(user['password_hash'], password)
+        except HasherBusyError as e:
+            logger.warning(f"Login rejected, hashing queue full: {e}")
+            LOGIN_DURATION.observe(time.perf_counter() - started, outcome='busy')
+            flash('Too many people are signing in right now. Please try again in a moment.', 'error')
+            return render_template('login.html'), 503
+        if valid:
+            _upgrade_hash(user, password)
             session['user_id'] = user['id']
             session['username'] = user['username']
+            invalidate_user(user['id'])
+            store_roles(user)
             flash('Logged in successfully!', 'success')
             next_url = request.args.get('next', url_for('view_menu'))
+            LOGIN_DURATION.observe(time.perf_counter() - started, outcome='success')
             return redirect(next_url)
+        LOGIN_DURATION.observe(time.perf_counter() - started, outcome='invalid')
         flash('Invalid username or password.', 'error')
     return render_template('login.html')
 
+def _upgrade_hash(user, password):
+    """Rehash with the configured cost while the plaintext is at hand; never blocks a login"""
+    try:
+        if needs_rehash(user['password_hash']):
+            update_password_hash(user['id'], hash_password(password))
+            logger.info(f"Upgraded password hash for user {user['id']}")
+    except HasherBusyError:
+        pass
+
 @auth_bp.route('/logout')
 def logout():
     session.pop('user_id', None)
     session.pop('username', None)
+    clear_roles()
     flash('Logged out successfully!', 'success')
     return redirect(url_for('index'))
 
@@ -51,7 +81,11 @@ def register():
             flash('Username already exists.', 'error')
             return redirect(url_for('auth.register'))
 
-        user_id = save_user(first_name, last_name, username, email, password)
+        try:
+            user_id = save_user(first_name, last_name, username, email, password)
+        except HasherBusyError:
+            flash('The server is busy. Please try again in a moment.', 'error')
+            return redirect(url_for('auth.register'))
         if user_id:
             flash('Registration successful! Please log in.', 'success')
             return redirect(url_for('auth.login'))
@@ -92,7 +126,7 @@ def register_admin():
                 """INSERT INTO users 
                 (first_name, last_name, username, email, password_hash, is_admin)
                 VALUES (%s, %s, %s, %s, %s, TRUE)""",
-                (first_name, last_name, username, email, generate_password_hash(password))
+                (first_name, last_name, username, email, hash_password(password))
             )
             conn.commit()
             user_id = cursor.lastrowid
@@ -103,6 +137,8 @@ def register_admin():
             return redirect(url_for('auth.login'))
         except mysql.connector.IntegrityError:
             flash('Username or email already exists', 'error')
+        except HasherBusyError:
+            flash('The server is busy. Please try again in a moment.', 'error')
         except Exception as e:
             flash('Registration failed. Please try again.', 'error')
 
@@ -0,0 +1,294 @@
+"""Synthetic data generator: fills users, orders and order_items with
+realistic-looking history for query benchmarks.
+
+    python -m benchmarks.datagen --orders 1000000                # SQLite stand-in
+    python -m benchmarks.datagen --orders 1000000 --backend mysql
+
+Generation tops the tables up to the requested size, so growing a dataset
+from 100k to 1M orders only writes the missing 900k. Orders are spread over
+--days ending now, with:
+
+- more orders on weekends and a steady growth trend across the period
+- lunch and dinner peaks in the time of day
+- Zipf-skewed item popularity over the current menu
+- a few very heavy customers and a long tail, plus some guest orders
+- mostly completed/cancelled history, with pending/processing orders in
+  the last couple of hours
+
+Rows go in with multi-row INSERTs (mysql.connector rewrites executemany
+into one statement), one transaction per batch, so memory stays flat at any
+size. Customers are skewed towards the lowest user IDs: MIN(users.id) is the
+heaviest customer.
+"""
+import argparse
+import bisect
+import itertools
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_DAYS = 365
+BATCH_ORDERS = 2000
+ORDERS_PER_USER = 15
+GUEST_SHARE = 0.10
+# Higher exponent = more orders concentrated on the first users
+CUSTOMER_SKEW = 2.0
+ITEM_ZIPF_S = 1.1
+DELIVERY_FEE = 10.00
+# Last day of the period gets (1 + GROWTH) times the orders of the first
+GROWTH = 1.0
+WEEKDAY_WEIGHTS = (0.85, 0.85, 0.9, 0.95, 1.2, 1.35, 1.25)  # Monday..Sunday
+
+# (peak hour, std dev in hours, share of orders); the rest is spread over opening hours
+MEAL_PEAKS = ((12.75, 1.0, 0.40), (19.5, 1.5, 0.50))
+OPENING_HOURS = (10, 23)
+
+RECENT_HOURS = 2
+STATUS_MIX_RECENT = {'pending': 0.40, 'processing': 0.45, 'completed': 0.12, 'cancelled': 0.03}
+STATUS_MIX_HISTORY = {'completed': 0.88, 'cancelled': 0.09, 'processing': 0.02, 'pending': 0.01}
+PAYMENT_MIX = {'cash_on_delivery': 0.65, 'card': 0.35}
+ITEMS_PER_ORDER = {1: 35, 2: 30, 3: 20, 4: 10, 5: 5}
+QUANTITY_MIX = {1: 70, 2: 22, 3: 8}
+
+FIRST_NAMES = ('Aarav', 'Anisha', 'Bikash', 'Dipika', 'Gaurav', 'Kritika', 'Manish', 'Nisha',
+               'Prakash', 'Rojina', 'Sagar', 'Sita', 'Suman', 'Sunita', 'Ujjwal', 'Yamuna')
+LAST_NAMES = ('Adhikari', 'Bhandari', 'Gurung', 'KC', 'Karki', 'Lama', 'Maharjan', 'Pandey',
+              'Rai', 'Shrestha', 'Tamang', 'Thapa')
+AREAS = ('Baneshwor', 'Baluwatar', 'Boudha', 'Jhamsikhel', 'Kalanki', 'Koteshwor',
+         'Lazimpat', 'Maharajgunj', 'Patan', 'Thamel')
+
+# Every synthetic user can log in with this password
+PASSWORD = 'password'
+
+def open_connection(backend: str, db_path: str):
+    """A raw (unpooled) connection to the benchmark database"""
+    if backend == 'mysql':
+        os.environ.setdefault('LOG_DIR', tempfile.gettempdir())
+        from init_database import _connect
+        return _connect()
+    from benchmarks import sqlite_backend
+    if not os.path.exists(db_path):
+        sqlite_backend.create_database(db_path)
+    return sqlite_backend.Connection(db_path)
+
+def _weighted(mix):
+    """(values, cumulative weights) for rng.choices"""
+    values = list(mix)
+    return values, list(itertools.accumulate(mix[v] for v in values))
+
+def _base36(number: int) -> str:
+    digits = string.digits + string.ascii_uppercase
+    out = ''
+    while True:
+        number, rem = divmod(number, 36)
+        out = digits[rem] + out
+        if not number:
+            return out
+
+def _synthetic_code(order_id: int) -> str:
+    # 9 characters, so they never clash with the app's 6-character codes
+    return 'G' + _base36(order_id).rjust(8, '0')
+
+def _time_of_day(rng: random.Random) -> float:
+    """Seconds after midnight, drawn from the lunch/dinner mixture"""
+    pick = rng.random()
+    for peak, spread, share in MEAL_PEAKS:
+        if pick < share:
+            hour = rng.gauss(peak, spread)
+            if OPENING_HOURS[0] <= hour < OPENING_HOURS[1]:
+                return hour * 3600
+            break
+        pick -= share
+    return rng.uniform(*OPENING_HOURS) * 3600
+
+def _day_counts(total: int, days: int, end: datetime):
+    """Split `total` orders over the period by weekday and growth (largest remainder)"""
+    first = (end - timedelta(days=days - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    dates = [first + timedelta(days=i) for i in range(days)]
+    weights = [WEEKDAY_WEIGHTS[d.weekday()] * (1 + GROWTH * i / max(1, days - 1))
+               for i, d in enumerate(dates)]
+    scale = total / sum(weights)
+    exact = [w * scale for w in weights]
+    counts = [int(x) for x in exact]
+    leftovers = sorted(range(days), key=lambda i: exact[i] - counts[i], reverse=True)
+    for i in leftovers[:total - sum(counts)]:
+        counts[i] += 1
+    return zip(dates, counts)
+
+def _scalar(cursor, statement):
+    cursor.execute(statement)
+    return cursor.fetchone()[0]
+
+def generate_users(conn, target: int, days: int = DEFAULT_DAYS, seed: int = 1) -> int:
+    """Top users up to `target` rows; returns how many were inserted"""
+    cursor = conn.cursor()
+    existing = _scalar(cursor, "SELECT COUNT(*) FROM users")
+    next_id = (_scalar(cursor, "SELECT MAX(id) FROM users") or 0) + 1
+    missing = max(0, target - existing)
+    rng = random.Random(seed)
+    now = datetime.now()
+    from password_hasher import hash_password
+    # One hash for everyone; hashing per user would dominate the run
+    password_hash = hash_password(PASSWORD) if missing else None
+    for start in range(0, missing, BATCH_ORDERS):
+        rows = []
+        for user_id in range(next_id + start, next_id + min(missing, start + BATCH_ORDERS)):
+            created = now - timedelta(days=days, seconds=rng.randrange(days * 86400))
+            rows.append((user_id, rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), f"user{user_id}",
+                         f"user{user_id}@example.com", password_hash, str(created.replace(microsecond=0))))
+        conn.start_transaction()
+        cursor.executemany("""
+            INSERT INTO users (id, first_name, last_name, username, email, password_hash, created_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """, rows)
+        conn.commit()
+    cursor.close()
+    return missing
+
+def generate_orders(conn, target: int, days: int = DEFAULT_DAYS, seed: int = 1,
+                    progress: bool = True) -> int:
+    """Top orders (and their items) up to `target` rows; returns how many were inserted"""
+    cursor = conn.cursor()
+    existing = _scalar(cursor, "SELECT COUNT(*) FROM orders")
+    missing = max(0, target - existing)
+    if not missing:
+        cursor.close()
+        return 0
+    next_id = (_scalar(cursor, "SELECT MAX(order_id) FROM orders") or 0) + 1
+
+    cursor.execute("SELECT id FROM users ORDER BY id")
+    user_ids = [row[0] for row in cursor.fetchall()]
+    cursor.execute("SELECT name, price FROM menu_items WHERE is_available ORDER BY sort_order")
+    menu = [(name, float(price)) for name, price in cursor.fetchall()]
+    if not menu:
+        raise RuntimeError("menu_items is empty; run the migrations first")
+
+    # Different seed per top-up so a grown dataset is not the small one repeated
+    rng = random.Random(seed * 1_000_003 + existing)
+    popularity = menu[:]
+    random.Random(seed).shuffle(popularity)
+    item_weights = list(itertools.accumulate(1 / (rank + 1) ** ITEM_ZIPF_S for rank in range(len(popularity))))
+    item_counts, item_count_weights = _weighted(ITEMS_PER_ORDER)
+    quantities, quantity_weights = _weighted(QUANTITY_MIX)
+    recent_statuses, recent_weights = _weighted(STATUS_MIX_RECENT)
+    history_statuses, history_weights = _weighted(STATUS_MIX_HISTORY)
+    payments, payment_weights = _weighted(PAYMENT_MIX)
+
+    now = datetime.now()
+    recent_cutoff = now - timedelta(hours=RECENT_HOURS)
+    orders, items = [], []
+    order_id = next_id
+    started = time.perf_counter()
+
+    def flush():
+        conn.start_transaction()
+        cursor.executemany("""
+            INSERT INTO orders (order_id, customer_name, phone_number, customer_address, total_price,
+                                order_date, user_id, payment_method, order_code, delivery_fee, status,
+                                updated_at, created_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, orders)
+        cursor.executemany("""
+            INSERT INTO order_items (order_id, item_name, quantity, item_total)
+            VALUES (%s, %s, %s, %s)
+        """, items)
+        conn.commit()
+        orders.clear()
+        items.clear()
+
+    for day, count in _day_counts(missing, days, now):
+        for seconds in sorted(_time_of_day(rng) for _ in range(count)):
+            order_date = day + timedelta(seconds=int(seconds))
+            if order_date > now:
+                # Today's remaining hours have not happened yet
+                order_date = now - timedelta(seconds=rng.randrange(RECENT_HOURS * 3600))
+            if order_date >= recent_cutoff:
+                status = rng.choices(recent_statuses, cum_weights=recent_weights)[0]
+            else:
+                status = rng.choices(history_statuses, cum_weights=history_weights)[0]
+            payment_method = rng.choices(payments, cum_weights=payment_weights)[0]
+
+            chosen = {}
+            for _ in range(rng.choices(item_counts, cum_weights=item_count_weights)[0]):
+                name, price = popularity[bisect.bisect_left(item_weights, rng.random() * item_weights[-1])]
+                chosen[name] = (price, rng.choices(quantities, cum_weights=quantity_weights)[0])
+            subtotal = 0.0
+            for name, (price, quantity) in chosen.items():
+                items.append((order_id, name, quantity, round(price * quantity, 2)))
+                subtotal += price * quantity
+
+            delivery_fee = DELIVERY_FEE if payment_method == 'cash_on_delivery' else 0
+            user_id = None
+            if user_ids and rng.random() >= GUEST_SHARE:
+                user_id = user_ids[int(len(user_ids) * rng.random() ** CUSTOMER_SKEW)]
+            placed_at = str(order_date.replace(microsecond=0))
+            orders.append((
+                order_id,
+                f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                f"98{rng.randrange(10 ** 8):08d}",
+                f"House {rng.randint(1, 200)}, {rng.choice(AREAS)}, Kathmandu",
+                round(subtotal + delivery_fee, 2),
+                placed_at,
+                user_id,
+                payment_method,
+                _synthetic_code(order_id),
+                delivery_fee,
+                status,
+                # History, not a burst of fresh changes for the live dashboard feed
+                placed_at,
+                placed_at,
+            ))
+            order_id += 1
+            if len(orders) >= BATCH_ORDERS:
+                flush()
+                done = order_id - next_id
+                if progress and done % (BATCH_ORDERS * 50) == 0:
+                    rate = done / (time.perf_counter() - started)
+                    print(f"  {done:,}/{missing:,} orders ({rate:,.0f}/s)", flush=True)
+    if orders:
+        flush()
+    cursor.close()
+    return missing
+
+def populate(conn, backend: str, orders: int, days: int = DEFAULT_DAYS, seed: int = 1) -> None:
+    """Grow users and orders to match `orders` and refresh optimizer statistics"""
+    cursor = conn.cursor()
+    if backend == 'mysql':
+        # Bulk-load settings for this session only; the generated data is consistent
+        cursor.execute("SET SESSION foreign_key_checks = 0, unique_checks = 0")
+    users = generate_users(conn, max(100, orders // ORDERS_PER_USER), days, seed)
+    added = generate_orders(conn, orders, days, seed)
+    if backend == 'mysql':
+        cursor.execute("SET SESSION foreign_key_checks = 1, unique_checks = 1")
+        cursor.execute("ANALYZE TABLE users, orders, order_items")
+        cursor.fetchall()
+    else:
+        cursor.execute("ANALYZE")
+    cursor.close()
+    print(f"Inserted {users:,} users and {added:,} orders")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fill the database with synthetic order history")
+    parser.add_argument('--orders', type=int, required=True, help="total orders wanted in the table")
+    parser.add_argument('--days', type=int, default=DEFAULT_DAYS, help="length of the order history")
+    parser.add_argument('--backend', choices=['sqlite', 'mysql'], default='sqlite')
+    parser.add_argument('--db-path', default=os.path.join(tempfile.gettempdir(), 'digibistro-bench.db'),
+                        help="SQLite file used by --backend sqlite")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    conn = open_connection(args.backend, args.db_path)
+    started = time.perf_counter()
+    populate(conn, args.backend, args.orders, args.days, args.seed)
+    conn.close()
+    print(f"Done in {time.perf_counter() - started:.1f}s")
+
+if __name__ == '__main__':
+    main()
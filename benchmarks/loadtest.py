@@ -0,0 +1,310 @@
+"""Load test for the ordering funnel.
+
+Each simulated customer repeatedly walks the real funnel the way a browser
+does: log in, open the menu, add items to the cart, pick a payment method
+and submit the delivery form, following every redirect. Results (throughput, error
+rate and p50/p95/p99 latency per step) are printed and saved as JSON so runs
+can be compared between commits.
+
+    # in-process against the embedded SQLite stand-in (no server needed)
+    python -m benchmarks.loadtest --customers 20 --orders 10
+
+    # in-process against the MySQL database configured in .env
+    python -m benchmarks.loadtest --backend mysql
+
+    # over HTTP against a running server (customers are created via .env DB)
+    python -m benchmarks.loadtest --url http://127.0.0.1:5000 --backend mysql
+
+    # compare with an earlier run
+    python -m benchmarks.loadtest --output new.json --compare old.json
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PASSWORD = 'loadtest-password'
+MENU_INPUT = re.compile(r'<input type="number" name="([^"]+)" min="0"')
+HIDDEN_INPUT = re.compile(r'<input type="hidden" name="([^"]+)" value="([^"]*)"')
+
+
+class InProcessClient:
+    """One browser session driven through Flask's test client (no HTTP server)"""
+
+    def __init__(self, app):
+        self._client = app.test_client()
+
+    def request(self, method, path, data=None, json_body=None):
+        response = self._client.open(path, method=method, data=data, json=json_body)
+        return response.status_code, response.headers.get('Location'), response.get_data(as_text=True)
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpClient:
+    """One browser session (own cookie jar) against a running server"""
+
+    def __init__(self, base_url):
+        self._base = base_url.rstrip('/')
+        self._opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect())
+
+    def request(self, method, path, data=None, json_body=None):
+        headers = {}
+        if json_body is not None:
+            body = json.dumps(json_body).encode()
+            headers['Content-Type'] = 'application/json'
+        else:
+            body = urllib.parse.urlencode(data).encode() if data is not None else None
+        req = urllib.request.Request(self._base + path, data=body, method=method, headers=headers)
+        try:
+            with self._opener.open(req, timeout=30) as response:
+                return response.status, response.headers.get('Location'), response.read().decode()
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers.get('Location'), e.read().decode(errors='replace')
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.orders = 0
+
+    def record(self, step, seconds, ok):
+        with self._lock:
+            self.latencies[step].append(seconds)
+            if not ok:
+                self.errors[step] += 1
+
+
+class FunnelError(Exception):
+    pass
+
+
+def _path(location):
+    if not location:
+        return None
+    parsed = urllib.parse.urlsplit(location)
+    return parsed.path + (f"?{parsed.query}" if parsed.query else '')
+
+def _step(client, recorder, name, method, path, data=None, expect=200, redirect_to=None, json_body=None,
+          contains=None):
+    start = time.perf_counter()
+    try:
+        status, location, body = client.request(method, path, data, json_body)
+    except Exception as e:
+        recorder.record(name, time.perf_counter() - start, False)
+        raise FunnelError(f"{name}: {e}")
+    ok = status == expect and (redirect_to is None or (location and redirect_to in location))
+    # One latency sample per request; a page missing its expected text counts as that request's error
+    found = ok and (contains is None or contains in body)
+    recorder.record(name, time.perf_counter() - start, found)
+    if not ok:
+        raise FunnelError(f"{name}: HTTP {status} -> {location}")
+    if not found:
+        raise FunnelError(f"{name}: page does not contain {contains!r}")
+    return location, body
+
+def place_order(client, recorder, username, rng):
+    """Walk the whole funnel once; raises FunnelError on the first failed step"""
+    location, _ = _step(client, recorder, 'auth.login POST', 'POST', '/auth/login',
+                        {'username': username, 'password': PASSWORD}, expect=302)
+    _, menu = _step(client, recorder, 'view_menu GET', 'GET', _path(location) or '/viewMenu.html')
+
+    names = MENU_INPUT.findall(menu)
+    if not names:
+        raise FunnelError("menu page lists no items")
+    # One small JSON request per cart line, as the menu page's script sends them
+    for name in rng.sample(names, rng.randint(1, min(4, len(names)))):
+        _step(client, recorder, 'cart.add POST', 'POST', '/cart/add',
+              json_body={'item': name, 'quantity': rng.randint(1, 3)})
+    _step(client, recorder, 'select_payment GET', 'GET', '/select-payment')
+    location, _ = _step(client, recorder, 'select_payment POST', 'POST', '/select-payment',
+                        {'payment_method': 'cash_on_delivery'}, expect=302, redirect_to='/order-details')
+    _, form = _step(client, recorder, 'order_details GET', 'GET', _path(location))
+
+    data = dict(HIDDEN_INPUT.findall(form))
+    data.update({
+        'customer-name': f"Load Test {username}",
+        'phone-number': f"98{rng.randint(10000000, 99999999)}",
+        'customer-address': f"{rng.randint(1, 500)} Benchmark Street",
+        'house-no': str(rng.randint(1, 50)),
+    })
+    _step(client, recorder, 'order_details POST', 'POST', '/order-details', data, contains='Order Confirmed')
+    with recorder._lock:
+        recorder.orders += 1
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+def summarize(recorder, elapsed):
+    routes = {}
+    total_requests = total_errors = 0
+    for step, values in recorder.latencies.items():
+        values = sorted(values)
+        errors = recorder.errors.get(step, 0)
+        total_requests += len(values)
+        total_errors += errors
+        routes[step] = {
+            'count': len(values),
+            'errors': errors,
+            'mean_ms': round(1000 * sum(values) / len(values), 2),
+            'p50_ms': round(1000 * _percentile(values, 0.50), 2),
+            'p95_ms': round(1000 * _percentile(values, 0.95), 2),
+            'p99_ms': round(1000 * _percentile(values, 0.99), 2),
+            'max_ms': round(1000 * values[-1], 2),
+        }
+    return {
+        'orders': recorder.orders,
+        'elapsed_s': round(elapsed, 3),
+        'orders_per_s': round(recorder.orders / elapsed, 2) if elapsed else 0,
+        'requests': total_requests,
+        'errors': total_errors,
+        'error_rate': round(total_errors / total_requests, 4) if total_requests else 0,
+    }, routes
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+def _setup_backend(args):
+    """Point the app at the chosen database; must run before `import app`"""
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ.setdefault('LOG_DIR', tempfile.gettempdir())
+    import init_database
+    if args.backend == 'sqlite':
+        from benchmarks import sqlite_backend
+        path = os.path.join(tempfile.mkdtemp(prefix='digibistro-bench-'), 'bench.db')
+        sqlite_backend.create_database(path)
+        init_database.configure_pool(sqlite_backend.connection_factory(path), size=args.pool_size)
+    elif args.pool_size:
+        init_database.configure_pool(size=args.pool_size)
+    return init_database
+
+def _create_customers(init_database, count):
+    """Insert load-test users sharing one precomputed password hash"""
+    from password_hasher import hash_password
+    password_hash = hash_password(PASSWORD)
+    names = [f"loadtest_{i}" for i in range(count)]
+    conn = init_database.get_db_connection()
+    cursor = conn.cursor()
+    cursor.executemany("""
+        INSERT IGNORE INTO users (first_name, last_name, username, email, password_hash)
+        VALUES (%s, %s, %s, %s, %s)
+    """, [('Load', 'Test', name, f"{name}@loadtest.invalid", password_hash) for name in names])
+    conn.commit()
+    cursor.close()
+    conn.close()
+    return names
+
+def print_report(summary, routes, baseline=None):
+    base_routes = (baseline or {}).get('routes', {})
+    print(f"\n{summary['orders']} orders in {summary['elapsed_s']}s = {summary['orders_per_s']} orders/s, "
+          f"error rate {summary['error_rate']:.2%}")
+    if baseline:
+        before = baseline['summary']['orders_per_s']
+        print(f"baseline {baseline['meta'].get('git_commit')}: {before} orders/s "
+              f"({summary['orders_per_s'] - before:+.2f})")
+    print(f"\n{'step':<22}{'count':>7}{'err':>5}{'p50':>9}{'p95':>9}{'p99':>9}" +
+          (f"{'Δp95':>9}" if baseline else ''))
+    for step, stats in routes.items():
+        line = (f"{step:<22}{stats['count']:>7}{stats['errors']:>5}"
+                f"{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}")
+        if step in base_routes:
+            line += f"{stats['p95_ms'] - base_routes[step]['p95_ms']:>+9.1f}"
+        print(line)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the ordering funnel")
+    parser.add_argument('--customers', type=int, default=10, help="concurrent simulated customers")
+    parser.add_argument('--orders', type=int, default=5, help="orders placed by each customer")
+    parser.add_argument('--backend', choices=['sqlite', 'mysql'], default='sqlite')
+    parser.add_argument('--url', help="drive a running server over HTTP instead of in-process")
+    parser.add_argument('--pool-size', type=int, help="override DB_POOL_SIZE for in-process runs")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default='loadtest-results.json')
+    parser.add_argument('--compare', help="earlier results JSON to diff against")
+    args = parser.parse_args(argv)
+
+    if args.url and args.backend == 'sqlite':
+        parser.error("--url needs --backend mysql (customers are created in the server's database)")
+
+    init_database = _setup_backend(args)
+    if not args.url:
+        from app import app
+        app.config['TESTING'] = True
+        new_client = lambda: InProcessClient(app)
+    else:
+        new_client = lambda: HttpClient(args.url)
+    customers = _create_customers(init_database, args.customers)
+
+    recorder = Recorder()
+
+    def run_customer(index):
+        rng = random.Random(args.seed * 1000 + index)
+        for _ in range(args.orders):
+            try:
+                # Fresh session per order, like a new visit
+                place_order(new_client(), recorder, customers[index], rng)
+            except FunnelError as e:
+                print(f"customer {index}: {e}", file=sys.stderr)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.customers) as executor:
+        list(executor.map(run_customer, range(args.customers)))
+    elapsed = time.perf_counter() - started
+
+    summary, routes = summarize(recorder, elapsed)
+    result = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'git_commit': _git_commit(),
+            'backend': args.backend,
+            'mode': 'http' if args.url else 'in-process',
+            'customers': args.customers,
+            'orders_per_customer': args.orders,
+            'python': platform.python_version(),
+        },
+        'summary': summary,
+        'routes': routes,
+    }
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(summary, routes, baseline)
+    with open(args.output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"\nSaved {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+"""Query benchmark: times the dashboard, profile and order-detail queries at
+growing order counts and captures their query plans.
+
+    python -m benchmarks.querybench                                  # 10k..10M on SQLite
+    python -m benchmarks.querybench --scales 10000,100000 --repeat 20
+    python -m benchmarks.querybench --backend mysql --output mysql.json
+
+For each scale the dataset is grown with benchmarks.datagen (top-up only, so
+the scales share one database), every query is run --repeat times against
+rotating sample rows, and the statements it issued are EXPLAINed once. The
+query functions are the ones the views call (order_queries), so the harness
+follows the app as the queries change.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.datagen import DEFAULT_DAYS, open_connection, populate
+from benchmarks.loadtest import _git_commit, _percentile
+from order_queries import (count_orders, fetch_order_detail, fetch_order_version, fetch_orders_page,
+                           fetch_user_orders_page)
+
+DEFAULT_SCALES = (10_000, 100_000, 1_000_000, 10_000_000)
+DEEP_PAGE = 40
+PROFILE_DEEP_PAGE = 5
+
+
+class RecordingCursor:
+    """Cursor proxy that remembers every statement so it can be EXPLAINed afterwards"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.statements = []
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def execute(self, statement, params=()):
+        self.statements.append((statement, tuple(params or ())))
+        return self._cursor.execute(statement, params)
+
+
+# name -> fn(cursor, context, sample); samples rotate through real rows per repeat
+QUERIES = {
+    'admin_dashboard: first page': lambda c, ctx, s: fetch_orders_page(c, {}),
+    'admin_dashboard: status=pending': lambda c, ctx, s: fetch_orders_page(c, {'status': 'pending'}),
+    f"admin_dashboard: page {DEEP_PAGE}": lambda c, ctx, s: fetch_orders_page(c, {}, after=ctx['deep_cursor']),
+    'admin_dashboard: one week, card': lambda c, ctx, s: fetch_orders_page(c, ctx['week_filter']),
+    'admin_dashboard: count completed': lambda c, ctx, s: count_orders(c, {'status': 'completed'}),
+    'user_profile: heaviest customer': lambda c, ctx, s: fetch_user_orders_page(c, ctx['heavy_user']),
+    f"user_profile: heaviest customer, page {PROFILE_DEEP_PAGE}":
+        lambda c, ctx, s: fetch_user_orders_page(c, ctx['heavy_user'], after=ctx['profile_cursor']),
+    'user_profile: typical customer': lambda c, ctx, s: fetch_user_orders_page(c, s['user_id']),
+    'admin_order_detail': lambda c, ctx, s: fetch_order_detail(c, s['order_id']),
+    'user_order_detail': lambda c, ctx, s: fetch_order_detail(c, s['order_id'], user_id=s['user_id']),
+    'order_detail: cached version check': lambda c, ctx, s: fetch_order_version(c, s['order_id'], s['user_id']),
+}
+
+
+def _rows_returned(result):
+    if isinstance(result, tuple):
+        result = result[0] if isinstance(result[0], list) else result[-1]
+    return len(result) if isinstance(result, list) else int(result is not None)
+
+def build_context(conn, samples: int, seed: int):
+    """Pick the rows the queries run against: a deep page cursor, customers, orders"""
+    cursor = conn.cursor(dictionary=True)
+    page_cursor = None
+    for _ in range(DEEP_PAGE - 1):
+        _, page_cursor = fetch_orders_page(cursor, {}, after=page_cursor)
+        if page_cursor is None:
+            break
+
+    cursor.execute("SELECT MIN(order_id) AS low, MAX(order_id) AS high, MAX(order_date) AS latest FROM orders")
+    bounds = cursor.fetchone()
+    cursor.execute("SELECT MIN(id) AS heavy FROM users")
+    heavy_user = cursor.fetchone()['heavy']
+    profile_cursor = None
+    for _ in range(PROFILE_DEEP_PAGE - 1):
+        _, profile_cursor = fetch_user_orders_page(cursor, heavy_user, after=profile_cursor)
+        if profile_cursor is None:
+            break
+
+    rng = random.Random(seed)
+    picked = []
+    for _ in range(samples):
+        cursor.execute("""
+            SELECT order_id, user_id FROM orders
+            WHERE order_id >= %s AND user_id IS NOT NULL
+            ORDER BY order_id LIMIT 1
+        """, (rng.randint(bounds['low'], bounds['high']),))
+        row = cursor.fetchone()
+        if row:
+            picked.append(row)
+    cursor.close()
+
+    latest = bounds['latest']
+    if isinstance(latest, str):
+        latest = datetime.fromisoformat(latest)
+    week_start = (latest - timedelta(days=180)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return {
+        'deep_cursor': page_cursor,
+        'heavy_user': heavy_user,
+        'profile_cursor': profile_cursor,
+        'week_filter': {'payment_method': 'card', 'date_from': week_start,
+                        'date_to': week_start + timedelta(days=6)},
+    }, picked or [{'order_id': bounds['low'], 'user_id': heavy_user}]
+
+def explain(conn, backend: str, statements):
+    """Query plans for the statements one benchmark issued"""
+    prefix = 'EXPLAIN ' if backend == 'mysql' else 'EXPLAIN QUERY PLAN '
+    plans = []
+    cursor = conn.cursor(dictionary=True)
+    for statement, params in statements:
+        cursor.execute(prefix + statement.strip(), params)
+        plans.append({
+            'sql': ' '.join(statement.split()),
+            'plan': [{k: (v if isinstance(v, (int, float, str)) or v is None else str(v))
+                      for k, v in row.items()} for row in cursor.fetchall()],
+        })
+    cursor.close()
+    return plans
+
+def run_scale(conn, backend: str, repeat: int, seed: int):
+    context, samples = build_context(conn, repeat, seed)
+    results = {}
+    for name, query in QUERIES.items():
+        cursor = RecordingCursor(conn.cursor(dictionary=True))
+        query(cursor, context, samples[0])  # warm-up; also records the statements to explain
+        timings, rows = [], 0
+        for i in range(repeat):
+            sample = samples[i % len(samples)]
+            start = time.perf_counter()
+            result = query(cursor, context, sample)
+            timings.append(time.perf_counter() - start)
+            rows = max(rows, _rows_returned(result))
+        statements = cursor.statements[:len(cursor.statements) // (repeat + 1)]
+        cursor.close()
+        timings.sort()
+        results[name] = {
+            'runs': repeat,
+            'rows': rows,
+            'min_ms': round(1000 * timings[0], 3),
+            'p50_ms': round(1000 * _percentile(timings, 0.50), 3),
+            'p95_ms': round(1000 * _percentile(timings, 0.95), 3),
+            'max_ms': round(1000 * timings[-1], 3),
+            'explain': explain(conn, backend, statements),
+        }
+    return results
+
+def print_report(scales, results):
+    width = max(len(name) for name in QUERIES) + 2
+    print(f"\np50 ms by orders in table\n{'query':<{width}}" + ''.join(f"{s:>12,}" for s in scales))
+    for name in QUERIES:
+        print(f"{name:<{width}}" + ''.join(f"{results[str(s)]['queries'][name]['p50_ms']:>12.2f}"
+                                           for s in scales))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the order queries at growing table sizes")
+    parser.add_argument('--scales', default=','.join(map(str, DEFAULT_SCALES)),
+                        help="comma-separated order counts, ascending")
+    parser.add_argument('--repeat', type=int, default=10, help="timed runs per query and scale")
+    parser.add_argument('--days', type=int, default=DEFAULT_DAYS)
+    parser.add_argument('--backend', choices=['sqlite', 'mysql'], default='sqlite')
+    parser.add_argument('--db-path', default=os.path.join(tempfile.gettempdir(), 'digibistro-bench.db'),
+                        help="SQLite file used by --backend sqlite (kept between runs)")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default='querybench-results.json')
+    args = parser.parse_args(argv)
+    scales = sorted(int(s) for s in args.scales.split(',') if s)
+
+    conn = open_connection(args.backend, args.db_path)
+    results = {}
+    for scale in scales:
+        print(f"\n== {scale:,} orders")
+        started = time.perf_counter()
+        populate(conn, args.backend, scale, args.days, args.seed)
+        print(f"Data ready in {time.perf_counter() - started:.1f}s; running queries")
+        results[str(scale)] = {'queries': run_scale(conn, args.backend, args.repeat, args.seed)}
+    conn.close()
+
+    print_report(scales, results)
+    with open(args.output, 'w') as f:
+        json.dump({
+            'meta': {
+                'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'git_commit': _git_commit(),
+                'backend': args.backend,
+                'days': args.days,
+                'repeat': args.repeat,
+                'python': platform.python_version(),
+            },
+            'scales': results,
+        }, f, indent=2)
+    print(f"\nSaved {args.output} (query plans included)")
+
+if __name__ == '__main__':
+    main()
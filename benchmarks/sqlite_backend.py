@@ -0,0 +1,266 @@
+"""Embedded stand-in for MySQL so the benchmarks run without a database server.
+
+Wraps sqlite3 in the small slice of the mysql.connector API the app uses
+(dictionary cursors, %s placeholders, start_transaction, ping, ...) and
+rewrites the handful of MySQL-only constructs the benchmarks exercise.
+Timings against it show app-side costs and relative changes; absolute
+database numbers still need a real MySQL/MariaDB run.
+
+Keep SCHEMA in step with migrations/ when they change tables or indexes.
+"""
+import re
+import sqlite3
+import threading
+
+SCHEMA = [
+    """CREATE TABLE users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        first_name VARCHAR(50) NOT NULL,
+        last_name VARCHAR(50) NOT NULL,
+        username VARCHAR(50) UNIQUE NOT NULL,
+        email VARCHAR(100) UNIQUE NOT NULL,
+        password_hash VARCHAR(255) NOT NULL,
+        is_admin BOOLEAN DEFAULT 0,
+        role_version INT NOT NULL DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""",
+    """CREATE TABLE orders (
+        order_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        customer_name VARCHAR(100) NOT NULL,
+        phone_number VARCHAR(15) NOT NULL,
+        customer_address TEXT NOT NULL,
+        total_price DECIMAL(10,2) NOT NULL,
+        order_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        user_id INT NULL REFERENCES users(id) ON DELETE SET NULL,
+        payment_method VARCHAR(20) NOT NULL,
+        order_code VARCHAR(10) UNIQUE,
+        delivery_fee DECIMAL(10,2) DEFAULT 0,
+        status VARCHAR(20) DEFAULT 'pending',
+        admin_notes TEXT NULL,
+        version INT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""",
+    # Stands in for MySQL's ON UPDATE CURRENT_TIMESTAMP
+    """CREATE TRIGGER orders_touch_updated_at AFTER UPDATE ON orders
+        FOR EACH ROW WHEN NEW.updated_at = OLD.updated_at
+        BEGIN UPDATE orders SET updated_at = CURRENT_TIMESTAMP WHERE order_id = NEW.order_id; END""",
+    "CREATE INDEX idx_orders_user_date ON orders (user_id, order_date)",
+    "CREATE INDEX idx_orders_status_date ON orders (status, order_date)",
+    "CREATE INDEX idx_orders_date ON orders (order_date)",
+    "CREATE INDEX idx_orders_updated ON orders (updated_at)",
+    """CREATE TABLE order_items (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        order_id INT NOT NULL REFERENCES orders(order_id) ON DELETE CASCADE,
+        item_name VARCHAR(50) NOT NULL,
+        quantity INT NOT NULL,
+        item_total DECIMAL(10,2) NOT NULL,
+        notes TEXT NULL
+    )""",
+    # MySQL indexes foreign keys implicitly; SQLite does not
+    "CREATE INDEX idx_order_items_order ON order_items (order_id)",
+    """CREATE TABLE menu_items (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name VARCHAR(50) UNIQUE NOT NULL,
+        category VARCHAR(50) NOT NULL,
+        price DECIMAL(10,2) NOT NULL,
+        is_available BOOLEAN NOT NULL DEFAULT 1,
+        description VARCHAR(255) NULL,
+        image VARCHAR(100) NULL,
+        sort_order INT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""",
+    "CREATE TABLE catalog_version (id INT PRIMARY KEY, version INT NOT NULL)",
+    """CREATE TABLE order_code_blocks (
+        block_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        allocated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""",
+    """CREATE TABLE sales_daily (
+        day DATE PRIMARY KEY,
+        orders INT NOT NULL,
+        items INT NOT NULL,
+        revenue DECIMAL(12,2) NOT NULL,
+        delivery_fees DECIMAL(12,2) NOT NULL,
+        cancelled_orders INT NOT NULL DEFAULT 0,
+        cancelled_revenue DECIMAL(12,2) NOT NULL DEFAULT 0
+    )""",
+    """CREATE TABLE sales_hourly (
+        day DATE NOT NULL,
+        hour TINYINT NOT NULL,
+        orders INT NOT NULL,
+        revenue DECIMAL(12,2) NOT NULL,
+        cancelled_orders INT NOT NULL DEFAULT 0,
+        cancelled_revenue DECIMAL(12,2) NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, hour)
+    )""",
+    """CREATE TABLE sales_items (
+        day DATE NOT NULL,
+        item_name VARCHAR(50) NOT NULL,
+        quantity INT NOT NULL,
+        revenue DECIMAL(12,2) NOT NULL,
+        PRIMARY KEY (day, item_name)
+    )""",
+    """CREATE TABLE rollup_state (
+        name VARCHAR(50) PRIMARY KEY,
+        last_order_id INT NOT NULL DEFAULT 0,
+        refreshed_at TIMESTAMP NULL,
+        payload MEDIUMTEXT NULL
+    )""",
+    """CREATE TABLE orders_archive (
+        order_id INTEGER PRIMARY KEY,
+        customer_name VARCHAR(100) NOT NULL,
+        phone_number VARCHAR(15) NOT NULL,
+        customer_address TEXT NOT NULL,
+        total_price DECIMAL(10,2) NOT NULL,
+        order_date TIMESTAMP NOT NULL,
+        user_id INT NULL REFERENCES users(id) ON DELETE SET NULL,
+        payment_method VARCHAR(20) NOT NULL,
+        order_code VARCHAR(10),
+        delivery_fee DECIMAL(10,2) DEFAULT 0,
+        status VARCHAR(20) NOT NULL,
+        admin_notes TEXT NULL,
+        version INT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP NULL,
+        created_at TIMESTAMP NULL,
+        archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""",
+    "CREATE INDEX idx_orders_archive_user_date ON orders_archive (user_id, order_date)",
+    "CREATE INDEX idx_orders_archive_status_date ON orders_archive (status, order_date)",
+    "CREATE INDEX idx_orders_archive_date ON orders_archive (order_date)",
+    "CREATE INDEX idx_orders_archive_code ON orders_archive (order_code)",
+    """CREATE TABLE order_items_archive (
+        id INTEGER PRIMARY KEY,
+        order_id INT NOT NULL REFERENCES orders_archive(order_id) ON DELETE CASCADE,
+        item_name VARCHAR(50) NOT NULL,
+        quantity INT NOT NULL,
+        item_total DECIMAL(10,2) NOT NULL,
+        notes TEXT NULL
+    )""",
+    "CREATE INDEX idx_order_items_archive_order ON order_items_archive (order_id)",
+    """CREATE TABLE schema_version (
+        version INT PRIMARY KEY,
+        name VARCHAR(100) NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""",
+]
+
+_REWRITES = [
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\bINSERT\s+IGNORE\b', re.I), 'INSERT OR IGNORE'),
+    (re.compile(r'\bNOW\(\)', re.I), 'CURRENT_TIMESTAMP'),
+    # Writers are serialized by the database lock instead
+    (re.compile(r'\s+FOR\s+UPDATE\b', re.I), ''),
+]
+
+def translate(statement: str) -> str:
+    for pattern, replacement in _REWRITES:
+        statement = pattern.sub(replacement, statement)
+    return statement
+
+
+class Cursor:
+    def __init__(self, cursor: sqlite3.Cursor, dictionary: bool):
+        self._cursor = cursor
+        self._dictionary = dictionary
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return {col[0]: value for col, value in zip(self._cursor.description, row)}
+
+    def execute(self, statement, params=()):
+        self._cursor.execute(translate(statement), tuple(params or ()))
+
+    def executemany(self, statement, seq):
+        self._cursor.executemany(translate(statement), [tuple(p) for p in seq])
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchmany(self, size=1):
+        return [self._row(r) for r in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._row(r) for r in self._cursor.fetchall()]
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._cursor.close()
+
+
+class Connection:
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None,
+                                     detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        self._open = True
+
+    def cursor(self, dictionary=False, **kwargs):
+        return Cursor(self._conn.cursor(), dictionary)
+
+    def start_transaction(self, **kwargs):
+        # IMMEDIATE takes the write lock up front instead of failing on upgrade
+        self._conn.execute("BEGIN IMMEDIATE")
+
+    @property
+    def in_transaction(self):
+        return self._conn.in_transaction
+
+    def commit(self):
+        if self._conn.in_transaction:
+            self._conn.execute("COMMIT")
+
+    def rollback(self):
+        if self._conn.in_transaction:
+            self._conn.execute("ROLLBACK")
+
+    def ping(self, reconnect=False, **kwargs):
+        self._conn.execute("SELECT 1")
+
+    def is_connected(self):
+        return self._open
+
+    def close(self):
+        self._open = False
+        self._conn.close()
+
+
+_init_lock = threading.Lock()
+
+def create_database(path: str) -> None:
+    """Create the schema, seed the menu and mark every migration as applied"""
+    from migrate import discover
+    seed = next(m for m in discover() if m.name == 'menu_items').load().SEED_ITEMS
+    with _init_lock:
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        for statement in SCHEMA:
+            conn.execute(statement)
+        conn.executemany(
+            "INSERT INTO menu_items (name, category, price, description, image, is_available, sort_order) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(*item, position) for position, item in enumerate(seed)])
+        conn.execute("INSERT INTO catalog_version (id, version) VALUES (1, 1)")
+        conn.executemany("INSERT INTO schema_version (version, name) VALUES (?, ?)",
+                         [(m.version, m.name) for m in discover()])
+        conn.commit()
+        conn.close()
+
+def connection_factory(path: str):
+    return lambda: Connection(path)
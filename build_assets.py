@@ -0,0 +1,141 @@
+"""Offline asset build: responsive, content-hashed image variants and
+precompressed text assets.
+
+    python build_assets.py [--widths 320,640,960,1280,1920] [--skip-images]
+
+Every JPEG/PNG in static/ is resized to each configured width (never
+upscaled) and encoded as WebP, AVIF (when Pillow supports it) and its
+original format. Files are written to static/build/ as
+<name>-<width>w.<hash>.<ext> and listed in static/build/manifest.json, which
+static_assets.responsive_image() reads to emit <picture>/srcset markup.
+Requires Pillow (see requirements-build.txt).
+
+CSS/JS/SVG/JSON files in static/ also get .gz (and .br, when the brotli
+package is installed) siblings that http_cache serves to clients accepting them.
+"""
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+BUILD_DIR = os.path.join(STATIC_DIR, 'build')
+MANIFEST_PATH = os.path.join(BUILD_DIR, 'manifest.json')
+
+DEFAULT_WIDTHS = (320, 640, 960, 1280, 1920)
+SOURCE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+PRECOMPRESS_EXTENSIONS = ('.css', '.js', '.svg', '.json')
+
+# Pillow format name -> (file extension, MIME type, encoder options)
+ENCODINGS = {
+    'AVIF': ('avif', 'image/avif', {'quality': 55}),
+    'WEBP': ('webp', 'image/webp', {'quality': 78, 'method': 6}),
+    'JPEG': ('jpg', 'image/jpeg', {'quality': 80, 'optimize': True, 'progressive': True}),
+    'PNG': ('png', 'image/png', {'optimize': True}),
+}
+
+def _formats_for(source_format, features):
+    formats = []
+    if features.check('avif'):
+        formats.append('AVIF')
+    if features.check('webp'):
+        formats.append('WEBP')
+    # Fallback for browsers without modern format support
+    formats.append('PNG' if source_format == 'PNG' else 'JPEG')
+    return formats
+
+def _encode(image, fmt):
+    ext, mime, options = ENCODINGS[fmt]
+    if fmt == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, **options)
+    return buffer.getvalue(), ext, mime
+
+def build_image(filename, widths, Image, features):
+    """Write all variants of one source image; returns its manifest entry"""
+    stem = os.path.splitext(filename)[0]
+    with Image.open(os.path.join(STATIC_DIR, filename)) as source:
+        source_format = source.format
+        source.load()
+        width, height = source.size
+        targets = sorted({w for w in widths if w < width} | {min(width, max(widths))})
+
+        entry = {'width': width, 'height': height, 'sources': []}
+        for fmt in _formats_for(source_format, features):
+            variants = []
+            for target in targets:
+                resized = source if target == width else source.resize(
+                    (target, round(height * target / width)), Image.LANCZOS)
+                data, ext, mime = _encode(resized, fmt)
+                digest = hashlib.sha256(data).hexdigest()[:10]
+                name = f"{stem}-{target}w.{digest}.{ext}"
+                with open(os.path.join(BUILD_DIR, name), 'wb') as f:
+                    f.write(data)
+                variants.append({'width': target, 'file': f"build/{name}", 'bytes': len(data)})
+            entry['sources'].append({'type': mime, 'variants': variants})
+        return entry
+
+def precompress(directory=STATIC_DIR):
+    """Write maximum-effort .gz/.br siblings for text assets; returns files written"""
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+    written = []
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(PRECOMPRESS_EXTENSIONS):
+            continue
+        path = os.path.join(directory, filename)
+        with open(path, 'rb') as f:
+            data = f.read()
+        outputs = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            outputs.append(('.br', brotli.compress(data, quality=11)))
+        for extension, compressed in outputs:
+            with open(path + extension, 'wb') as f:
+                f.write(compressed)
+            written.append(filename + extension)
+            print(f"{filename}{extension}: {len(data) // 1024} KB -> {len(compressed) // 1024} KB")
+    return written
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build responsive image variants and manifest")
+    parser.add_argument('--widths', default=','.join(map(str, DEFAULT_WIDTHS)),
+                        help="comma-separated target widths in pixels")
+    parser.add_argument('--skip-images', action='store_true', help="only precompress text assets")
+    args = parser.parse_args(argv)
+    widths = [int(w) for w in args.widths.split(',') if w]
+
+    precompress()
+    if args.skip_images:
+        return
+
+    try:
+        from PIL import Image, features
+    except ImportError:
+        sys.exit("Pillow is required: pip install -r requirements-build.txt")
+
+    # Rebuild from scratch so stale hashed files never linger
+    shutil.rmtree(BUILD_DIR, ignore_errors=True)
+    os.makedirs(BUILD_DIR)
+
+    manifest = {}
+    for filename in sorted(os.listdir(STATIC_DIR)):
+        if not filename.lower().endswith(SOURCE_EXTENSIONS):
+            continue
+        manifest[filename] = build_image(filename, widths, Image, features)
+        original = os.path.getsize(os.path.join(STATIC_DIR, filename))
+        smallest = min(v['bytes'] for s in manifest[filename]['sources'] for v in s['variants'])
+        print(f"{filename}: {original // 1024} KB -> variants from {smallest // 1024} KB")
+
+    with open(MANIFEST_PATH, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    print(f"Wrote {MANIFEST_PATH}")
+
+if __name__ == '__main__':
+    main()
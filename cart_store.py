@@ -0,0 +1,212 @@
+"""Server-side shopping carts keyed by a random per-session cart ID.
+
+Only the cart ID lives in the signed session cookie, so changing the cart
+never re-signs the cookie. The backend is chosen by CART_BACKEND:
+
+    memory   per-process LRU with TTL (default; single worker)
+    sqlite   local SQLite file at CART_DB_PATH, shared by every worker on the host
+
+CART_TTL is the idle lifetime of a cart in seconds; CART_MAX_CARTS bounds
+the in-memory backend.
+
+The same backend keeps order receipts keyed by the idempotency key issued
+with the checkout form, so a retried submit gets the original order back.
+"""
+import json
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+from flask import session
+from cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+CART_TTL = float(os.getenv('CART_TTL', str(3 * 3600)))
+MAX_ITEM_QUANTITY = 50
+RECEIPT_WAIT = 5.0
+
+Items = Dict[str, int]
+
+
+class MemoryCartBackend:
+    def __init__(self, maxsize: int, ttl: float):
+        self._carts = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def get(self, cart_id: str) -> Items:
+        return dict(self._carts.get(cart_id) or {})
+
+    def update(self, cart_id: str, change: Callable[[Items], Items]) -> Items:
+        with self._lock:
+            items = change(self.get(cart_id))
+            if items:
+                self._carts.set(cart_id, items)
+            else:
+                self._carts.pop(cart_id)
+        return dict(items)
+
+    def delete(self, cart_id: str) -> None:
+        self._carts.pop(cart_id)
+
+
+class SqliteCartBackend:
+    """Carts in a local SQLite file, so every worker process on the host sees the same cart"""
+
+    PURGE_EVERY = 500
+
+    def __init__(self, path: str, ttl: float):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("""CREATE TABLE IF NOT EXISTS carts (
+            cart_id TEXT PRIMARY KEY,
+            items TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )""")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    def _read(self, conn, cart_id: str) -> Items:
+        row = conn.execute("SELECT items FROM carts WHERE cart_id = ? AND expires_at > ?",
+                           (cart_id, time.time())).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def get(self, cart_id: str) -> Items:
+        return self._read(self._conn(), cart_id)
+
+    def update(self, cart_id: str, change: Callable[[Items], Items]) -> Items:
+        conn = self._conn()
+        # IMMEDIATE serializes concurrent read-modify-writes across processes
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            items = change(self._read(conn, cart_id))
+            if items:
+                conn.execute("INSERT OR REPLACE INTO carts (cart_id, items, expires_at) VALUES (?, ?, ?)",
+                             (cart_id, json.dumps(items), time.time() + self.ttl))
+            else:
+                conn.execute("DELETE FROM carts WHERE cart_id = ?", (cart_id,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            conn.execute("DELETE FROM carts WHERE expires_at <= ?", (time.time(),))
+        return items
+
+    def delete(self, cart_id: str) -> None:
+        self._conn().execute("DELETE FROM carts WHERE cart_id = ?", (cart_id,))
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                kind = os.getenv('CART_BACKEND', 'memory')
+                if kind == 'sqlite':
+                    _backend = SqliteCartBackend(os.getenv('CART_DB_PATH', 'carts.db'), CART_TTL)
+                else:
+                    _backend = MemoryCartBackend(int(os.getenv('CART_MAX_CARTS', '10000')), CART_TTL)
+                logger.info(f"Cart backend: {type(_backend).__name__}")
+    return _backend
+
+def cart_id(create: bool = False) -> Optional[str]:
+    """This session's cart ID, issued on the first change to the cart"""
+    value = session.get('cart_id')
+    if value is None and create:
+        value = session['cart_id'] = secrets.token_urlsafe(16)
+    return value
+
+def get_cart() -> Items:
+    current = cart_id()
+    return get_backend().get(current) if current else {}
+
+def _bounded(quantity: int) -> int:
+    if quantity < 0 or quantity > MAX_ITEM_QUANTITY:
+        raise ValueError(f"Quantity must be between 0 and {MAX_ITEM_QUANTITY}")
+    return quantity
+
+def set_quantity(item: str, quantity: int) -> Items:
+    """Set one item's quantity; 0 removes it"""
+    _bounded(quantity)
+
+    def change(items):
+        if quantity:
+            items[item] = quantity
+        else:
+            items.pop(item, None)
+        return items
+    return get_backend().update(cart_id(create=True), change)
+
+def add_item(item: str, quantity: int = 1) -> Items:
+    def change(items):
+        total = _bounded(items.get(item, 0) + quantity)
+        if total:
+            items[item] = total
+        else:
+            items.pop(item, None)
+        return items
+    return get_backend().update(cart_id(create=True), change)
+
+def remove_item(item: str) -> Items:
+    return set_quantity(item, 0)
+
+def replace_cart(items: Items) -> Items:
+    """Swap in a whole cart at once (the no-JavaScript menu form)"""
+    for quantity in items.values():
+        _bounded(quantity)
+    return get_backend().update(cart_id(create=True), lambda _: dict(items))
+
+def clear_cart() -> None:
+    current = cart_id()
+    if current:
+        get_backend().delete(current)
+
+def _receipt_key(order_key: str) -> str:
+    return f"receipt:{session.get('user_id')}:{order_key}"
+
+def claim_order(order_key: str) -> bool:
+    """Reserve an idempotency key; False if an earlier submit already holds it"""
+    claimed = []
+
+    def change(receipt):
+        if receipt:
+            return receipt
+        claimed.append(True)
+        return {'state': 'pending'}
+    get_backend().update(_receipt_key(order_key), change)
+    return bool(claimed)
+
+def store_receipt(order_key: str, summary: Dict[str, Any]) -> None:
+    get_backend().update(_receipt_key(order_key), lambda _: {'state': 'done', 'summary': summary})
+
+def release_order(order_key: str) -> None:
+    """Give up a claim whose order was not placed, so the customer can retry"""
+    get_backend().delete(_receipt_key(order_key))
+
+def order_receipt(order_key: str, wait: float = RECEIPT_WAIT) -> Optional[Dict[str, Any]]:
+    """The summary of the order placed with this key, waiting while it is still in flight"""
+    deadline = time.monotonic() + wait
+    while True:
+        receipt = get_backend().get(_receipt_key(order_key))
+        if receipt.get('state') == 'done':
+            return receipt['summary']
+        if not receipt or time.monotonic() >= deadline:
+            return None
+        time.sleep(0.1)
@@ -0,0 +1,208 @@
+import threading
+import time
+import logging
+from collections import deque
+from typing import Callable, Optional, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection could be checked out within the pool timeout"""
+
+
+class InstrumentedCursor:
+    """Cursor proxy that reports each statement's duration to a callback"""
+
+    def __init__(self, cursor, on_query: Callable[[str, float], None]):
+        self._cursor = cursor
+        self._on_query = on_query
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+    def _timed(self, method, statement, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(statement, *args, **kwargs)
+        finally:
+            self._on_query(statement, time.perf_counter() - start)
+
+    def execute(self, statement, *args, **kwargs):
+        return self._timed(self._cursor.execute, statement, *args, **kwargs)
+
+    def executemany(self, statement, *args, **kwargs):
+        return self._timed(self._cursor.executemany, statement, *args, **kwargs)
+
+
+class PooledConnection:
+    """Proxy around a raw connection that hands it back to the pool on close()"""
+
+    def __init__(self, pool: 'ConnectionPool', conn):
+        self._pool = pool
+        self._conn = conn
+        self._released = False
+        self.request_scoped = False
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    @property
+    def raw(self):
+        return self._conn
+
+    def cursor(self, *args, **kwargs):
+        cursor = self._conn.cursor(*args, **kwargs)
+        if self._pool.on_query is None:
+            return cursor
+        return InstrumentedCursor(cursor, self._pool.on_query)
+
+    def close(self):
+        # Request-scoped connections are returned by the teardown hook instead
+        if self.request_scoped:
+            return
+        self.release()
+
+    def release(self):
+        if self._released:
+            return
+        self._released = True
+        self._pool._put(self._conn)
+
+
+class ConnectionPool:
+    """Fixed-size, thread-safe pool with checkout timeout and liveness checks"""
+
+    def __init__(self, factory: Callable[[], Any], size: int = 5, timeout: float = 5.0,
+                 ping_interval: float = 30.0, on_query: Optional[Callable[[str, float], None]] = None):
+        self._factory = factory
+        self.on_query = on_query
+        self.size = size
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self._idle = deque()
+        self._cond = threading.Condition()
+        self._in_use = 0
+        self._created = 0
+        self._discarded = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+
+    def get_connection(self, timeout: Optional[float] = None,
+                       factory: Optional[Callable[[], Any]] = None) -> PooledConnection:
+        """Borrow a live connection, creating one (with `factory`, if given) if the pool is not full yet"""
+        start = time.monotonic()
+        deadline = start + (self.timeout if timeout is None else timeout)
+        waited = False
+        with self._cond:
+            while not self._idle and self._in_use >= self.size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeoutError(
+                        f"No database connection available after {deadline - start:.1f}s "
+                        f"({self._in_use}/{self.size} in use)")
+                waited = True
+                self._cond.wait(remaining)
+            self._in_use += 1
+            self._checkouts += 1
+            entry = self._idle.pop() if self._idle else None
+            if waited:
+                elapsed = time.monotonic() - start
+                self._waits += 1
+                self._wait_time_total += elapsed
+                self._wait_time_max = max(self._wait_time_max, elapsed)
+
+        try:
+            conn = self._checkout(entry, factory or self._factory)
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return PooledConnection(self, conn)
+
+    def open_dedicated(self):
+        """A new connection outside the pool and its size limit; the caller must close it"""
+        return self._factory()
+
+    def _checkout(self, entry, factory: Callable[[], Any]):
+        if entry is not None:
+            conn, last_used = entry
+            if time.monotonic() - last_used < self.ping_interval or self._is_alive(conn):
+                return conn
+            self._discard(conn)
+        conn = factory()
+        with self._cond:
+            self._created += 1
+        return conn
+
+    def _is_alive(self, conn) -> bool:
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception as e:
+            logger.warning(f"Discarding dead pooled connection: {e}")
+            return False
+
+    def _discard(self, conn):
+        with self._cond:
+            self._discarded += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _put(self, conn):
+        healthy = True
+        try:
+            # Never hand the next borrower a half-finished transaction
+            if conn.in_transaction:
+                conn.rollback()
+        except Exception as e:
+            logger.warning(f"Failed to reset pooled connection: {e}")
+            healthy = False
+
+        if not healthy:
+            self._discard(conn)
+        with self._cond:
+            self._in_use -= 1
+            if healthy:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                'size': self.size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'created': self._created,
+                'discarded': self._discarded,
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'timeouts': self._timeouts,
+                'wait_time_total': round(self._wait_time_total, 6),
+                'wait_time_max': round(self._wait_time_max, 6),
+            }
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+        for conn, _ in idle:
+            try:
+                conn.close()
+            except Exception:
+                pass
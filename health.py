@@ -0,0 +1,102 @@
+"""Liveness and readiness checks for load balancers and orchestrators.
+
+/healthz answers from memory: the process is up and serving requests.
+/readyz answers whether this worker can do useful work:
+
+- a pooled connection can be borrowed within READY_POOL_TIMEOUT seconds and
+  answers one query on the tiny schema_version table,
+- the schema is at the version this code expects,
+- the background threads this worker has started are still running.
+
+The result is cached for READY_CACHE_SECONDS, and while one probe refreshes
+it the others get the previous result, so probing every second costs at most
+one short query per cache period and never queues probes behind a slow
+database. A connection opened for the check gets one attempt with a short
+connect timeout instead of the usual retries.
+
+    READY_CACHE_SECONDS=2       seconds a readiness result is reused
+    READY_POOL_TIMEOUT=1        seconds to wait for a pooled connection
+"""
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from init_database import get_probe_connection
+from migrate import latest_version
+import analytics
+import order_feed
+import order_journal
+
+logger = logging.getLogger(__name__)
+
+CACHE_SECONDS = float(os.getenv('READY_CACHE_SECONDS', '2'))
+POOL_TIMEOUT = float(os.getenv('READY_POOL_TIMEOUT', '1'))
+# Migrations ship with the code, so the expected version cannot change at runtime
+EXPECTED_SCHEMA = latest_version()
+
+# Guards the two fields below; never held while checking
+_lock = threading.Lock()
+_cached: Optional[Tuple[float, bool, Dict[str, Any]]] = None
+_checking = False
+
+
+def _check_database() -> Dict[str, Any]:
+    conn = get_probe_connection(POOL_TIMEOUT)
+    try:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT MAX(version) FROM schema_version")
+            current = cursor.fetchone()[0] or 0
+        finally:
+            cursor.close()
+    finally:
+        conn.close()
+    return {'current': current, 'expected': EXPECTED_SCHEMA}
+
+def _check_workers() -> Dict[str, bool]:
+    """Liveness of the background threads this worker depends on; idle ones are left out"""
+    workers = {}
+    if order_journal.enabled():
+        workers['order_journal'] = order_journal.writer_alive()
+    if order_feed.feed.clients():
+        workers['order_feed'] = order_feed.feed.is_alive()
+    if analytics.job.started():
+        workers['analytics'] = analytics.job.is_alive()
+    return workers
+
+def _check() -> Tuple[bool, Dict[str, Any]]:
+    checks: Dict[str, Any] = {}
+    with _lock:
+        previous = _cached
+    try:
+        schema = _check_database()
+        checks['database'] = 'ok'
+        checks['schema'] = schema
+        ready = schema['current'] == schema['expected']
+        # Probes repeat every few seconds; say it once per change
+        if not ready and (previous is None or previous[2].get('schema') != schema):
+            logger.warning(f"Database schema is at version {schema['current']}, code expects "
+                           f"{schema['expected']}; run `python migrate.py apply`")
+    except Exception as e:
+        logger.warning(f"Readiness check could not reach the database: {e}")
+        checks['database'] = str(e)
+        ready = False
+    checks['workers'] = _check_workers()
+    return ready and all(checks['workers'].values()), checks
+
+def readiness() -> Tuple[bool, Dict[str, Any]]:
+    """(ready, per-check details), from cache when recent or while another probe refreshes it"""
+    global _cached, _checking
+    with _lock:
+        if _cached is not None and (_checking or time.monotonic() - _cached[0] < CACHE_SECONDS):
+            return _cached[1], _cached[2]
+        _checking = True
+    try:
+        ready, checks = _check()
+        with _lock:
+            _cached = (time.monotonic(), ready, checks)
+    finally:
+        with _lock:
+            _checking = False
+    return ready, checks
@@ -0,0 +1,126 @@
+import gzip
+import mimetypes
+import os
+from functools import wraps
+from flask import request, current_app, send_from_directory
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only without it
+    brotli = None
+
+# Bodies smaller than this are not worth the CPU or the extra header bytes
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', '6'))
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'image/svg+xml')
+
+# Rendered pages carry per-user navigation and flash messages, so by default
+# browsers may keep them but must revalidate (cheap with the ETag below)
+DEFAULT_HTML_CACHE_CONTROL = {'private': True, 'no_cache': True}
+
+def cache_control(**directives):
+    """Declare a route's Cache-Control, e.g. @cache_control(public=True, max_age=300)"""
+    def decorator(f):
+        # functools.wraps copies __dict__, so this survives outer decorators too
+        f.cache_control = directives
+        return f
+    return decorator
+
+def _accepted_encodings():
+    """Encodings the client accepts, best first"""
+    accepted = request.accept_encodings
+    encodings = []
+    if brotli is not None and accepted['br']:
+        encodings.append('br')
+    if accepted['gzip']:
+        encodings.append('gzip')
+    return encodings
+
+def _preferred_encoding():
+    encodings = _accepted_encodings()
+    return encodings[0] if encodings else None
+
+def _compress(data: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=5)
+    return gzip.compress(data, compresslevel=COMPRESS_LEVEL)
+
+def _apply_cache_policy(response) -> None:
+    view = current_app.view_functions.get(request.endpoint)
+    directives = getattr(view, 'cache_control', None)
+    if directives is None and response.mimetype == 'text/html':
+        directives = DEFAULT_HTML_CACHE_CONTROL
+    for name, value in (directives or {}).items():
+        setattr(response.cache_control, name, value)
+
+def _is_compressible(response) -> bool:
+    return (response.status_code == 200
+            and not response.direct_passthrough
+            and not response.is_streamed
+            and 'Content-Encoding' not in response.headers
+            and response.mimetype.startswith(COMPRESSIBLE_TYPES))
+
+def _fresh_sibling(folder: str, filename: str, extension: str):
+    """Path of a precompressed sibling built from the current source file, else None"""
+    source = safe_join(folder, filename)
+    sibling = safe_join(folder, filename + extension)
+    if not source or not sibling or not os.path.isfile(sibling):
+        return None
+    try:
+        # A source edited after the last build_assets.py run makes its siblings stale
+        if os.path.getmtime(sibling) < os.path.getmtime(source):
+            return None
+    except OSError:
+        return None
+    return sibling
+
+def _static_with_precompressed(static_view):
+    """Serve foo.css.br / foo.css.gz in place of foo.css when the client accepts it"""
+    @wraps(static_view)
+    def serve_static(filename):
+        folder = current_app.static_folder
+        for encoding in _accepted_encodings():
+            extension = {'br': '.br', 'gzip': '.gz'}[encoding]
+            if _fresh_sibling(folder, filename, extension):
+                mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+                response = send_from_directory(
+                    folder, filename + extension, mimetype=mimetype,
+                    max_age=current_app.get_send_file_max_age(filename))
+                response.headers['Content-Encoding'] = encoding
+                response.vary.add('Accept-Encoding')
+                return response
+        response = static_view(filename=filename)
+        response.vary.add('Accept-Encoding')
+        return response
+    return serve_static
+
+def init_http_cache(app) -> None:
+    app.view_functions['static'] = _static_with_precompressed(app.view_functions['static'])
+
+    @app.after_request
+    def compress_and_revalidate(response):
+        if request.endpoint == 'static':
+            return response
+        _apply_cache_policy(response)
+
+        if (request.method in ('GET', 'HEAD') and response.status_code == 200
+                and response.mimetype == 'text/html' and not response.is_streamed):
+            # Weak: the same page stays valid whichever encoding it is sent with
+            response.add_etag(weak=True)
+            response.make_conditional(request)
+            if response.status_code == 304:
+                return response
+
+        if not _is_compressible(response):
+            return response
+        encoding = _preferred_encoding()
+        if encoding is None:
+            return response
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return response
+        response.set_data(_compress(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        return response
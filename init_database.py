@@ -2,26 +2,23 @@ import mysql.connector
 import os
 from dotenv import load_dotenv
 import logging
-from werkzeug.security import generate_password_hash, check_password_hash
-from typing import Optional, Dict, Any, Union
+from typing import Optional, Dict, Any, List, Union
 import time
+import threading
+from flask import g, has_app_context
+from db_pool import ConnectionPool
+from logging_setup import configure_logging
+from metrics import record_query, ORDERS_CREATED
+from password_hasher import hash_password
 
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('database.log'),
-        logging.StreamHandler()
-    ]
-)
+# Configure logging (queued, rotating; see logging_setup.py)
+configure_logging()
 logger = logging.getLogger(__name__)
 
-def get_db_connection():
-    """Create and return a new database connection with retry logic"""
-    max_retries = 3
+def _connect(max_retries: int = 3, connect_timeout: int = 5):
+    """Open a new physical database connection with retry logic"""
     retry_delay = 1  # seconds
 
     for attempt in range(max_retries):
@@ -33,9 +30,12 @@ def get_db_connection():
                 database=os.getenv('DB_NAME', 'digibistro'),
                 port=3306,
                 auth_plugin='mysql_native_password',
-                connect_timeout=5
+                connect_timeout=connect_timeout,
+                # Pooled connections are shared across requests, so reads must not
+                # pin an old snapshot; multi-statement writes use start_transaction()
+                autocommit=True
             )
-            logger.info("Database connection established successfully")
+            logger.debug("Database connection established successfully")
             return conn
         except mysql.connector.Error as err:
             logger.error(f"Database connection attempt {attempt + 1} failed: {err}")
@@ -44,102 +44,109 @@ def get_db_connection():
             time.sleep(retry_delay)
     return None
 
-def create_tables() -> bool:
-    """Create database tables with proper constraints and indexes"""
-    table_definitions = [
-        """CREATE TABLE IF NOT EXISTS users (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            first_name VARCHAR(50) NOT NULL,
-            last_name VARCHAR(50) NOT NULL,
-            username VARCHAR(50) UNIQUE NOT NULL,
-            email VARCHAR(100) UNIQUE NOT NULL,
-            password_hash VARCHAR(255) NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
-        )""",
-
-        """CREATE TABLE IF NOT EXISTS orders (
-            order_id INT AUTO_INCREMENT PRIMARY KEY,
-            customer_name VARCHAR(100) NOT NULL,
-            phone_number VARCHAR(15) NOT NULL,
-            customer_address TEXT NOT NULL,
-            total_price DECIMAL(10,2) NOT NULL,
-            order_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            user_id INT NULL,
-            payment_method VARCHAR(20) NOT NULL,
-            order_code VARCHAR(10) UNIQUE,
-            delivery_fee DECIMAL(10,2) DEFAULT 0,
-            status ENUM('pending', 'processing', 'completed', 'cancelled') DEFAULT 'pending',
-            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL
-        )""",
-
-        """CREATE TABLE IF NOT EXISTS order_items (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            order_id INT NOT NULL,
-            item_name VARCHAR(50) NOT NULL,
-            quantity INT NOT NULL,
-            item_total DECIMAL(10,2) NOT NULL,
-            notes TEXT NULL,
-            FOREIGN KEY (order_id) REFERENCES orders(order_id) ON DELETE CASCADE
-        )"""
-    ]
+_pool = None
+_pool_factory = _connect
+_pool_lock = threading.RLock()
+
+def configure_pool(factory=_connect, size: Optional[int] = None) -> ConnectionPool:
+    """(Re)create the process-wide pool, optionally with another connection factory.
+
+    Benchmarks use this to point the app at a local stand-in database.
+    """
+    global _pool, _pool_factory
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+        _pool = ConnectionPool(
+            factory,
+            size=size or int(os.getenv('DB_POOL_SIZE', '5')),
+            timeout=float(os.getenv('DB_POOL_TIMEOUT', '5')),
+            ping_interval=float(os.getenv('DB_POOL_PING_INTERVAL', '30')),
+            on_query=record_query
+        )
+        _pool_factory = factory
+    return _pool
+
+def get_pool() -> ConnectionPool:
+    """Return the process-wide connection pool, creating it on first use"""
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                configure_pool()
+    return _pool
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Snapshot of pool utilisation (in use, idle, waits, connections created)"""
+    return get_pool().stats()
+
+def get_db_connection():
+    """Borrow a pooled database connection.
+
+    Inside a Flask app context the same connection is reused for the whole
+    request and only returned to the pool by close_db_connection(); calling
+    close() on it is a no-op. Outside a request close() returns it directly.
+    """
+    if has_app_context():
+        conn = g.get('db_conn')
+        if conn is None:
+            conn = get_pool().get_connection()
+            conn.request_scoped = True
+            g.db_conn = conn
+        return conn
+    return get_pool().get_connection()
+
+def _probe_factory(timeout: float):
+    """The pool's connection factory, limited to one attempt with a short connect timeout"""
+    if _pool_factory is _connect:
+        return lambda: _connect(max_retries=1, connect_timeout=max(1, round(timeout)))
+    return _pool_factory
+
+def get_probe_connection(timeout: float):
+    """Borrow a pooled connection for a health probe, spending at most about `timeout` seconds.
 
+    Outside the request scope, so the caller must close it. A connection that has
+    to be opened gets a single attempt with a short connect timeout.
+    """
+    return get_pool().get_connection(timeout=timeout, factory=_probe_factory(timeout))
+
+def open_probe_connection(timeout: float):
+    """Open a single-attempt connection outside the pool, e.g. for a check at startup.
+
+    Nothing is left in the pool, so a server that forks after importing the app
+    does not hand the same socket to every worker. The caller must close it.
+    """
+    return _probe_factory(timeout)()
+
+def get_dedicated_connection():
+    """Open a connection that does not count against the pool, for long streaming reads.
+
+    The caller must close it. Use sparingly and bound how many are open.
+    """
+    return get_pool().open_dedicated()
+
+def close_db_connection(exc: Optional[BaseException] = None) -> None:
+    """Teardown hook: return the request's connection to the pool"""
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        conn.release()
+
+def create_tables() -> bool:
+    """Bring the schema up to date by applying pending migrations (see migrate.py)"""
+    from migrate import apply
     try:
-        conn = get_db_connection()
-        if conn:
-            cursor = conn.cursor()
-            
-            # Create tables
-            for table_def in table_definitions:
-                try:
-                    cursor.execute(table_def)
-                except mysql.connector.Error as e:
-                    logger.error(f"Error executing table creation: {e}")
-                    raise
-            
-            # Check and add is_admin column if not exists
-            cursor.execute("""
-                SELECT COUNT(*) FROM information_schema.columns 
-                WHERE table_schema = DATABASE() 
-                AND table_name = 'users' 
-                AND column_name = 'is_admin'
-            """)
-            if cursor.fetchone()[0] == 0:
-                cursor.execute("ALTER TABLE users ADD COLUMN is_admin BOOLEAN DEFAULT FALSE")
-                logger.info("Added is_admin column to users table")
-
-            # Check and add admin_notes column if not exists
-            cursor.execute("""
-                SELECT COUNT(*) FROM information_schema.columns 
-                WHERE table_schema = DATABASE() 
-                AND table_name = 'orders' 
-                AND column_name = 'admin_notes'
-            """)
-            if cursor.fetchone()[0] == 0:
-                cursor.execute("ALTER TABLE orders ADD COLUMN admin_notes TEXT NULL")
-                logger.info("Added admin_notes column to orders table")
-            
-            conn.commit()
-            cursor.close()
-            conn.close()
-            logger.info("Tables created/verified successfully")
-            return True
+        applied = apply()
+        logger.info(f"Tables created/verified successfully (applied migrations: {applied or 'none'})")
+        return True
     except mysql.connector.Error as err:
         logger.error(f"Error creating tables: {err}", exc_info=True)
-        if conn:
-            conn.rollback()
         return False
     except Exception as e:
         logger.error(f"Unexpected error: {e}", exc_info=True)
         return False
-    finally:
-        if conn and conn.is_connected():
-            cursor.close()
-            conn.close()
 
 def save_user(first_name: str, last_name: str, username: str, email: str, password: str) -> Optional[int]:
-    """Save a new user with hashed password"""
-    password_hash = generate_password_hash(password)
+    """Save a new user with hashed password (raises HasherBusyError when hashing is saturated)"""
+    password_hash = hash_password(password)
     try:
         conn = get_db_connection()
         if conn:
@@ -160,6 +167,20 @@ def save_user(first_name: str, last_name: str, username: str, email: str, passwo
         logger.error(f"Error saving user: {e}", exc_info=True)
         return None
 
+def update_password_hash(user_id: int, password_hash: str) -> bool:
+    """Replace a user's stored hash, e.g. after the hash cost changed"""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("UPDATE users SET password_hash = %s WHERE id = %s", (password_hash, user_id))
+        conn.commit()
+        cursor.close()
+        conn.close()
+        return True
+    except Exception as e:
+        logger.error(f"Error updating password hash for user {user_id}: {e}", exc_info=True)
+        return False
+
 def get_user(username: str) -> Optional[Dict[str, Any]]:
     """Retrieve user by username"""
     try:
@@ -238,6 +259,7 @@ def save_order_to_db(
                            VALUES (%s, %s, %s, %s)''', items)
 
         conn.commit()
+        ORDERS_CREATED.inc(payment_method=payment_method)
         logger.info(f"Order {order_id} committed successfully")
         return order_id
 
@@ -257,26 +279,61 @@ def save_order_to_db(
                 cursor.close()
                 conn.close()
 
-def test_order_insertion() -> str:
-    """Test order insertion functionality"""
+ORDER_BATCH_COLUMNS = ('customer_name', 'phone_number', 'customer_address', 'total_price', 'order_date',
+                       'user_id', 'payment_method', 'order_code', 'delivery_fee', 'status')
+
+def save_orders_batch(orders: List[Dict[str, Any]]) -> List[str]:
+    """Insert many orders and their items in one transaction with multi-row INSERTs.
+
+    Each order is a dict with ORDER_BATCH_COLUMNS plus 'items' as
+    [(item_name, quantity, item_total), ...]. Orders whose code is already in
+    the table are skipped, so replaying a batch is harmless. Returns the codes
+    actually inserted; raises on failure after rolling back.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
     try:
-        order_id = save_order_to_db(
-            customer_name="Test Customer",
-            phone_number="1234567890",
-            customer_address="123 Test Street",
-            order_details={"Pasta": {"quantity": 2, "item_total": 240.00}},
-            total_price=250.00,
-            user_id=1,
-            payment_method="cash_on_delivery",
-            order_code="TEST01",
-            delivery_fee=10.00
-        )
+        conn.start_transaction()
+        codes = [order['order_code'] for order in orders]
+        placeholders = ', '.join(['%s'] * len(codes))
+        cursor.execute(f"SELECT order_code FROM orders WHERE order_code IN ({placeholders})", codes)
+        existing = {row[0] for row in cursor.fetchall()}
+        fresh = [order for order in orders if order['order_code'] not in existing]
+        if existing:
+            logger.info(f"Skipping {len(existing)} already stored orders")
+        if not fresh:
+            conn.commit()
+            return []
 
-        if order_id:
-            return f"Success - Order ID: {order_id}"
-        return "Failed - Order ID not returned"
-    except Exception as e:
-        return f"Error: {str(e)}"
+        row = f"({', '.join(['%s'] * len(ORDER_BATCH_COLUMNS))})"
+        cursor.execute(
+            f"INSERT INTO orders ({', '.join(ORDER_BATCH_COLUMNS)}) VALUES {', '.join([row] * len(fresh))}",
+            [order[column] for order in fresh for column in ORDER_BATCH_COLUMNS])
+
+        # Auto-increment IDs of a multi-row insert are not guaranteed consecutive
+        fresh_codes = [order['order_code'] for order in fresh]
+        cursor.execute(f"SELECT order_code, order_id FROM orders WHERE order_code IN "
+                       f"({', '.join(['%s'] * len(fresh_codes))})", fresh_codes)
+        ids = dict(cursor.fetchall())
+
+        items = [(ids[order['order_code']], name, quantity, item_total)
+                 for order in fresh for name, quantity, item_total in order['items']]
+        if items:
+            cursor.execute(
+                f"INSERT INTO order_items (order_id, item_name, quantity, item_total) VALUES "
+                f"{', '.join(['(%s, %s, %s, %s)'] * len(items))}",
+                [value for item in items for value in item])
+
+        conn.commit()
+        for order in fresh:
+            ORDERS_CREATED.inc(payment_method=order['payment_method'])
+        return fresh_codes
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
 
 # Initialize tables when module is imported
 if __name__ == '__main__':
@@ -0,0 +1,218 @@
+"""Kitchen prep board: the open orders in cooking order and how much of each item is still to make.
+
+Each worker keeps the board in memory. It is loaded from the database the
+first time the worker serves the kitchen page (open orders through
+idx_orders_status_date, their items in batched IN queries) and from then on
+maintained incrementally:
+
+- order_created() when order_details has stored an order,
+- status_changed() when an admin moves an order on its detail page,
+- a catch-up read of orders changed since the last one (orders.updated_at,
+  as the dashboard's live feed does) before the board is served, at most
+  every KITCHEN_SYNC_INTERVAL seconds. This picks up what other workers
+  did: their orders, bulk updates, journaled orders written in batches.
+
+    KITCHEN_SYNC_INTERVAL=2     seconds between catch-up reads
+    KITCHEN_QUEUE_LIMIT=50      orders shown on the board
+
+Orders being prepared come first, then pending orders oldest first. The
+queue is a heap with lazy deletion, so a status change costs O(log n) and
+the per-item totals are adjusted by the order's own items only.
+"""
+import heapq
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from init_database import get_db_connection
+from metrics import register_callback
+from order_queries import (OPEN_STATUSES, attach_order_items, fetch_feed_watermark, fetch_open_orders,
+                           fetch_order_changes)
+
+logger = logging.getLogger(__name__)
+
+SYNC_INTERVAL = float(os.getenv('KITCHEN_SYNC_INTERVAL', '2'))
+QUEUE_LIMIT = int(os.getenv('KITCHEN_QUEUE_LIMIT', '50'))
+# Rows from transactions that committed late still fall inside the next read
+LOOKBACK = timedelta(seconds=5)
+SYNC_LIMIT = 1000
+# Cooking order: lower rank first, then oldest first
+RANK = {'processing': 0, 'pending': 1}
+
+
+class KitchenBoard:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._orders: Dict[int, Dict[str, Any]] = {}
+        self._heap: List[Tuple[int, datetime, int, int]] = []
+        self._outstanding: Counter = Counter()
+        self._stamp = 0
+        self._pid: Optional[int] = None
+        self._last_id = 0
+        self._newest: Optional[datetime] = None
+        self._synced = 0.0
+        self.syncs = 0
+
+    # --- state -----------------------------------------------------------
+
+    def _push(self, order: Dict[str, Any]) -> None:
+        self._stamp += 1
+        order['stamp'] = self._stamp
+        heapq.heappush(self._heap, (RANK[order['status']], order['order_date'], order['order_id'], self._stamp))
+
+    def _add(self, order: Dict[str, Any]) -> None:
+        if order['order_id'] in self._orders:
+            return
+        self._orders[order['order_id']] = order
+        for item in order['items']:
+            self._outstanding[item['item_name']] += item['quantity']
+        self._push(order)
+
+    def _remove(self, order_id: int) -> None:
+        order = self._orders.pop(order_id, None)
+        if order is None:
+            return
+        for item in order['items']:
+            self._outstanding[item['item_name']] -= item['quantity']
+            if self._outstanding[item['item_name']] <= 0:
+                del self._outstanding[item['item_name']]
+        # Its heap entry is skipped from now on; compact once dead entries dominate
+        if len(self._heap) > 2 * len(self._orders) + 64:
+            self._heap = [entry for entry in self._heap if self._live(entry)]
+            heapq.heapify(self._heap)
+
+    def _set_status(self, order_id: int, status: str) -> None:
+        order = self._orders.get(order_id)
+        if status not in OPEN_STATUSES:
+            self._remove(order_id)
+        elif order is not None and order['status'] != status:
+            order['status'] = status
+            self._push(order)
+
+    def _live(self, entry: Tuple[int, datetime, int, int]) -> bool:
+        order = self._orders.get(entry[2])
+        return order is not None and order['stamp'] == entry[3]
+
+    # --- loading and catching up -----------------------------------------
+
+    def loaded(self) -> bool:
+        return self._pid == os.getpid()
+
+    def load(self) -> None:
+        """Rebuild the board from the open orders in the database"""
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            with self._lock:
+                # Watermark first: anything that changes during the load is caught up next time
+                last_id, newest = fetch_feed_watermark(cursor)
+                orders = fetch_open_orders(cursor)
+                self._orders, self._heap, self._outstanding = {}, [], Counter()
+                for order in orders:
+                    self._add(order)
+                self._last_id, self._newest = last_id, newest
+                self._synced = time.monotonic()
+                self._pid = os.getpid()
+        finally:
+            cursor.close()
+            conn.close()
+        logger.info(f"Kitchen board loaded with {len(orders)} open orders")
+
+    def sync(self) -> None:
+        """Apply orders created or changed since the last read, by any worker"""
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            with self._lock:
+                since = self._newest - LOOKBACK if self._newest else None
+                rows = fetch_order_changes(cursor, self._last_id, since, SYNC_LIMIT)
+                if len(rows) >= SYNC_LIMIT:
+                    # A bulk update or a long gap: reloading is cheaper than replaying it
+                    self._pid = None
+                    self.load()
+                    return
+                arrived = [{key: row[key] for key in ('order_id', 'order_code', 'customer_name',
+                                                      'order_date', 'status')}
+                           for row in rows if row['status'] in OPEN_STATUSES and row['order_id'] not in self._orders]
+                attach_order_items(cursor, arrived)
+                for order in arrived:
+                    self._add(order)
+                for row in rows:
+                    self._set_status(row['order_id'], row['status'])
+                if rows:
+                    self._last_id = max(self._last_id, max(row['order_id'] for row in rows))
+                    self._newest = max([row['updated_at'] for row in rows] + ([self._newest] if self._newest else []))
+                self._synced = time.monotonic()
+                self.syncs += 1
+        finally:
+            cursor.close()
+            conn.close()
+
+    # --- hooks -----------------------------------------------------------
+
+    def order_created(self, order_id: int, order_code: str, customer_name: str,
+                      items: Dict[str, Dict[str, Any]], order_date: Optional[datetime] = None) -> None:
+        """Put a just-stored order on the board; `items` maps item name to its 'quantity'"""
+        with self._lock:
+            # Not loaded yet, or already seen by a catch-up read: the database copy counts
+            if not self.loaded() or order_id <= self._last_id:
+                return
+            self._add({
+                'order_id': order_id,
+                'order_code': order_code,
+                'customer_name': customer_name,
+                'order_date': order_date or datetime.now(),
+                'status': 'pending',
+                'items': [{'item_name': name, 'quantity': details['quantity'], 'notes': None}
+                          for name, details in items.items()],
+            })
+
+    def status_changed(self, order_id: int, status: str) -> None:
+        """Move an order after an admin changed its status; reopened orders arrive with the next read"""
+        with self._lock:
+            if self.loaded():
+                self._set_status(order_id, status)
+
+    # --- reading ---------------------------------------------------------
+
+    def snapshot(self, limit: int = QUEUE_LIMIT) -> Dict[str, Any]:
+        """Outstanding quantities per item and the first `limit` orders to prepare"""
+        with self._lock:
+            # Other pages never pay for the load; until it is done the hooks are no-ops
+            if not self.loaded():
+                self.load()
+        if time.monotonic() - self._synced >= SYNC_INTERVAL:
+            self.sync()
+        now = datetime.now()
+        with self._lock:
+            queue = heapq.nsmallest(limit, (entry for entry in self._heap if self._live(entry)))
+            orders = [self._orders[entry[2]] for entry in queue]
+            return {
+                'open_orders': len(self._orders),
+                'outstanding': [{'item_name': name, 'quantity': quantity}
+                                for name, quantity in self._outstanding.most_common()],
+                'queue': [{
+                    'order_id': order['order_id'],
+                    'order_code': order['order_code'],
+                    'customer_name': order['customer_name'],
+                    'placed': order['order_date'].strftime('%H:%M'),
+                    'waiting_minutes': max(0, int((now - order['order_date']).total_seconds() // 60)),
+                    'status': order['status'],
+                    'items': [{'item_name': item['item_name'], 'quantity': item['quantity'],
+                               'notes': item['notes']} for item in order['items']],
+                } for order in orders],
+            }
+
+    def open_orders(self) -> int:
+        return len(self._orders)
+
+board = KitchenBoard()
+
+def _board_samples():
+    yield 'kitchen_open_orders', 'gauge', 'Orders on this worker\'s kitchen board', board.open_orders()
+    yield 'kitchen_syncs_total', 'counter', 'Kitchen board catch-up reads by this worker', board.syncs
+
+register_callback(_board_samples)
@@ -0,0 +1,172 @@
+"""Non-blocking logging: request threads only enqueue records, a background
+QueueListener thread formats and writes them.
+
+Database modules log to database.log, everything else to app.log, both as
+JSON lines with the request ID attached. Configured from the environment:
+
+    LOG_LEVEL=INFO                      root level
+    LOG_LEVELS=werkzeug=WARNING,...     per-logger levels
+    LOG_SAMPLE=init_database=0.1,...    keep this fraction of INFO/DEBUG records
+    LOG_DIR=.                           where app.log/database.log go
+    LOG_ROTATE=size                     'size' or 'time'
+    LOG_MAX_BYTES=10485760              size rotation threshold
+    LOG_ROTATE_WHEN=midnight            time rotation interval
+    LOG_BACKUP_COUNT=5                  rotated files to keep
+
+Rotation is per process; with several workers give each its own LOG_DIR.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from flask import g, has_app_context, request
+
+DB_LOGGERS = ('init_database', 'db_pool', 'migrate', 'slow_query')
+CONSOLE_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s'
+
+# LogRecord attributes that are not user-supplied `extra` fields
+_STANDARD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'request_id'}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_lock = threading.Lock()
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamp records with the current request's ID (runs on the request thread)"""
+
+    def filter(self, record):
+        if not hasattr(record, 'request_id'):
+            record.request_id = g.get('request_id', '-') if has_app_context() else '-'
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of INFO/DEBUG records from noisy loggers; never drops warnings"""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(record.name)
+        return rate is None or random.random() < rate
+
+
+class LoggerNameFilter(logging.Filter):
+    """Route records by logger name: include=True keeps only `names`, False drops them"""
+
+    def __init__(self, names, include: bool):
+        super().__init__()
+        self.names = tuple(names)
+        self.include = include
+
+    def filter(self, record):
+        matched = record.name in self.names or record.name.startswith(tuple(n + '.' for n in self.names))
+        return matched == self.include
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'request_id': getattr(record, 'request_id', '-'),
+            'thread': record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS:
+                entry[key] = value
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Like QueueHandler, but keeps the traceback separate instead of folding it into msg"""
+
+    def prepare(self, record):
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+def _parse_mapping(value: str) -> Dict[str, str]:
+    mapping = {}
+    for part in value.split(','):
+        if '=' in part:
+            key, _, val = part.partition('=')
+            mapping[key.strip()] = val.strip()
+    return mapping
+
+def _file_handler(filename: str) -> logging.Handler:
+    path = os.path.join(os.getenv('LOG_DIR', '.'), filename)
+    backups = int(os.getenv('LOG_BACKUP_COUNT', '5'))
+    if os.getenv('LOG_ROTATE', 'size') == 'time':
+        handler = logging.handlers.TimedRotatingFileHandler(
+            path, when=os.getenv('LOG_ROTATE_WHEN', 'midnight'), backupCount=backups, delay=True)
+    else:
+        handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=int(os.getenv('LOG_MAX_BYTES', str(10 * 1024 * 1024))),
+            backupCount=backups, delay=True)
+    handler.setFormatter(JsonFormatter())
+    return handler
+
+def configure_logging() -> None:
+    """Install the queue-based logging setup once per process"""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
+
+        app_handler = _file_handler('app.log')
+        app_handler.addFilter(LoggerNameFilter(DB_LOGGERS, include=False))
+        db_handler = _file_handler('database.log')
+        db_handler.addFilter(LoggerNameFilter(DB_LOGGERS, include=True))
+        console = logging.StreamHandler()
+        console.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+
+        log_queue = queue.Queue(-1)
+        queue_handler = _QueueHandler(log_queue)
+        queue_handler.addFilter(RequestIdFilter())
+        sample_rates = {name: float(rate) for name, rate in _parse_mapping(os.getenv('LOG_SAMPLE', '')).items()}
+        if sample_rates:
+            queue_handler.addFilter(SamplingFilter(sample_rates))
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+        root.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+        for name, level in _parse_mapping(os.getenv('LOG_LEVELS', '')).items():
+            logging.getLogger(name).setLevel(level.upper())
+
+        _listener = logging.handlers.QueueListener(
+            log_queue, app_handler, db_handler, console, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+def init_request_ids(app) -> None:
+    """Give every request an ID (honouring an upstream X-Request-ID) for log correlation"""
+    @app.before_request
+    def assign_request_id():
+        g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+
+    @app.after_request
+    def echo_request_id(response):
+        response.headers['X-Request-ID'] = g.get('request_id', '')
+        return response
@@ -0,0 +1,142 @@
+import os
+import threading
+import logging
+from typing import Optional, Dict, Any, List
+from init_database import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+# How often each worker polls catalog_version; bounds how stale a price can be
+CATALOG_REFRESH_INTERVAL = float(os.getenv('CATALOG_REFRESH_INTERVAL', '5'))
+
+
+class MenuCatalog:
+    """In-process copy of menu_items, reloaded only when catalog_version changes"""
+
+    def __init__(self, refresh_interval: float = CATALOG_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self.version = None
+        self._by_name: Dict[str, Dict[str, Any]] = {}
+        self._ordered: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid: Optional[int] = None
+
+    def _read_version(self, cursor) -> int:
+        cursor.execute("SELECT version FROM catalog_version WHERE id = 1")
+        row = cursor.fetchone()
+        return row['version'] if row else 0
+
+    def refresh(self, force: bool = False) -> bool:
+        """Reload the catalog if its version moved; returns True when reloaded"""
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            version = self._read_version(cursor)
+            if not force and version == self.version:
+                return False
+            cursor.execute("""
+                SELECT name, category, price, is_available, description, image
+                FROM menu_items
+                ORDER BY sort_order, name
+            """)
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+
+        items = [{**row, 'price': float(row['price']), 'is_available': bool(row['is_available'])}
+                 for row in rows]
+        with self._lock:
+            # Swap whole structures so readers never see a half-built catalog
+            self._ordered = items
+            self._by_name = {item['name']: item for item in items}
+            self.version = version
+        logger.info(f"Menu catalog loaded at version {version} ({len(items)} items)")
+        return True
+
+    def ensure_loaded(self) -> None:
+        if self.version is None:
+            with self._load_lock:
+                if self.version is None:
+                    self.refresh(force=True)
+        # A worker forked after the catalog was loaded (e.g. gunicorn --preload) needs its own poller
+        if self._pid != os.getpid():
+            self.start()
+
+    def start(self) -> None:
+        """Start (or, after a fork, restart) this process's background poller (idempotent)"""
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='menu-catalog', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def is_alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                # Keep serving the last good catalog until the database is back
+                logger.error(f"Menu catalog refresh failed: {e}")
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        self.ensure_loaded()
+        return self._by_name.get(name)
+
+    def price(self, name: str) -> Optional[float]:
+        """Current price of an available item, or None if unknown/unavailable"""
+        item = self.get(name)
+        if item is None or not item['is_available']:
+            return None
+        return item['price']
+
+    def items(self, available_only: bool = True) -> List[Dict[str, Any]]:
+        self.ensure_loaded()
+        items = self._ordered
+        return [item for item in items if item['is_available']] if available_only else list(items)
+
+    def update_item(self, name: str, price: Optional[float] = None,
+                    is_available: Optional[bool] = None) -> bool:
+        """Change an item and bump catalog_version in one transaction"""
+        assignments, params = [], []
+        if price is not None:
+            assignments.append("price = %s")
+            params.append(price)
+        if is_available is not None:
+            assignments.append("is_available = %s")
+            params.append(is_available)
+        if not assignments or self.get(name) is None:
+            return False
+
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            conn.start_transaction()
+            cursor.execute(f"UPDATE menu_items SET {', '.join(assignments)} WHERE name = %s",
+                           (*params, name))
+            cursor.execute("UPDATE catalog_version SET version = version + 1 WHERE id = 1")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+        # This worker sees the change at once; the others on their next poll
+        self.refresh(force=True)
+        return True
+
+
+catalog = MenuCatalog()
@@ -0,0 +1,242 @@
+"""In-process metrics in Prometheus text exposition format, plus per-request
+database query instrumentation.
+
+Metrics live in each worker process; with several workers scrape each one
+(or put them behind a per-worker port).
+"""
+import logging
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from flask import g, has_app_context, request, Response
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger('slow_query')
+
+SLOW_QUERY_SECONDS = float(os.getenv('SLOW_QUERY_SECONDS', '0.2'))
+INF_BUCKET = 'le="+Inf"'
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry: List['_Metric'] = []
+_callbacks: List[Callable[[], Iterable[Tuple[str, str, str, float]]]] = []
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    type_name = ''
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, '')) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    type_name = 'counter'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {v}" for k, v in items]
+
+
+class Histogram(_Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(v[0]), v[1], v[2]) for k, v in self._values.items()]
+        lines = []
+        for key, counts, total, count in items:
+            for bound, bucket_count in zip(self.buckets, counts):
+                labels = _format_labels(self.labelnames, key, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {bucket_count}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, INF_BUCKET)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+def register_callback(fn: Callable[[], Iterable[Tuple[str, str, str, float]]]) -> None:
+    """Add a collector yielding (name, type, help, value) samples at scrape time"""
+    _callbacks.append(fn)
+
+def render_metrics() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    for fn in _callbacks:
+        try:
+            for name, type_name, help_text, value in fn():
+                lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} {type_name}",
+                              f"{name} {value}"])
+        except Exception as e:
+            logger.error(f"Metrics callback failed: {e}")
+    return '\n'.join(lines) + '\n'
+
+
+REQUEST_DURATION = Histogram('http_request_duration_seconds', 'Request latency by route',
+                             ('endpoint', 'method', 'status'))
+REQUEST_DB_TIME = Histogram('http_request_db_seconds', 'Database time spent per request',
+                            ('endpoint',))
+REQUEST_QUERIES = Histogram('http_request_db_queries', 'Queries executed per request', ('endpoint',),
+                            buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50))
+QUERY_DURATION = Histogram('db_query_duration_seconds', 'Duration of individual statements')
+SLOW_QUERIES = Counter('db_slow_queries_total', 'Statements slower than SLOW_QUERY_SECONDS')
+ORDERS_CREATED = Counter('orders_created_total', 'Orders committed to the database', ('payment_method',))
+LOGIN_DURATION = Histogram('auth_login_duration_seconds', 'Login POST latency by outcome', ('outcome',))
+PASSWORD_HASH_DURATION = Histogram('password_hash_seconds', 'Time spent hashing in the pool', ('operation',))
+PASSWORD_HASH_QUEUE_TIME = Histogram('password_hash_queue_seconds', 'Time waiting for a hashing process',
+                                     ('operation',))
+PASSWORD_HASH_REJECTED = Counter('password_hash_rejected_total', 'Operations refused with a full queue',
+                                 ('operation',))
+ORDER_BATCH_SIZE = Histogram('order_journal_batch_size', 'Orders stored per write-behind transaction',
+                             buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500))
+ORDER_BATCH_SECONDS = Histogram('order_journal_batch_seconds', 'Duration of write-behind transactions')
+ORDER_JOURNAL_FAILED = Counter('order_journal_failed_total', 'Journaled orders the database rejected')
+ORDER_DETAIL_CACHE = Counter('order_detail_cache_total', 'Order detail renders by cache result',
+                             ('view', 'result'))
+ANALYTICS_JOB_SECONDS = Histogram('analytics_job_seconds', 'Duration of analytics background jobs', ('job',),
+                                  buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0))
+
+
+_LITERALS = [
+    (re.compile(r"'(?:[^'\\]|\\.)*'"), '?'),
+    (re.compile(r'"(?:[^"\\]|\\.)*"'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)'), '(?+)'),
+    (re.compile(r'\s+'), ' '),
+]
+
+def normalize_sql(statement: str) -> str:
+    """Strip literals and placeholders so similar statements group together"""
+    for pattern, replacement in _LITERALS:
+        statement = pattern.sub(replacement, statement)
+    return statement.strip()
+
+def record_query(statement: str, seconds: float) -> None:
+    """Called by the instrumented cursor after every statement"""
+    QUERY_DURATION.observe(seconds)
+    if seconds >= SLOW_QUERY_SECONDS:
+        SLOW_QUERIES.inc()
+        slow_query_logger.warning(f"Slow query ({seconds * 1000:.1f} ms): {normalize_sql(statement)}",
+                                  extra={'duration_ms': round(seconds * 1000, 1)})
+    if has_app_context():
+        stats = g.get('db_stats')
+        if stats is None:
+            stats = g.db_stats = {'queries': 0, 'seconds': 0.0, 'slowest': 0.0, 'slowest_sql': None}
+        stats['queries'] += 1
+        stats['seconds'] += seconds
+        if seconds > stats['slowest']:
+            stats['slowest'] = seconds
+            stats['slowest_sql'] = statement
+
+def query_stats() -> Optional[Dict]:
+    """This request's query count, total DB time and slowest statement"""
+    return g.get('db_stats')
+
+def init_metrics(app, pool_stats: Callable[[], Dict], is_admin: Callable[[], bool]) -> None:
+    """Time every request and serve /metrics to a scraper with METRICS_TOKEN or an admin session"""
+    token = os.getenv('METRICS_TOKEN')
+    # Query counts and DB time say a lot about the schema; by default only admins see them
+    timing_for_all = os.getenv('SERVER_TIMING') == 'all'
+
+    def admin_session() -> bool:
+        try:
+            return is_admin()
+        except Exception as e:
+            # Never turn a response (possibly already an error page) into a 500 over a header
+            logger.warning(f"Could not check roles for metrics: {e}")
+            return False
+
+    def pool_samples():
+        stats = pool_stats()
+        yield 'db_pool_size', 'gauge', 'Configured pool size', stats['size']
+        yield 'db_pool_in_use', 'gauge', 'Connections checked out', stats['in_use']
+        yield 'db_pool_idle', 'gauge', 'Idle pooled connections', stats['idle']
+        yield 'db_pool_connections_created_total', 'counter', 'Physical connections opened', stats['created']
+        yield 'db_pool_waits_total', 'counter', 'Checkouts that had to wait', stats['waits']
+        yield 'db_pool_wait_seconds_total', 'counter', 'Time spent waiting for a connection', stats['wait_time_total']
+        yield 'db_pool_timeouts_total', 'counter', 'Checkouts that timed out', stats['timeouts']
+    register_callback(pool_samples)
+
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def observe_request(response):
+        started = g.get('request_started')
+        if started is None:
+            return response
+        endpoint = request.endpoint or 'unmatched'
+        elapsed = time.perf_counter() - started
+        REQUEST_DURATION.observe(elapsed, endpoint=endpoint, method=request.method,
+                                 status=response.status_code)
+        stats = g.get('db_stats') or {'queries': 0, 'seconds': 0.0}
+        REQUEST_DB_TIME.observe(stats['seconds'], endpoint=endpoint)
+        REQUEST_QUERIES.observe(stats['queries'], endpoint=endpoint)
+        if stats.get('slowest_sql'):
+            logger.debug(f"{endpoint}: {stats['queries']} queries, {stats['seconds'] * 1000:.1f} ms DB; "
+                         f"slowest {stats['slowest'] * 1000:.1f} ms: {normalize_sql(stats['slowest_sql'])}")
+        if timing_for_all or admin_session():
+            response.headers['Server-Timing'] = (
+                f'db;dur={stats["seconds"] * 1000:.1f};desc="{stats["queries"]} queries", '
+                f'total;dur={elapsed * 1000:.1f}')
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        scraper = token and request.headers.get('Authorization') == f'Bearer {token}'
+        if not scraper and not admin_session():
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+        return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
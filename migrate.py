@@ -0,0 +1,159 @@
+"""Versioned schema migrations.
+
+Migrations live in migrations/NNNN_name.py and define up(cursor) and
+down(cursor). Applied versions are recorded in the schema_version table.
+
+    python migrate.py status
+    python migrate.py apply [--to VERSION]
+    python migrate.py rollback [--to VERSION]
+
+MySQL commits DDL implicitly, so each migration is recorded as soon as it
+has run; a migration that fails halfway must be repaired by hand.
+"""
+import argparse
+import importlib.util
+import logging
+import os
+import re
+from typing import List, NamedTuple, Optional, Tuple
+from init_database import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    path: str
+
+    def load(self):
+        spec = importlib.util.spec_from_file_location(f"migration_{self.version:04d}", self.path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+
+def discover() -> List[Migration]:
+    """All migration files, ordered by version"""
+    migrations = []
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = re.match(r'^(\d{4})_(\w+)\.py$', filename)
+        if match:
+            migrations.append(Migration(int(match.group(1)), match.group(2),
+                                        os.path.join(MIGRATIONS_DIR, filename)))
+    return sorted(migrations)
+
+def latest_version() -> int:
+    migrations = discover()
+    return migrations[-1].version if migrations else 0
+
+def _ensure_version_table(cursor) -> None:
+    cursor.execute("""CREATE TABLE IF NOT EXISTS schema_version (
+        version INT PRIMARY KEY,
+        name VARCHAR(100) NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""")
+
+def _applied_versions(cursor) -> List[int]:
+    cursor.execute("SELECT version FROM schema_version ORDER BY version")
+    return [row[0] for row in cursor.fetchall()]
+
+def apply(target: Optional[int] = None) -> List[int]:
+    """Apply pending migrations up to `target` (default: latest); returns applied versions"""
+    conn = get_db_connection()
+    cursor = conn.cursor(buffered=True)
+    try:
+        _ensure_version_table(cursor)
+        applied = set(_applied_versions(cursor))
+        done = []
+        for migration in discover():
+            if migration.version in applied:
+                continue
+            if target is not None and migration.version > target:
+                break
+            logger.info(f"Applying migration {migration.version:04d}_{migration.name}")
+            migration.load().up(cursor)
+            cursor.execute("INSERT INTO schema_version (version, name) VALUES (%s, %s)",
+                           (migration.version, migration.name))
+            conn.commit()
+            done.append(migration.version)
+        return done
+    finally:
+        cursor.close()
+        conn.close()
+
+def rollback(target: Optional[int] = None) -> List[int]:
+    """Revert migrations above `target` (default: only the newest); returns reverted versions"""
+    conn = get_db_connection()
+    cursor = conn.cursor(buffered=True)
+    try:
+        _ensure_version_table(cursor)
+        applied = _applied_versions(cursor)
+        if not applied:
+            return []
+        if target is None:
+            target = applied[-2] if len(applied) > 1 else 0
+        by_version = {m.version: m for m in discover()}
+        done = []
+        for version in reversed(applied):
+            if version <= target:
+                break
+            migration = by_version.get(version)
+            if migration is None:
+                raise RuntimeError(f"Migration file for version {version} is missing")
+            logger.info(f"Reverting migration {migration.version:04d}_{migration.name}")
+            migration.load().down(cursor)
+            cursor.execute("DELETE FROM schema_version WHERE version = %s", (version,))
+            conn.commit()
+            done.append(version)
+        return done
+    finally:
+        cursor.close()
+        conn.close()
+
+def current_version(conn=None) -> int:
+    """Highest applied version in a single query; 0 if nothing has been applied.
+
+    Reads through `conn` if given (and closes it), else a pooled connection.
+    """
+    conn = conn or get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT MAX(version) FROM schema_version")
+        row = cursor.fetchone()
+        return (row[0] or 0) if row else 0
+    except Exception as e:
+        # Missing schema_version table: treat as an unmigrated database
+        logger.warning(f"Could not read schema version: {e}")
+        return 0
+    finally:
+        cursor.close()
+        conn.close()
+
+def check_schema(conn=None) -> Tuple[int, int]:
+    """Startup check: returns (current, expected) and logs when they differ"""
+    current, expected = current_version(conn), latest_version()
+    if current < expected:
+        logger.warning(f"Database schema is at version {current}, code expects {expected}; "
+                       f"run `python migrate.py apply`")
+    elif current > expected:
+        logger.warning(f"Database schema version {current} is newer than this code ({expected})")
+    return current, expected
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply or roll back schema migrations")
+    parser.add_argument('command', choices=['status', 'apply', 'rollback'])
+    parser.add_argument('--to', type=int, dest='target', help="target schema version")
+    args = parser.parse_args(argv)
+
+    if args.command == 'apply':
+        done = apply(args.target)
+        print(f"Applied: {done}" if done else "Nothing to apply")
+    elif args.command == 'rollback':
+        done = rollback(args.target)
+        print(f"Reverted: {done}" if done else "Nothing to roll back")
+    current, expected = current_version(), latest_version()
+    print(f"Schema version {current} (latest available {expected})")
+
+if __name__ == '__main__':
+    main()
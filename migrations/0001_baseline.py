@@ -0,0 +1,64 @@
+"""Baseline schema: users, orders and order_items as created by the old create_tables()"""
+
+TABLES = [
+    """CREATE TABLE IF NOT EXISTS users (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        first_name VARCHAR(50) NOT NULL,
+        last_name VARCHAR(50) NOT NULL,
+        username VARCHAR(50) UNIQUE NOT NULL,
+        email VARCHAR(100) UNIQUE NOT NULL,
+        password_hash VARCHAR(255) NOT NULL,
+        is_admin BOOLEAN DEFAULT FALSE,
+        role_version INT NOT NULL DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    )""",
+
+    """CREATE TABLE IF NOT EXISTS orders (
+        order_id INT AUTO_INCREMENT PRIMARY KEY,
+        customer_name VARCHAR(100) NOT NULL,
+        phone_number VARCHAR(15) NOT NULL,
+        customer_address TEXT NOT NULL,
+        total_price DECIMAL(10,2) NOT NULL,
+        order_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        user_id INT NULL,
+        payment_method VARCHAR(20) NOT NULL,
+        order_code VARCHAR(10) UNIQUE,
+        delivery_fee DECIMAL(10,2) DEFAULT 0,
+        status ENUM('pending', 'processing', 'completed', 'cancelled') DEFAULT 'pending',
+        admin_notes TEXT NULL,
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL
+    )""",
+
+    """CREATE TABLE IF NOT EXISTS order_items (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        order_id INT NOT NULL,
+        item_name VARCHAR(50) NOT NULL,
+        quantity INT NOT NULL,
+        item_total DECIMAL(10,2) NOT NULL,
+        notes TEXT NULL,
+        FOREIGN KEY (order_id) REFERENCES orders(order_id) ON DELETE CASCADE
+    )"""
+]
+
+# Columns that databases created before this migration engine may be missing
+LATE_COLUMNS = [
+    ('users', 'is_admin', "BOOLEAN DEFAULT FALSE"),
+    ('users', 'role_version', "INT NOT NULL DEFAULT 0"),
+    ('orders', 'admin_notes', "TEXT NULL"),
+]
+
+def up(cursor):
+    for table_def in TABLES:
+        cursor.execute(table_def)
+    for table, column, definition in LATE_COLUMNS:
+        cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+        """, (table, column))
+        if cursor.fetchone()[0] == 0:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+def down(cursor):
+    for table in ('order_items', 'orders', 'users'):
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
@@ -0,0 +1,16 @@
+"""Composite indexes for the profile history and admin dashboard access paths"""
+
+def up(cursor):
+    # user_profile: WHERE user_id = ? ORDER BY order_date DESC
+    # (also serves the user_id foreign key, replacing its implicit index)
+    cursor.execute("CREATE INDEX idx_orders_user_date ON orders (user_id, order_date)")
+    # admin_dashboard filtered by status, newest first
+    cursor.execute("CREATE INDEX idx_orders_status_date ON orders (status, order_date)")
+    # admin_dashboard unfiltered sort; InnoDB appends order_id, covering the keyset tiebreak
+    cursor.execute("CREATE INDEX idx_orders_date ON orders (order_date)")
+
+def down(cursor):
+    cursor.execute("DROP INDEX idx_orders_date ON orders")
+    cursor.execute("DROP INDEX idx_orders_status_date ON orders")
+    # The foreign key needs some index on user_id, so swap in a plain one
+    cursor.execute("ALTER TABLE orders ADD INDEX idx_orders_user (user_id), DROP INDEX idx_orders_user_date")
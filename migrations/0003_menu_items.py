@@ -0,0 +1,45 @@
+"""Menu catalog table, seeded from the old hardcoded ITEM_PRICES, plus its version counter"""
+
+SEED_ITEMS = [
+    # (name, category, price, description, image, is_available)
+    ("Pasta", "Mains", 120.00, "A delicious pasta dish with rich tomato sauce and fresh herbs.", "pasta.jpg", True),
+    ("Momo", "Mains", 150.00, "Steamed dumplings filled with flavorful meat or vegetables.", "momo.jpg", True),
+    ("Burger", "Mains", 220.00, "Juicy burger with your choice of toppings, served with a side of fries.", "burger.jpg", True),
+    ("Coffee", "Drinks", 120.00, "Freshly brewed coffee to start your day right.", "coffee.jpg", True),
+    ("Tea", "Drinks", 30.00, "A selection of soothing teas to relax and refresh.", "tea.jpg", True),
+    ("Chowmein", "Mains", 180.00, "Flavorful stir-fried noodles with vegetables and your choice of protein.", "chowmein.jpg", True),
+    ("Samosa", "Snacks", 35.00, "Crispy pastry filled with spiced potatoes and peas.", "samosa.jpg", True),
+    # Priced in ITEM_PRICES but never on the menu page; admins can switch them on
+    ("Chi-Momo", "Mains", 160.00, None, None, False),
+    ("Keema Noodles", "Mains", 190.00, None, None, False),
+    ("Laphing", "Snacks", 120.00, None, None, False),
+    ("Corn Dog", "Snacks", 220.00, None, None, False),
+    ("Sauces", "Extras", 330.00, None, None, False),
+]
+
+def up(cursor):
+    cursor.execute("""CREATE TABLE IF NOT EXISTS menu_items (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        name VARCHAR(50) UNIQUE NOT NULL,
+        category VARCHAR(50) NOT NULL,
+        price DECIMAL(10,2) NOT NULL,
+        is_available BOOLEAN NOT NULL DEFAULT TRUE,
+        description VARCHAR(255) NULL,
+        image VARCHAR(100) NULL,
+        sort_order INT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    )""")
+    # Single-row counter; bumped with every catalog change so workers know to reload
+    cursor.execute("""CREATE TABLE IF NOT EXISTS catalog_version (
+        id TINYINT PRIMARY KEY,
+        version INT NOT NULL
+    )""")
+    cursor.executemany("""
+        INSERT IGNORE INTO menu_items (name, category, price, description, image, is_available, sort_order)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    """, [(*item, position) for position, item in enumerate(SEED_ITEMS)])
+    cursor.execute("INSERT IGNORE INTO catalog_version (id, version) VALUES (1, 1)")
+
+def down(cursor):
+    cursor.execute("DROP TABLE IF EXISTS catalog_version")
+    cursor.execute("DROP TABLE IF EXISTS menu_items")
@@ -0,0 +1,10 @@
+"""Blocks of order sequence numbers reserved by workers (see order_codes.py)"""
+
+def up(cursor):
+    cursor.execute("""CREATE TABLE IF NOT EXISTS order_code_blocks (
+        block_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        allocated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""")
+
+def down(cursor):
+    cursor.execute("DROP TABLE IF EXISTS order_code_blocks")
@@ -0,0 +1,7 @@
+"""Per-order version counter, bumped on every change so cached detail pages know they are stale"""
+
+def up(cursor):
+    cursor.execute("ALTER TABLE orders ADD COLUMN version INT NOT NULL DEFAULT 0")
+
+def down(cursor):
+    cursor.execute("ALTER TABLE orders DROP COLUMN version")
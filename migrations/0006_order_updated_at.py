@@ -0,0 +1,11 @@
+"""Last-change time on orders, indexed for the admin dashboard's live feed (see order_feed.py)"""
+
+def up(cursor):
+    cursor.execute("""ALTER TABLE orders
+        ADD COLUMN updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        ADD INDEX idx_orders_updated (updated_at)""")
+    # Existing rows would otherwise all look changed just now
+    cursor.execute("UPDATE orders SET updated_at = order_date")
+
+def down(cursor):
+    cursor.execute("ALTER TABLE orders DROP INDEX idx_orders_updated, DROP COLUMN updated_at")
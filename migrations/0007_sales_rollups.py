@@ -0,0 +1,35 @@
+"""Sales rollups per day, hour and item, maintained incrementally by analytics.py"""
+
+def up(cursor):
+    cursor.execute("""CREATE TABLE IF NOT EXISTS sales_daily (
+        day DATE PRIMARY KEY,
+        orders INT NOT NULL,
+        items INT NOT NULL,
+        revenue DECIMAL(12,2) NOT NULL,
+        delivery_fees DECIMAL(12,2) NOT NULL
+    )""")
+    cursor.execute("""CREATE TABLE IF NOT EXISTS sales_hourly (
+        day DATE NOT NULL,
+        hour TINYINT NOT NULL,
+        orders INT NOT NULL,
+        revenue DECIMAL(12,2) NOT NULL,
+        PRIMARY KEY (day, hour)
+    )""")
+    cursor.execute("""CREATE TABLE IF NOT EXISTS sales_items (
+        day DATE NOT NULL,
+        item_name VARCHAR(50) NOT NULL,
+        quantity INT NOT NULL,
+        revenue DECIMAL(12,2) NOT NULL,
+        PRIMARY KEY (day, item_name)
+    )""")
+    # 'sales': last order folded into the rollups; 'breakdowns': the background job's latest result
+    cursor.execute("""CREATE TABLE IF NOT EXISTS rollup_state (
+        name VARCHAR(50) PRIMARY KEY,
+        last_order_id INT NOT NULL DEFAULT 0,
+        refreshed_at TIMESTAMP NULL,
+        payload MEDIUMTEXT NULL
+    )""")
+
+def down(cursor):
+    for table in ('rollup_state', 'sales_items', 'sales_hourly', 'sales_daily'):
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
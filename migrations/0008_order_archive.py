@@ -0,0 +1,39 @@
+"""Archive tables for finished orders moved out of the hot tables (see order_archive.py)"""
+
+def up(cursor):
+    # Same columns as orders; IDs are kept, so links to archived orders keep working
+    cursor.execute("""CREATE TABLE IF NOT EXISTS orders_archive (
+        order_id INT PRIMARY KEY,
+        customer_name VARCHAR(100) NOT NULL,
+        phone_number VARCHAR(15) NOT NULL,
+        customer_address TEXT NOT NULL,
+        total_price DECIMAL(10,2) NOT NULL,
+        order_date TIMESTAMP NOT NULL,
+        user_id INT NULL,
+        payment_method VARCHAR(20) NOT NULL,
+        order_code VARCHAR(10),
+        delivery_fee DECIMAL(10,2) DEFAULT 0,
+        status ENUM('pending', 'processing', 'completed', 'cancelled') NOT NULL,
+        admin_notes TEXT NULL,
+        version INT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP NULL,
+        archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        INDEX idx_orders_archive_user_date (user_id, order_date),
+        INDEX idx_orders_archive_status_date (status, order_date),
+        INDEX idx_orders_archive_date (order_date),
+        INDEX idx_orders_archive_code (order_code),
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL
+    )""")
+    cursor.execute("""CREATE TABLE IF NOT EXISTS order_items_archive (
+        id INT PRIMARY KEY,
+        order_id INT NOT NULL,
+        item_name VARCHAR(50) NOT NULL,
+        quantity INT NOT NULL,
+        item_total DECIMAL(10,2) NOT NULL,
+        notes TEXT NULL,
+        FOREIGN KEY (order_id) REFERENCES orders_archive(order_id) ON DELETE CASCADE
+    )""")
+
+def down(cursor):
+    cursor.execute("DROP TABLE IF EXISTS order_items_archive")
+    cursor.execute("DROP TABLE IF EXISTS orders_archive")
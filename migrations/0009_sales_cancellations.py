@@ -0,0 +1,66 @@
+"""Keep cancelled orders out of the sales rollups, and record when each order row was inserted.
+
+Rollups so far counted every order as placed. Cancelled orders folded in
+before this migration are moved into the new cancelled_* columns here;
+from now on analytics.py folds them there directly and moves orders across
+when their status changes to or from 'cancelled'. orders.created_at tells
+the rollup job how long ago an order was inserted; updated_at changes with
+every status change and order_date can predate the insert (journaled orders).
+"""
+
+def _cancelled(cursor, watermark: int, query: str):
+    cursor.execute(query.format(orders='orders', items='order_items') + " UNION ALL " +
+                   query.format(orders='orders_archive', items='order_items_archive'),
+                   (watermark, watermark))
+    return cursor.fetchall()
+
+def up(cursor):
+    cursor.execute("""ALTER TABLE orders
+        ADD COLUMN created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP""")
+    # updated_at is ON UPDATE CURRENT_TIMESTAMP; keep it, or every order looks changed just now
+    cursor.execute("UPDATE orders SET created_at = order_date, updated_at = updated_at")
+    cursor.execute("ALTER TABLE orders_archive ADD COLUMN created_at TIMESTAMP NULL")
+    cursor.execute("UPDATE orders_archive SET created_at = order_date")
+    for table in ('sales_daily', 'sales_hourly'):
+        cursor.execute(f"""ALTER TABLE {table}
+            ADD COLUMN cancelled_orders INT NOT NULL DEFAULT 0,
+            ADD COLUMN cancelled_revenue DECIMAL(12,2) NOT NULL DEFAULT 0""")
+
+    cursor.execute("SELECT last_order_id FROM rollup_state WHERE name = 'sales'")
+    row = cursor.fetchone()
+    if not row or not row[0]:
+        return
+    # Take the cancelled orders already rolled up (archived ones included) back out of the sales columns
+    watermark = row[0]
+    for day, hour, orders, revenue, fees in _cancelled(cursor, watermark, """
+            SELECT DATE(order_date), HOUR(order_date), COUNT(*), SUM(total_price), SUM(COALESCE(delivery_fee, 0))
+            FROM {orders}
+            WHERE status = 'cancelled' AND order_id <= %s
+            GROUP BY DATE(order_date), HOUR(order_date)"""):
+        cursor.execute("""UPDATE sales_daily
+            SET orders = orders - %s, revenue = revenue - %s, delivery_fees = delivery_fees - %s,
+                cancelled_orders = cancelled_orders + %s, cancelled_revenue = cancelled_revenue + %s
+            WHERE day = %s""", (orders, revenue, fees, orders, revenue, day))
+        cursor.execute("""UPDATE sales_hourly
+            SET orders = orders - %s, revenue = revenue - %s,
+                cancelled_orders = cancelled_orders + %s, cancelled_revenue = cancelled_revenue + %s
+            WHERE day = %s AND hour = %s""", (orders, revenue, orders, revenue, day, hour))
+    for day, item_name, quantity, revenue in _cancelled(cursor, watermark, """
+            SELECT DATE(o.order_date), i.item_name, SUM(i.quantity), SUM(i.item_total)
+            FROM {orders} o
+            JOIN {items} i ON i.order_id = o.order_id
+            WHERE o.status = 'cancelled' AND o.order_id <= %s
+            GROUP BY DATE(o.order_date), i.item_name"""):
+        cursor.execute("UPDATE sales_daily SET items = items - %s WHERE day = %s", (quantity, day))
+        cursor.execute("""UPDATE sales_items SET quantity = quantity - %s, revenue = revenue - %s
+            WHERE day = %s AND item_name = %s""", (quantity, revenue, day, item_name))
+
+def down(cursor):
+    # Order counts and revenue of cancelled orders go back into the sales columns; their
+    # items and delivery fees are not tracked separately, so those stay excluded
+    for table in ('sales_daily', 'sales_hourly'):
+        cursor.execute(f"""UPDATE {table}
+            SET orders = orders + cancelled_orders, revenue = revenue + cancelled_revenue""")
+        cursor.execute(f"ALTER TABLE {table} DROP COLUMN cancelled_orders, DROP COLUMN cancelled_revenue")
+    cursor.execute("ALTER TABLE orders_archive DROP COLUMN created_at")
+    cursor.execute("ALTER TABLE orders DROP COLUMN created_at")
@@ -0,0 +1,128 @@
+"""Moves finished orders out of the hot tables.
+
+Completed and cancelled orders placed more than ARCHIVE_AFTER_DAYS ago are
+moved with their items from orders/order_items to orders_archive/
+order_items_archive, ARCHIVE_BATCH_SIZE orders per short transaction, with
+a pause of ARCHIVE_PAUSE seconds between batches so the job never holds many
+row locks or competes with the lunch rush. Run it from cron, e.g. nightly:
+
+    python order_archive.py [--days 180] [--batch 500] [--pause 0.5] [--max-batches N] [--dry-run]
+
+The hot tables then hold only open and recent orders, so the pages that read
+them on every request work on a set small enough to stay in the buffer pool.
+Profile and admin pages read the hot tables and show the archive on request
+(?archived=1). Order IDs are kept, so old links still resolve.
+"""
+import argparse
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
+from init_database import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', '180'))
+BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', '500'))
+PAUSE = float(os.getenv('ARCHIVE_PAUSE', '0.5'))
+ARCHIVE_STATUSES = ('completed', 'cancelled')
+
+ORDER_COLUMNS = ('order_id', 'customer_name', 'phone_number', 'customer_address', 'total_price', 'order_date',
+                 'user_id', 'payment_method', 'order_code', 'delivery_fee', 'status', 'admin_notes', 'version',
+                 'updated_at', 'created_at')
+ITEM_COLUMNS = ('id', 'order_id', 'item_name', 'quantity', 'item_total', 'notes')
+
+
+def _pick(cursor, cutoff: datetime, limit: int) -> List[int]:
+    """Lock up to `limit` archivable orders, oldest first"""
+    order_ids: List[int] = []
+    # One range scan of idx_orders_status_date per status, in index order
+    for status in ARCHIVE_STATUSES:
+        if len(order_ids) >= limit:
+            break
+        cursor.execute("""
+            SELECT order_id FROM orders
+            WHERE status = %s AND order_date < %s
+            ORDER BY order_date
+            LIMIT %s
+            FOR UPDATE
+        """, (status, cutoff, limit - len(order_ids)))
+        order_ids.extend(row[0] for row in cursor.fetchall())
+    return order_ids
+
+def archive_batch(cutoff: datetime, batch_size: int = BATCH_SIZE) -> int:
+    """Move one batch of orders placed before `cutoff`; returns how many were moved"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        conn.start_transaction()
+        order_ids = _pick(cursor, cutoff, batch_size)
+        if not order_ids:
+            conn.rollback()
+            return 0
+        in_list = f"({', '.join(['%s'] * len(order_ids))})"
+        cursor.execute(f"""
+            INSERT INTO orders_archive ({', '.join(ORDER_COLUMNS)})
+            SELECT {', '.join(ORDER_COLUMNS)} FROM orders WHERE order_id IN {in_list}
+        """, order_ids)
+        cursor.execute(f"""
+            INSERT INTO order_items_archive ({', '.join(ITEM_COLUMNS)})
+            SELECT {', '.join(ITEM_COLUMNS)} FROM order_items WHERE order_id IN {in_list}
+        """, order_ids)
+        cursor.execute(f"DELETE FROM order_items WHERE order_id IN {in_list}", order_ids)
+        cursor.execute(f"DELETE FROM orders WHERE order_id IN {in_list}", order_ids)
+        conn.commit()
+        return len(order_ids)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+def archive_orders(days: int = AFTER_DAYS, batch_size: int = BATCH_SIZE, pause: float = PAUSE,
+                   max_batches: Optional[int] = None) -> int:
+    """Archive every eligible order, batch by batch; returns how many were moved"""
+    cutoff = datetime.now() - timedelta(days=days)
+    moved = batches = 0
+    while max_batches is None or batches < max_batches:
+        count = archive_batch(cutoff, batch_size)
+        moved += count
+        batches += 1
+        if count < batch_size:
+            break
+        time.sleep(pause)
+    logger.info(f"Archived {moved} orders placed before {cutoff:%Y-%m-%d} in {batches} batch(es)")
+    return moved
+
+def count_archivable(days: int = AFTER_DAYS) -> int:
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT COUNT(*) FROM orders
+            WHERE status IN ({', '.join(['%s'] * len(ARCHIVE_STATUSES))}) AND order_date < %s
+        """, (*ARCHIVE_STATUSES, datetime.now() - timedelta(days=days)))
+        return cursor.fetchone()[0]
+    finally:
+        cursor.close()
+        conn.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Move finished orders older than --days to the archive tables")
+    parser.add_argument('--days', type=int, default=AFTER_DAYS, help="archive orders placed this many days ago")
+    parser.add_argument('--batch', type=int, default=BATCH_SIZE, help="orders per transaction")
+    parser.add_argument('--pause', type=float, default=PAUSE, help="seconds to wait between batches")
+    parser.add_argument('--max-batches', type=int, help="stop after this many batches")
+    parser.add_argument('--dry-run', action='store_true', help="only count what would be archived")
+    args = parser.parse_args(argv)
+
+    if args.dry_run:
+        print(f"{count_archivable(args.days)} orders would be archived")
+        return
+    moved = archive_orders(args.days, args.batch, args.pause, args.max_batches)
+    print(f"Archived {moved} orders")
+
+if __name__ == '__main__':
+    main()
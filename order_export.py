@@ -0,0 +1,169 @@
+"""Streaming export of orders and their items for accounting.
+
+Rows are read through an unbuffered (server-side) cursor in chunks of
+EXPORT_CHUNK_ROWS and written out as they arrive, so memory stays flat
+however long the date range. Each export reads on its own connection
+outside the request pool, and at most EXPORT_MAX_CONCURRENT run per worker,
+so a slow download never starves page requests of connections.
+
+    python order_export.py --from 2025-01-01 --to 2025-12-31 --format csv --gzip -o orders-2025.csv.gz
+
+Formats: csv (one line per order item, order columns repeated) and ndjson
+(one JSON object per order with its items nested). Archived orders (see
+order_archive.py) are included, read together with the current tables in one
+statement so a concurrent archive run cannot make orders go missing.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import threading
+import zlib
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from init_database import get_dedicated_connection
+from order_queries import ARCHIVE_TABLES, HOT_TABLES
+
+CHUNK_ROWS = int(os.getenv('EXPORT_CHUNK_ROWS', '2000'))
+MAX_CONCURRENT = int(os.getenv('EXPORT_MAX_CONCURRENT', '2'))
+FORMATS = ('csv', 'ndjson')
+
+ORDER_COLUMNS = ('order_id', 'order_code', 'order_date', 'customer_name', 'phone_number', 'customer_address',
+                 'user_id', 'payment_method', 'status', 'delivery_fee', 'total_price')
+ITEM_COLUMNS = ('item_name', 'quantity', 'item_total')
+
+_slots = threading.BoundedSemaphore(MAX_CONCURRENT)
+
+
+class ExportBusyError(Exception):
+    """Raised when this worker is already running EXPORT_MAX_CONCURRENT exports"""
+
+
+def acquire_slot() -> None:
+    if not _slots.acquire(blocking=False):
+        raise ExportBusyError(f"{MAX_CONCURRENT} exports are already running")
+
+def release_slot() -> None:
+    _slots.release()
+
+def _union_query() -> str:
+    """Archived and hot orders with their items as one statement, so one read view covers both"""
+    parts = [f"""
+        SELECT {', '.join('o.' + column for column in ORDER_COLUMNS)},
+               {', '.join('i.' + column for column in ITEM_COLUMNS)}, i.id AS item_id
+        FROM {orders_table} o
+        LEFT JOIN {items_table} i ON i.order_id = o.order_id
+        WHERE o.order_date >= %s AND o.order_date < %s
+    """ for orders_table, items_table in (ARCHIVE_TABLES, HOT_TABLES)]
+    return f"""
+        SELECT {', '.join(ORDER_COLUMNS + ITEM_COLUMNS)}
+        FROM ({' UNION ALL '.join(parts)}) AS export
+        ORDER BY order_date, order_id, item_id
+    """
+
+def iter_rows(date_from: date, date_to: date, chunk_rows: int = CHUNK_ROWS) -> Iterator[tuple]:
+    """Order/item rows placed between the two dates (inclusive), archived and hot, oldest first"""
+    start = datetime.combine(date_from, datetime.min.time())
+    end = datetime.combine(date_to + timedelta(days=1), datetime.min.time())
+    conn = get_dedicated_connection()
+    try:
+        # A single statement: orders that order_archive.py moves meanwhile are read exactly once
+        # Unbuffered: the server streams the result instead of the client holding all of it
+        cursor = conn.cursor(buffered=False)
+        cursor.execute(_union_query(), (start, end, start, end))
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                break
+            yield from rows
+        cursor.close()
+    finally:
+        # Also abandons an unread result when the download was cut short
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+def _value(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return value
+
+def _csv_chunks(rows: Iterable[tuple], chunk_rows: int) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(ORDER_COLUMNS + ITEM_COLUMNS)
+    for count, row in enumerate(rows, 1):
+        writer.writerow([_value(value) for value in row])
+        if count % chunk_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def _ndjson_chunks(rows: Iterable[tuple], chunk_rows: int) -> Iterator[str]:
+    lines: List[str] = []
+    order: Optional[Dict[str, Any]] = None
+    width = len(ORDER_COLUMNS)
+    for row in rows:
+        # Rows arrive grouped by order, so one order is held at a time
+        if order is None or order['order_id'] != row[0]:
+            if order is not None:
+                lines.append(json.dumps(order))
+            order = {column: _value(value) for column, value in zip(ORDER_COLUMNS, row[:width])}
+            order['items'] = []
+            if len(lines) >= chunk_rows:
+                yield '\n'.join(lines) + '\n'
+                lines = []
+        if row[width] is not None:
+            order['items'].append({column: _value(value) for column, value in zip(ITEM_COLUMNS, row[width:])})
+    if order is not None:
+        lines.append(json.dumps(order))
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+def export(date_from: date, date_to: date, fmt: str = 'csv', compress: bool = False,
+           chunk_rows: int = CHUNK_ROWS) -> Iterator[bytes]:
+    """The export as a stream of byte chunks, gzip-compressed on the fly if asked"""
+    encode = _csv_chunks if fmt == 'csv' else _ndjson_chunks
+    chunks = (text.encode('utf-8') for text in encode(iter_rows(date_from, date_to, chunk_rows), chunk_rows))
+    if not compress:
+        yield from chunks
+        return
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def filename(date_from: date, date_to: date, fmt: str, compress: bool) -> str:
+    return f"orders-{date_from:%Y%m%d}-{date_to:%Y%m%d}.{fmt}{'.gz' if compress else ''}"
+
+def _parse_date(value: str) -> date:
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export orders and their items for a date range")
+    parser.add_argument('--from', dest='date_from', type=_parse_date, required=True, help="YYYY-MM-DD")
+    parser.add_argument('--to', dest='date_to', type=_parse_date, required=True, help="YYYY-MM-DD, inclusive")
+    parser.add_argument('--format', choices=FORMATS, default='csv')
+    parser.add_argument('--gzip', action='store_true', help="gzip the output")
+    parser.add_argument('-o', '--output', help="file to write (default: stdout)")
+    args = parser.parse_args(argv)
+
+    out = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    try:
+        for chunk in export(args.date_from, args.date_to, args.format, args.gzip):
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+"""Live order changes for the admin dashboard, pushed as Server-Sent Events.
+
+One poller thread per worker reads new and changed orders with a single
+indexed query every ORDER_FEED_INTERVAL seconds and fans the rows out to
+every connected dashboard, so the database cost does not grow with the
+number of open dashboards. The poller only queries while someone listens.
+
+    ORDER_FEED_INTERVAL=2        seconds between polls
+    ORDER_FEED_MAX_CLIENTS=50    open streams per worker; each holds a server thread
+
+Changes are found through orders.updated_at. Each poll looks LOOKBACK past
+the newest change already seen, so rows from transactions that committed
+late are not missed, and remembers which (order, version) it has sent so
+the overlap is not sent twice. When more rows changed than one poll carries
+(a bulk update), dashboards are told to reload instead.
+"""
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Dict, Iterator, Set, Tuple
+from init_database import get_db_connection
+from metrics import register_callback
+from order_queries import fetch_feed_watermark, fetch_order_changes
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = float(os.getenv('ORDER_FEED_INTERVAL', '2'))
+MAX_CLIENTS = int(os.getenv('ORDER_FEED_MAX_CLIENTS', '50'))
+LOOKBACK = timedelta(seconds=5)
+POLL_LIMIT = 1000
+CLIENT_BACKLOG = 200
+HEARTBEAT = 15.0
+
+
+class FeedFullError(Exception):
+    """Raised when this worker already serves MAX_CLIENTS streams"""
+
+
+class Subscription:
+    def __init__(self):
+        self.events = queue.Queue(maxsize=CLIENT_BACKLOG)
+        # Set when the client fell CLIENT_BACKLOG events behind and was cut off
+        self.overflowed = False
+
+
+class OrderFeed:
+    def __init__(self, interval: float = POLL_INTERVAL, max_clients: int = MAX_CLIENTS):
+        self.interval = interval
+        self.max_clients = max_clients
+        self._subscribers: Set[Subscription] = set()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._pid = None
+        self._primed = False
+        self._last_id = 0
+        self._newest = None
+        # order_id -> (version, updated_at) of what was sent inside the lookback window
+        self._sent: Dict[int, Tuple[int, Any]] = {}
+        self.polls = 0
+
+    def subscribe(self) -> Subscription:
+        with self._cond:
+            if len(self._subscribers) >= self.max_clients:
+                raise FeedFullError(f"{len(self._subscribers)} live dashboards already connected")
+            subscription = Subscription()
+            self._subscribers.add(subscription)
+            # A poller inherited across fork is not running in this process
+            if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._primed = False
+                self._thread = threading.Thread(target=self._run, name='order-feed-poller', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._cond:
+            self._subscribers.discard(subscription)
+
+    def clients(self) -> int:
+        return len(self._subscribers)
+
+    def is_alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _broadcast(self, event: Dict[str, Any]) -> None:
+        with self._cond:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.events.put_nowait(event)
+            except queue.Full:
+                subscription.overflowed = True
+                self.unsubscribe(subscription)
+
+    def poll(self) -> int:
+        """Read what changed since the last poll and broadcast it; returns events sent"""
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            primed = self._primed
+            if not primed:
+                # Start from now: changes made while nobody was watching are already on the page
+                self._last_id, self._newest = fetch_feed_watermark(cursor)
+            since = self._newest - LOOKBACK if self._newest else None
+            rows = fetch_order_changes(cursor, self._last_id, since, POLL_LIMIT)
+        finally:
+            cursor.close()
+            conn.close()
+        self.polls += 1
+
+        if not primed:
+            # Remember the lookback window as already sent
+            self._sent = {row['order_id']: (row['version'], row['updated_at']) for row in rows}
+            self._primed = True
+            return 0
+
+        if len(rows) >= POLL_LIMIT:
+            logger.info(f"{len(rows)}+ orders changed in one poll; asking dashboards to reload")
+            self._broadcast({'type': 'resync'})
+            self._primed = False
+            return 1
+
+        sent = 0
+        for row in rows:
+            order_id = row['order_id']
+            seen = self._sent.get(order_id)
+            if seen is None or seen[0] != row['version']:
+                self._broadcast(_event(row, created=order_id > self._last_id and seen is None))
+                sent += 1
+            self._sent[order_id] = (row['version'], row['updated_at'])
+        if rows:
+            self._last_id = max(self._last_id, max(row['order_id'] for row in rows))
+            self._newest = max([row['updated_at'] for row in rows] + ([self._newest] if self._newest else []))
+            horizon = self._newest - LOOKBACK
+            self._sent = {key: value for key, value in self._sent.items() if value[1] >= horizon}
+        return sent
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._subscribers:
+                    self._primed = False
+                    self._cond.wait()
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f"Order feed poll failed: {e}")
+            time.sleep(self.interval)
+
+
+def _event(row: Dict[str, Any], created: bool) -> Dict[str, Any]:
+    return {
+        'type': 'created' if created else 'updated',
+        'order_id': row['order_id'],
+        'order_code': row['order_code'],
+        'customer_name': row['customer_name'],
+        'order_date': row['order_date'].strftime('%Y-%m-%d %H:%M'),
+        'total_price': float(row['total_price']),
+        'payment_method': row['payment_method'],
+        'status': row['status'],
+        'version': row['version'],
+    }
+
+def stream(subscription: Subscription) -> Iterator[str]:
+    """text/event-stream body for one dashboard; unsubscribes when the client goes away"""
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            try:
+                event = subscription.events.get(timeout=HEARTBEAT)
+            except queue.Empty:
+                if subscription.overflowed:
+                    yield "event: resync\ndata: {}\n\n"
+                    return
+                # Also how a closed connection is noticed
+                yield ": keepalive\n\n"
+                continue
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+    finally:
+        feed.unsubscribe(subscription)
+
+feed = OrderFeed()
+
+def _feed_samples():
+    yield 'order_feed_clients', 'gauge', 'Live dashboard streams open in this worker', feed.clients()
+    yield 'order_feed_polls_total', 'counter', 'Change polls run by this worker', feed.polls
+
+register_callback(_feed_samples)
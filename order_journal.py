@@ -0,0 +1,296 @@
+"""Write-behind order ingestion with an append-only journal and group commit.
+
+With ORDER_INGEST=journal, order_details appends each validated order to a
+local journal (one fsync'd line) and shows the customer their order code
+straight away. A background writer drains the journal in batches, storing
+up to ORDER_BATCH_SIZE orders per transaction with multi-row INSERTs, so a
+lunch rush pays one database commit per batch instead of one per order.
+
+    ORDER_INGEST=sync              'journal' enables write-behind
+    ORDER_JOURNAL_DIR=journal      journal location (each worker locks its own slot in it)
+    ORDER_BATCH_SIZE=200           most orders per transaction
+    ORDER_BATCH_WAIT=0.05          seconds to collect more orders after the first
+    ORDER_JOURNAL_FSYNC=1          0 skips fsync on append (faster, loses orders on power loss)
+
+Each worker process takes the first free worker-N slot directory (flock).
+On start it replays every journaled order past the slot's checkpoint, which
+also picks up orders a crashed worker left behind. Replays are harmless:
+save_orders_batch() skips order codes already stored. Orders the database
+keeps rejecting are moved to failed.log in the slot and logged.
+"""
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+from init_database import save_orders_batch
+from metrics import (register_callback, ORDER_BATCH_SIZE, ORDER_BATCH_SECONDS,
+                     ORDER_JOURNAL_FAILED)
+
+logger = logging.getLogger(__name__)
+
+INGEST_MODE = os.getenv('ORDER_INGEST', 'sync')
+JOURNAL_DIR = os.getenv('ORDER_JOURNAL_DIR', 'journal')
+BATCH_SIZE = int(os.getenv('ORDER_BATCH_SIZE', '200'))
+BATCH_WAIT = float(os.getenv('ORDER_BATCH_WAIT', '0.05'))
+FSYNC = os.getenv('ORDER_JOURNAL_FSYNC', '1') != '0'
+
+SEGMENT_BYTES = 16 * 1024 * 1024
+MAX_SLOTS = 64
+
+
+def _rejected(error: Exception) -> bool:
+    """True for errors caused by the data itself (PEP 249 names), as opposed to an outage"""
+    return type(error).__name__ in ('IntegrityError', 'DataError')
+
+
+class OrderJournal:
+    def __init__(self, directory: str, batch_size: int = BATCH_SIZE, batch_wait: float = BATCH_WAIT,
+                 fsync: bool = FSYNC):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.fsync = fsync
+        self.slot_dir: Optional[str] = None
+        self._lock_file = None
+        self._segment = None
+        self._segment_start = 0
+        self._seq = 0
+        self._committed = 0
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.pid: Optional[int] = None
+
+    # --- files -----------------------------------------------------------
+
+    def _claim_slot(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        for n in range(MAX_SLOTS):
+            slot = os.path.join(self.directory, f"worker-{n}")
+            os.makedirs(slot, exist_ok=True)
+            lock_file = open(os.path.join(slot, 'lock'), 'w')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                continue
+            self.slot_dir, self._lock_file = slot, lock_file
+            return
+        raise RuntimeError(f"All {MAX_SLOTS} journal slots in {self.directory} are locked")
+
+    def _segments(self) -> List[str]:
+        names = [n for n in os.listdir(self.slot_dir) if n.startswith('orders-') and n.endswith('.log')]
+        return sorted(names, key=lambda n: int(n[len('orders-'):-len('.log')]))
+
+    def _read_checkpoint(self) -> int:
+        try:
+            with open(os.path.join(self.slot_dir, 'checkpoint')) as f:
+                return int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def _write_checkpoint(self, seq: int) -> None:
+        path = os.path.join(self.slot_dir, 'checkpoint')
+        with open(path + '.tmp', 'w') as f:
+            f.write(str(seq))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+
+    def _replay(self) -> None:
+        self._committed = self._read_checkpoint()
+        self._seq = self._committed
+        for name in self._segments():
+            # A segment's name is its first sequence number, even if every record is gone
+            self._seq = max(self._seq, int(name[len('orders-'):-len('.log')]) - 1)
+            with open(os.path.join(self.slot_dir, name)) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A torn final line from a crash mid-append; it was never acknowledged
+                        logger.warning(f"Skipping unreadable journal line in {name}")
+                        continue
+                    self._seq = max(self._seq, record['seq'])
+                    if record['seq'] > self._committed:
+                        self._pending.append(record)
+        if self._pending:
+            logger.warning(f"Replaying {len(self._pending)} journaled orders from {self.slot_dir}")
+
+    def _open_segment(self) -> None:
+        # Always start a fresh segment, so appends never follow a torn line
+        if self._segment:
+            self._segment.close()
+        self._segment_start = self._seq + 1
+        path = os.path.join(self.slot_dir, f"orders-{self._segment_start}.log")
+        torn = False
+        if os.path.exists(path) and os.path.getsize(path):
+            # Same name as a segment whose only records were torn; end that line first
+            with open(path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                torn = f.read(1) != b'\n'
+        self._segment = open(path, 'a')
+        if torn:
+            self._segment.write('\n')
+
+    def _drop_committed_segments(self) -> None:
+        names = self._segments()
+        current = f"orders-{self._segment_start}.log"
+        for name, following in zip(names, names[1:]):
+            # A segment is done once every record before the next segment is committed
+            if name != current and int(following[len('orders-'):-len('.log')]) - 1 <= self._committed:
+                os.remove(os.path.join(self.slot_dir, name))
+
+    # --- lifecycle -------------------------------------------------------
+
+    def start(self) -> None:
+        self._claim_slot()
+        self._replay()
+        self._open_segment()
+        self._stop.clear()
+        self.pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name='order-journal-writer', daemon=True)
+        self._thread.start()
+        logger.info(f"Order journal writer started in {self.slot_dir}")
+
+    def is_alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Drain what can be written within `timeout`, then stop the writer"""
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def depth(self) -> int:
+        return len(self._pending)
+
+    def oldest_age(self) -> float:
+        with self._cond:
+            return time.time() - self._pending[0]['at'] if self._pending else 0.0
+
+    # --- appending -------------------------------------------------------
+
+    def append(self, order: Dict[str, Any]) -> int:
+        """Durably record one order; returns its journal sequence number"""
+        with self._cond:
+            self._seq += 1
+            record = {'seq': self._seq, 'at': time.time(), 'order': order}
+            self._segment.write(json.dumps(record, separators=(',', ':')) + '\n')
+            self._segment.flush()
+            if self.fsync:
+                os.fsync(self._segment.fileno())
+            if self._segment.tell() >= SEGMENT_BYTES:
+                self._open_segment()
+            self._pending.append(record)
+            self._cond.notify()
+            return record['seq']
+
+    # --- writer ----------------------------------------------------------
+
+    def _next_batch(self) -> List[Dict[str, Any]]:
+        with self._cond:
+            while not self._pending and not self._stop.is_set():
+                self._cond.wait(1.0)
+            if len(self._pending) < self.batch_size and not self._stop.is_set():
+                # Group commit: give a burst a moment to fill the batch
+                deadline = time.monotonic() + self.batch_wait
+                while len(self._pending) < self.batch_size and time.monotonic() < deadline:
+                    self._cond.wait(deadline - time.monotonic())
+            return [self._pending[i] for i in range(min(self.batch_size, len(self._pending)))]
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        started = time.perf_counter()
+        save_orders_batch([record['order'] for record in batch])
+        ORDER_BATCH_SECONDS.observe(time.perf_counter() - started)
+        ORDER_BATCH_SIZE.observe(len(batch))
+
+    def _dead_letter(self, record: Dict[str, Any], error: Exception) -> None:
+        ORDER_JOURNAL_FAILED.inc()
+        logger.error(f"Order {record['order']['order_code']} rejected by the database, "
+                     f"moved to failed.log: {error}")
+        with open(os.path.join(self.slot_dir, 'failed.log'), 'a') as f:
+            f.write(json.dumps({**record, 'error': str(error)}) + '\n')
+
+    def _commit(self, batch: List[Dict[str, Any]]) -> None:
+        with self._cond:
+            for _ in batch:
+                self._pending.popleft()
+            self._committed = batch[-1]['seq']
+        self._write_checkpoint(self._committed)
+        self._drop_committed_segments()
+
+    def _run(self) -> None:
+        failures = 0
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                if self._stop.is_set():
+                    return
+                continue
+            try:
+                try:
+                    self._write(batch)
+                except Exception as e:
+                    if not _rejected(e):
+                        raise
+                    # One bad order must not hold up the rest of the batch
+                    for record in batch:
+                        try:
+                            self._write([record])
+                        except Exception as single_error:
+                            if not _rejected(single_error):
+                                raise
+                            self._dead_letter(record, single_error)
+            except Exception as e:
+                # Database unavailable: keep everything journaled and retry with backoff
+                failures += 1
+                logger.error(f"Writing {len(batch)} journaled orders failed (attempt {failures}): {e}")
+                if self._stop.wait(min(30, 2 ** failures)):
+                    return
+                continue
+            failures = 0
+            self._commit(batch)
+
+_journal: Optional[OrderJournal] = None
+_journal_lock = threading.Lock()
+
+def enabled() -> bool:
+    return INGEST_MODE == 'journal'
+
+def ensure_started() -> Optional[OrderJournal]:
+    """Start (or, after a fork, restart) this process's journal writer"""
+    global _journal
+    if not enabled():
+        return None
+    if _journal is None or _journal.pid != os.getpid():
+        with _journal_lock:
+            if _journal is None or _journal.pid != os.getpid():
+                journal = OrderJournal(JOURNAL_DIR)
+                journal.start()
+                _journal = journal
+    return _journal
+
+def writer_alive() -> bool:
+    """Whether this process's journal writer is running"""
+    return _journal is not None and _journal.pid == os.getpid() and _journal.is_alive()
+
+def submit(order: Dict[str, Any]) -> int:
+    """Journal a validated order (see init_database.save_orders_batch for the shape)"""
+    return ensure_started().append(order)
+
+def _journal_samples():
+    if _journal is None:
+        return
+    yield 'order_journal_depth', 'gauge', 'Journaled orders not yet in the database', _journal.depth()
+    yield 'order_journal_oldest_seconds', 'gauge', 'Age of the oldest unwritten order', _journal.oldest_age()
+    yield 'order_journal_writer_alive', 'gauge', 'Whether the writer thread is running', int(_journal.is_alive())
+
+register_callback(_journal_samples)
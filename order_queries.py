@@ -0,0 +1,344 @@
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List, Tuple
+
+ORDER_STATUSES = ('pending', 'processing', 'completed', 'cancelled')
+PAYMENT_METHODS = ('cash_on_delivery', 'card')
+# Orders still waiting on the kitchen
+OPEN_STATUSES = ('pending', 'processing')
+
+DASHBOARD_PAGE_SIZE = 25
+PROFILE_PAGE_SIZE = 20
+USERS_PAGE_SIZE = 50
+# Counts stop here so a filtered count never walks more than this many index entries
+COUNT_CAP = 1000
+# Most orders one bulk update may touch; keeps the transaction's row locks bounded
+BULK_LIMIT = 1000
+# Orders whose items are read per IN query
+ITEM_BATCH = 1000
+# (orders, order_items) for the hot tables and for the archive (see order_archive.py)
+HOT_TABLES = ('orders', 'order_items')
+ARCHIVE_TABLES = ('orders_archive', 'order_items_archive')
+
+
+class BulkLimitError(Exception):
+    """Raised when a bulk update would touch more than BULK_LIMIT orders"""
+
+def encode_cursor(order_date: datetime, order_id: int) -> str:
+    """Opaque keyset cursor for the (order_date, order_id) sort"""
+    return f"{order_date:%Y%m%d%H%M%S}-{order_id}"
+
+def decode_cursor(value: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    if not value:
+        return None
+    try:
+        stamp, order_id = value.split('-', 1)
+        return datetime.strptime(stamp, '%Y%m%d%H%M%S'), int(order_id)
+    except ValueError:
+        return None
+
+def parse_order_filters(args) -> Dict[str, Any]:
+    """Pick the supported dashboard filters out of request.args, dropping invalid ones"""
+    filters = {}
+    status = args.get('status')
+    if status in ORDER_STATUSES:
+        filters['status'] = status
+    payment_method = args.get('payment_method')
+    if payment_method in PAYMENT_METHODS:
+        filters['payment_method'] = payment_method
+    for key in ('date_from', 'date_to'):
+        value = args.get(key)
+        if value:
+            try:
+                filters[key] = datetime.strptime(value, '%Y-%m-%d')
+            except ValueError:
+                pass
+    return filters
+
+def _order_where(filters: Dict[str, Any]) -> Tuple[List[str], List[Any]]:
+    clauses, params = [], []
+    if 'status' in filters:
+        clauses.append("o.status = %s")
+        params.append(filters['status'])
+    if 'payment_method' in filters:
+        clauses.append("o.payment_method = %s")
+        params.append(filters['payment_method'])
+    if 'date_from' in filters:
+        clauses.append("o.order_date >= %s")
+        params.append(filters['date_from'])
+    if 'date_to' in filters:
+        # date_to is inclusive of the whole day
+        clauses.append("o.order_date < %s")
+        params.append(filters['date_to'] + timedelta(days=1))
+    if 'placed_before' in filters:
+        clauses.append("o.order_date < %s")
+        params.append(filters['placed_before'])
+    return clauses, params
+
+def order_tables(archived: bool = False) -> Tuple[str, str]:
+    return ARCHIVE_TABLES if archived else HOT_TABLES
+
+def fetch_orders_page(cursor, filters: Dict[str, Any], after: Optional[str] = None,
+                      limit: int = DASHBOARD_PAGE_SIZE,
+                      archived: bool = False) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """One page of orders (or archived orders), newest first, plus the cursor for the next page"""
+    clauses, params = _order_where(filters)
+    position = decode_cursor(after)
+    if position:
+        clauses.append("(o.order_date < %s OR (o.order_date = %s AND o.order_id < %s))")
+        params.extend([position[0], position[0], position[1]])
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    cursor.execute(f"""
+        SELECT o.order_id, o.order_code, o.customer_name, o.order_date,
+               o.total_price, o.status, o.payment_method, u.username
+        FROM {order_tables(archived)[0]} o
+        LEFT JOIN users u ON o.user_id = u.id
+        {where}
+        ORDER BY o.order_date DESC, o.order_id DESC
+        LIMIT %s
+    """, (*params, limit + 1))
+    rows = cursor.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last['order_date'], last['order_id'])
+    return rows, next_cursor
+
+def count_orders(cursor, filters: Dict[str, Any], cap: int = COUNT_CAP,
+                 archived: bool = False) -> Tuple[int, bool]:
+    """Count matching orders up to `cap`; returns (count, capped)"""
+    clauses, params = _order_where(filters)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    cursor.execute(f"""
+        SELECT COUNT(*) AS total FROM (
+            SELECT 1 FROM {order_tables(archived)[0]} o {where} LIMIT %s
+        ) AS matched
+    """, (*params, cap + 1))
+    total = cursor.fetchone()['total']
+    return min(total, cap), total > cap
+
+def estimate_table_rows(cursor, table: str) -> int:
+    """Row estimate from table statistics, without scanning the table"""
+    cursor.execute("""
+        SELECT TABLE_ROWS AS estimate FROM information_schema.tables
+        WHERE table_schema = DATABASE() AND table_name = %s
+    """, (table,))
+    row = cursor.fetchone()
+    return (row['estimate'] or 0) if row else 0
+
+def estimate_table_sizes(cursor) -> Dict[str, int]:
+    """Row estimates for every table in the schema, from table statistics"""
+    cursor.execute("""
+        SELECT table_name AS name, TABLE_ROWS AS estimate FROM information_schema.tables
+        WHERE table_schema = DATABASE() ORDER BY table_name
+    """)
+    return {row['name']: row['estimate'] or 0 for row in cursor.fetchall()}
+
+def fetch_users_page(cursor, after_id: Optional[int] = None,
+                     limit: int = USERS_PAGE_SIZE) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+    """One page of users, newest first, keyed on the primary key"""
+    if after_id:
+        cursor.execute("""
+            SELECT id, username, email, created_at, is_admin FROM users
+            WHERE id < %s ORDER BY id DESC LIMIT %s
+        """, (after_id, limit + 1))
+    else:
+        cursor.execute("""
+            SELECT id, username, email, created_at, is_admin FROM users
+            ORDER BY id DESC LIMIT %s
+        """, (limit + 1,))
+    rows = cursor.fetchall()
+    next_id = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_id = rows[-1]['id']
+    return rows, next_id
+
+ORDER_DETAIL_COLUMNS = ('order_id', 'order_code', 'customer_name', 'phone_number', 'customer_address',
+                        'total_price', 'order_date', 'payment_method', 'delivery_fee', 'status',
+                        'admin_notes', 'version')
+
+def _owner_clause(user_id: Optional[int]) -> Tuple[str, Tuple[Any, ...]]:
+    return ("AND o.user_id = %s", (user_id,)) if user_id is not None else ("", ())
+
+def fetch_order_version(cursor, order_id: int, user_id: Optional[int] = None,
+                        archived: bool = False) -> Optional[int]:
+    """The order's version (primary key lookup); None if missing or not owned by `user_id`"""
+    owner, params = _owner_clause(user_id)
+    cursor.execute(f"SELECT o.version FROM {order_tables(archived)[0]} o WHERE o.order_id = %s {owner}",
+                   (order_id, *params))
+    row = cursor.fetchone()
+    return row['version'] if row else None
+
+def fetch_order_detail(cursor, order_id: int, user_id: Optional[int] = None, archived: bool = False
+                       ) -> Optional[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+    """An order, its customer's account and its items in one round trip; restricted to `user_id` when given"""
+    owner, params = _owner_clause(user_id)
+    orders_table, items_table = order_tables(archived)
+    cursor.execute(f"""
+        SELECT {', '.join('o.' + column for column in ORDER_DETAIL_COLUMNS)},
+               u.username, u.email, i.item_name, i.quantity, i.item_total
+        FROM {orders_table} o
+        LEFT JOIN users u ON o.user_id = u.id
+        LEFT JOIN {items_table} i ON i.order_id = o.order_id
+        WHERE o.order_id = %s {owner}
+        ORDER BY i.id
+    """, (order_id, *params))
+    rows = cursor.fetchall()
+    if not rows:
+        return None
+    order = {column: rows[0][column] for column in ORDER_DETAIL_COLUMNS + ('username', 'email')}
+    items = [{'item_name': row['item_name'], 'quantity': row['quantity'], 'item_total': row['item_total']}
+             for row in rows if row['item_name'] is not None]
+    return order, items
+
+def fetch_user_orders_page(cursor, user_id: int, after: Optional[str] = None, limit: int = PROFILE_PAGE_SIZE,
+                           archived: bool = False) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """One page of a customer's order history, newest first, each order with its 'items'.
+
+    Two queries per page: the orders (keyset on idx_orders_user_date) and
+    all of their items in one batch.
+    """
+    params: List[Any] = [user_id]
+    keyset = ""
+    position = decode_cursor(after)
+    if position:
+        keyset = "AND (order_date < %s OR (order_date = %s AND order_id < %s))"
+        params.extend([position[0], position[0], position[1]])
+    cursor.execute(f"""
+        SELECT order_id, order_code, order_date, total_price, status
+        FROM {order_tables(archived)[0]}
+        WHERE user_id = %s {keyset}
+        ORDER BY order_date DESC, order_id DESC
+        LIMIT %s
+    """, (*params, limit + 1))
+    orders = cursor.fetchall()
+
+    next_cursor = None
+    if len(orders) > limit:
+        orders = orders[:limit]
+        last = orders[-1]
+        next_cursor = encode_cursor(last['order_date'], last['order_id'])
+
+    attach_order_items(cursor, orders, archived)
+    return orders, next_cursor
+
+def attach_order_items(cursor, orders: List[Dict[str, Any]], archived: bool = False) -> None:
+    """Set each order's 'items', read in one IN query per ITEM_BATCH orders"""
+    by_id = {order['order_id']: order for order in orders}
+    for order in orders:
+        order['items'] = []
+    order_ids = list(by_id)
+    for start in range(0, len(order_ids), ITEM_BATCH):
+        batch = order_ids[start:start + ITEM_BATCH]
+        cursor.execute(f"""
+            SELECT order_id, item_name, quantity, notes
+            FROM {order_tables(archived)[1]}
+            WHERE order_id IN ({', '.join(['%s'] * len(batch))})
+            ORDER BY id
+        """, tuple(batch))
+        for item in cursor.fetchall():
+            by_id[item['order_id']]['items'].append(item)
+
+def fetch_open_orders(cursor) -> List[Dict[str, Any]]:
+    """Orders the kitchen still has to prepare (OPEN_STATUSES), oldest first, each with its 'items'"""
+    cursor.execute(f"""
+        SELECT order_id, order_code, customer_name, order_date, status
+        FROM orders
+        WHERE status IN ({', '.join(['%s'] * len(OPEN_STATUSES))})
+        ORDER BY order_date, order_id
+    """, OPEN_STATUSES)
+    orders = cursor.fetchall()
+    attach_order_items(cursor, orders)
+    return orders
+
+FEED_COLUMNS = ('order_id', 'order_code', 'customer_name', 'order_date', 'total_price', 'payment_method',
+                'status', 'version', 'updated_at')
+
+def fetch_feed_watermark(cursor) -> Tuple[int, Optional[datetime]]:
+    """Highest order ID and latest change time, each read from the end of its index"""
+    cursor.execute("SELECT order_id FROM orders ORDER BY order_id DESC LIMIT 1")
+    newest = cursor.fetchone()
+    cursor.execute("SELECT updated_at FROM orders ORDER BY updated_at DESC LIMIT 1")
+    changed = cursor.fetchone()
+    return (newest['order_id'] if newest else 0), (changed['updated_at'] if changed else None)
+
+def fetch_order_changes(cursor, after_id: int, changed_since: Optional[datetime],
+                        limit: int) -> List[Dict[str, Any]]:
+    """Orders newer than `after_id` or changed after `changed_since`, oldest change first"""
+    if changed_since is None:
+        cursor.execute(f"""
+            SELECT {', '.join(FEED_COLUMNS)} FROM orders
+            WHERE order_id > %s
+            ORDER BY updated_at, order_id LIMIT %s
+        """, (after_id, limit))
+    else:
+        cursor.execute(f"""
+            SELECT {', '.join(FEED_COLUMNS)} FROM orders
+            WHERE order_id > %s OR updated_at > %s
+            ORDER BY updated_at, order_id LIMIT %s
+        """, (after_id, changed_since, limit))
+    return cursor.fetchall()
+
+def bulk_update_orders(conn, status: str, admin_notes: Optional[str] = None,
+                       order_ids: Optional[List[int]] = None, filters: Optional[Dict[str, Any]] = None,
+                       limit: int = BULK_LIMIT) -> Dict[str, List[Any]]:
+    """Set `status` (and `admin_notes`, unless None) on many orders in one transaction.
+
+    Orders are chosen by `order_ids` or, when that is None, by dashboard
+    `filters` (which may add 'placed_before'). Matching rows are locked, then
+    changed with a single UPDATE that also bumps their version. Returns the
+    codes of 'updated' and 'unchanged' orders, the 'updated_ids' and the
+    'missing' IDs.
+    """
+    from analytics import apply_status_changes  # analytics imports this module
+    cursor = conn.cursor(dictionary=True)
+    try:
+        conn.start_transaction()
+        if order_ids is not None:
+            if not order_ids:
+                conn.rollback()
+                return {'updated': [], 'updated_ids': [], 'unchanged': [], 'missing': []}
+            clauses, params = [f"o.order_id IN ({', '.join(['%s'] * len(order_ids))})"], list(order_ids)
+        else:
+            clauses, params = _order_where(filters or {})
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        cursor.execute(f"""
+            SELECT o.order_id, o.order_code, o.status, o.admin_notes
+            FROM orders o
+            {where}
+            ORDER BY o.order_id
+            LIMIT %s
+            FOR UPDATE
+        """, (*params, limit + 1))
+        rows = cursor.fetchall()
+        if len(rows) > limit:
+            raise BulkLimitError(f"More than {limit} orders match; narrow the selection")
+
+        changing = [row for row in rows
+                    if row['status'] != status or (admin_notes is not None and row['admin_notes'] != admin_notes)]
+        if changing:
+            cursor.execute(f"""
+                UPDATE orders
+                SET status = %s, admin_notes = COALESCE(%s, admin_notes), version = version + 1
+                WHERE order_id IN ({', '.join(['%s'] * len(changing))})
+            """, (status, admin_notes, *[row['order_id'] for row in changing]))
+            # In the same transaction, so the sales rollups never disagree with the orders
+            apply_status_changes(cursor, [(row['order_id'], row['status'], status) for row in changing])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    changed_ids = {row['order_id'] for row in changing}
+    found = {row['order_id'] for row in rows}
+    return {
+        'updated': [row['order_code'] for row in changing],
+        'updated_ids': [row['order_id'] for row in changing],
+        'unchanged': [row['order_code'] for row in rows if row['order_id'] not in changed_ids],
+        'missing': [order_id for order_id in order_ids or () if order_id not in found],
+    }
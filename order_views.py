@@ -0,0 +1,51 @@
+"""Rendered order detail fragments, cached per worker.
+
+Entries are keyed by (view, order ID, version). Every change to an order
+bumps orders.version, so a refresh costs one primary-key lookup of the
+version while the order is unchanged, and the old entry simply stops being
+asked for once it changes. That check also keeps workers from serving each
+other's stale copies. Archived orders (see order_archive.py) are cached
+under their own key and rendered read-only. The page shell (navigation, flashed messages) is
+rendered around the fragment on every request.
+
+    ORDER_DETAIL_CACHE_SIZE=2048   fragments kept per worker
+    ORDER_DETAIL_CACHE_TTL=600     seconds before an unchanged fragment is rebuilt anyway
+"""
+import os
+from typing import Optional
+from flask import render_template
+from markupsafe import Markup
+from cache import TTLCache
+from metrics import ORDER_DETAIL_CACHE
+from order_queries import ORDER_STATUSES, fetch_order_detail, fetch_order_version
+
+FRAGMENTS = {
+    'admin': 'admin/_order_detail_body.html',
+    'customer': '_order_detail_body.html',
+}
+
+_fragments = TTLCache(
+    maxsize=int(os.getenv('ORDER_DETAIL_CACHE_SIZE', '2048')),
+    ttl=float(os.getenv('ORDER_DETAIL_CACHE_TTL', '600'))
+)
+
+def render_order_detail(cursor, view: str, order_id: int, user_id: Optional[int] = None,
+                        archived: bool = False) -> Optional[Markup]:
+    """The order's detail fragment for `view`; None if missing or not owned by `user_id`"""
+    version = fetch_order_version(cursor, order_id, user_id, archived)
+    if version is None:
+        return None
+    html = _fragments.get((view, order_id, version, archived))
+    if html is not None:
+        ORDER_DETAIL_CACHE.inc(view=view, result='hit')
+        return html
+
+    ORDER_DETAIL_CACHE.inc(view=view, result='miss')
+    detail = fetch_order_detail(cursor, order_id, user_id, archived)
+    if detail is None:
+        return None
+    order, items = detail
+    html = Markup(render_template(FRAGMENTS[view], order=order, items=items, statuses=ORDER_STATUSES,
+                                  archived=archived))
+    _fragments.set((view, order_id, order['version'], archived), html)
+    return html
@@ -0,0 +1,143 @@
+"""Password hashing and verification off the request threads.
+
+Hashes are computed in a small process pool so a burst of logins cannot
+saturate the web worker's CPU or starve its other requests. At most
+PASSWORD_HASH_QUEUE operations may be queued or running per web worker;
+beyond that callers get HasherBusyError immediately instead of piling up.
+
+    PASSWORD_HASH_METHOD=pbkdf2:sha256:600000   werkzeug method string; the cost
+                                                 is part of it (default: werkzeug's)
+    PASSWORD_HASH_WORKERS=1                      hashing processes; 0 = hash inline
+    PASSWORD_HASH_QUEUE=32                       queued + running operations allowed
+    PASSWORD_HASH_TIMEOUT=10                     seconds to wait for a result
+
+Hashes made with a different method or cost than the configured one are
+upgraded on the next successful login (see needs_rehash()).
+"""
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+from werkzeug.security import check_password_hash, generate_password_hash
+from metrics import (register_callback, PASSWORD_HASH_DURATION, PASSWORD_HASH_QUEUE_TIME,
+                     PASSWORD_HASH_REJECTED)
+
+logger = logging.getLogger(__name__)
+
+HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD') or None
+WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', '1'))
+QUEUE_LIMIT = int(os.getenv('PASSWORD_HASH_QUEUE', '32'))
+TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', '10'))
+
+
+class HasherBusyError(Exception):
+    """Raised when the hashing queue is full"""
+
+
+def _hash(password: str, method: Optional[str]) -> str:
+    return generate_password_hash(password, method) if method else generate_password_hash(password)
+
+def _run(operation: str, args: tuple):
+    """Executed in a pool process; returns (start timestamp, result)"""
+    started = time.time()
+    if operation == 'hash':
+        return started, _hash(*args)
+    return started, check_password_hash(*args)
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_pid: Optional[int] = None
+_lock = threading.Lock()
+_pending = 0
+_target_prefix: Optional[str] = None
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor, _executor_pid
+    # A pool inherited across fork (e.g. a preloading server) is unusable; make our own
+    if _executor is None or _executor_pid != os.getpid():
+        with _lock:
+            if _executor is None or _executor_pid != os.getpid():
+                # Not fork: by now this process runs logging, feed and journal threads, and a
+                # forked child could inherit one of their locks held. The fork server starts
+                # children from a clean process that has imported only this module.
+                if 'forkserver' in multiprocessing.get_all_start_methods():
+                    context = multiprocessing.get_context('forkserver')
+                    context.set_forkserver_preload([__name__])
+                else:
+                    context = multiprocessing.get_context('spawn')
+                _executor = ProcessPoolExecutor(max_workers=WORKERS, mp_context=context)
+                _executor_pid = os.getpid()
+    return _executor
+
+def _reset_executor(broken: ProcessPoolExecutor) -> None:
+    global _executor
+    with _lock:
+        # Another caller may already have replaced it
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+def _release(future=None) -> None:
+    global _pending
+    with _lock:
+        _pending -= 1
+
+def _submit(operation: str, *args):
+    global _pending
+    with _lock:
+        if _pending >= QUEUE_LIMIT:
+            PASSWORD_HASH_REJECTED.inc(operation=operation)
+            raise HasherBusyError(f"{_pending} password operations already queued")
+        _pending += 1
+    submitted = time.time()
+    if WORKERS <= 0:
+        try:
+            started, result = _run(operation, args)
+        finally:
+            _release()
+    else:
+        executor = _get_executor()
+        try:
+            try:
+                future = executor.submit(_run, operation, args)
+            except BaseException:
+                _release()
+                raise
+            # Counted until the pool is done with it, even if this caller stops waiting
+            future.add_done_callback(_release)
+            started, result = future.result(timeout=TIMEOUT)
+        except FutureTimeoutError:
+            raise HasherBusyError(f"Password {operation} took longer than {TIMEOUT:.0f}s")
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed); the next call gets a fresh pool
+            logger.error("Password hashing pool died; restarting it")
+            _reset_executor(executor)
+            raise HasherBusyError("Password hashing pool restarted")
+    PASSWORD_HASH_QUEUE_TIME.observe(max(0.0, started - submitted), operation=operation)
+    PASSWORD_HASH_DURATION.observe(time.time() - started, operation=operation)
+    return result
+
+def hash_password(password: str) -> str:
+    """Hash with the configured method and cost"""
+    return _submit('hash', password, HASH_METHOD)
+
+def verify_password(password_hash: str, password: str) -> bool:
+    return _submit('verify', password_hash, password)
+
+def needs_rehash(password_hash: str) -> bool:
+    """True when the hash was made with another method or cost than configured"""
+    global _target_prefix
+    if _target_prefix is None:
+        # werkzeug fills in default parameters, so read them back from a real hash
+        _target_prefix = hash_password('').split('$', 1)[0]
+    return password_hash.split('$', 1)[0] != _target_prefix
+
+def _queue_samples():
+    yield 'password_hash_queue_depth', 'gauge', 'Password operations queued or running', _pending
+    yield 'password_hash_queue_limit', 'gauge', 'Configured PASSWORD_HASH_QUEUE', QUEUE_LIMIT
+
+register_callback(_queue_samples)
@@ -0,0 +1,82 @@
+import os
+import time
+import logging
+from typing import Optional, Dict, Any
+from flask import session
+from init_database import get_db_connection
+from user_store import invalidate_user, load_user
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on how long a revoked role can survive in a signed session
+ROLE_RECHECK_SECONDS = float(os.getenv('ROLE_RECHECK_SECONDS', '60'))
+
+def _roles_from_row(user_id: int, row: Dict[str, Any]) -> Dict[str, Any]:
+    roles = ['admin'] if row.get('is_admin') else []
+    return {
+        'user_id': user_id,
+        'roles': roles,
+        'is_admin': 'admin' in roles,
+        'version': row.get('role_version') or 0,
+        'checked_at': time.time()
+    }
+
+def store_roles(user: Dict[str, Any]) -> Dict[str, Any]:
+    """Resolve a user's roles (at login) and carry them in the signed session"""
+    roles = _roles_from_row(user['id'], user)
+    session['roles'] = roles
+    return roles
+
+def clear_roles() -> None:
+    session.pop('roles', None)
+
+def _is_stale(roles: Dict[str, Any], user_id: int) -> bool:
+    if roles.get('user_id') != user_id:
+        return True
+    if time.time() - roles.get('checked_at', 0) > ROLE_RECHECK_SECONDS:
+        return True
+    # The cached user row carries role_version; set_admin() drops it, so this worker sees a change at once
+    user = load_user(user_id)
+    return user is not None and (user.get('role_version') or 0) != roles.get('version', 0)
+
+def current_roles() -> Optional[Dict[str, Any]]:
+    """Session roles for the logged-in user, re-read from the database only when stale"""
+    user_id = session.get('user_id')
+    if not user_id:
+        return None
+    roles = session.get('roles')
+    if roles and not _is_stale(roles, user_id):
+        return roles
+
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("SELECT is_admin, role_version FROM users WHERE id = %s", (user_id,))
+    row = cursor.fetchone()
+    cursor.close()
+    conn.close()
+
+    if not row:
+        clear_roles()
+        return None
+    if roles and roles.get('is_admin') != bool(row['is_admin']):
+        logger.info(f"Roles changed for user {user_id}")
+    return store_roles({'id': user_id, **row})
+
+def has_role(role: str) -> bool:
+    roles = current_roles()
+    return bool(roles and role in roles['roles'])
+
+def set_admin(user_id: int, is_admin: bool) -> bool:
+    """Grant or revoke admin and bump the role version so sessions recheck; False if no such user"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        UPDATE users SET is_admin = %s, role_version = role_version + 1
+        WHERE id = %s
+    """, (is_admin, user_id))
+    found = cursor.rowcount > 0
+    conn.commit()
+    cursor.close()
+    conn.close()
+    invalidate_user(user_id)
+    return found
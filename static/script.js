@@ -1,30 +1,102 @@
 document.addEventListener('DOMContentLoaded', () => {
-    const addToCartButtons = document.querySelectorAll('.add-to-cart');
     const menuForm = document.getElementById('menu-form');
-    const itemsField = document.getElementById('items');
+    if (!menuForm) {
+        return;
+    }
+    const cartUrl = menuForm.dataset.cartUrl;
+    const checkoutUrl = menuForm.dataset.checkoutUrl;
+    const summary = document.getElementById('cart-summary');
+    const timers = {};
+    let pending = Promise.resolve();
 
-    addToCartButtons.forEach(button => {
+    const inputFor = item => menuForm.querySelector(`input[name="${CSS.escape(item)}"]`);
+    const buttonFor = item => menuForm.querySelector(`.add-to-cart[data-item="${CSS.escape(item)}"]`);
+
+    function render(cart) {
+        // The server's cart is authoritative; reflect it back into the inputs
+        menuForm.querySelectorAll('.quantity-input').forEach(input => {
+            const quantity = cart.items[input.name] || 0;
+            if (document.activeElement !== input) {
+                input.value = quantity;
+            }
+            const button = buttonFor(input.name);
+            if (button) {
+                button.textContent = quantity > 0 ? 'Remove' : 'Add to Cart';
+            }
+        });
+        if (summary) {
+            summary.textContent = cart.count > 0
+                ? `${cart.count} item${cart.count === 1 ? '' : 's'} - Nrs-${cart.subtotal.toFixed(2)}`
+                : '';
+        }
+    }
+
+    function send(action, body) {
+        // Chain requests so changes reach the server in the order they were made
+        pending = pending.then(() => fetch(`${cartUrl}/${action}`, {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify(body),
+            credentials: 'same-origin'
+        })).then(response => response.json().then(data => {
+            if (!response.ok) {
+                throw new Error(data.error || 'Could not update your cart.');
+            }
+            render(data);
+        })).catch(error => {
+            if (summary) {
+                summary.textContent = error.message;
+            }
+        });
+        return pending;
+    }
+
+    menuForm.querySelectorAll('.add-to-cart').forEach(button => {
         button.addEventListener('click', () => {
-            const item = button.getAttribute('data-item');
-            const input = document.querySelector(`input[name="${item}"]`);
-            if (input.value == 0) {
-                input.value = 1;
-                button.textContent = 'Remove';
-            } else {
+            const item = button.dataset.item;
+            const input = inputFor(item);
+            if (parseInt(input.value, 10) > 0) {
                 input.value = 0;
                 button.textContent = 'Add to Cart';
+                send('remove', {item});
+            } else {
+                input.value = 1;
+                button.textContent = 'Remove';
+                send('add', {item, quantity: 1});
             }
         });
     });
 
-    menuForm.addEventListener('submit', (event) => {
-        const items = {};
-        document.querySelectorAll('.quantity-input').forEach(input => {
-            const quantity = parseInt(input.value, 10);
-            if (quantity > 0) {
-                items[input.name] = quantity;
+    menuForm.querySelectorAll('.quantity-input').forEach(input => {
+        input.addEventListener('input', () => {
+            // Typing "12" should send one update, not two
+            clearTimeout(timers[input.name]);
+            timers[input.name] = setTimeout(() => {
+                const quantity = parseInt(input.value, 10);
+                if (quantity >= 0) {
+                    send('set', {item: input.name, quantity});
+                }
+            }, 300);
+        });
+    });
+
+    menuForm.addEventListener('submit', event => {
+        // The cart is already on the server; only flush unsent edits
+        event.preventDefault();
+        Object.keys(timers).forEach(name => {
+            clearTimeout(timers[name]);
+            const quantity = parseInt(inputFor(name).value, 10);
+            if (quantity >= 0) {
+                send('set', {item: name, quantity});
             }
+            delete timers[name];
+        });
+        pending.then(() => {
+            window.location.href = checkoutUrl;
         });
-        itemsField.value = JSON.stringify(items);
     });
-});
\ No newline at end of file
+
+    fetch(cartUrl, {credentials: 'same-origin'})
+        .then(response => response.ok ? response.json() : null)
+        .then(cart => cart && render(cart));
+});
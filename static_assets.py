@@ -0,0 +1,76 @@
+import json
+import logging
+import os
+from typing import Optional, Dict, Any
+from flask import request
+from markupsafe import Markup, escape
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'build', 'manifest.json')
+
+# Fingerprinted files never change in place, so browsers may keep them forever
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+_manifest: Optional[Dict[str, Any]] = None
+
+def load_manifest() -> Dict[str, Any]:
+    """Read static/build/manifest.json once per process; empty if assets were not built"""
+    global _manifest
+    if _manifest is None:
+        try:
+            with open(MANIFEST_PATH) as f:
+                _manifest = json.load(f)
+        except FileNotFoundError:
+            logger.info("No image manifest found; serving original images")
+            _manifest = {}
+    return _manifest
+
+def _srcset(variants) -> str:
+    return ', '.join(f"/static/{v['file']} {v['width']}w" for v in variants)
+
+def responsive_image(name: str, alt: str = '', sizes: str = '100vw', **attrs) -> Markup:
+    """<picture> markup with AVIF/WebP sources for a static image, or a plain <img>"""
+    extra = ''.join(f' {key.rstrip("_").replace("_", "-")}="{escape(value)}"'
+                    for key, value in attrs.items())
+    entry = load_manifest().get(name)
+    if not entry:
+        return Markup(f'<img src="/static/{escape(name)}" alt="{escape(alt)}"{extra}>')
+
+    *modern, fallback = entry['sources']
+    parts = ['<picture>']
+    for source in modern:
+        parts.append(f'<source type="{source["type"]}" srcset="{_srcset(source["variants"])}" '
+                     f'sizes="{escape(sizes)}">')
+    fallback_src = fallback['variants'][-1]['file']
+    parts.append(
+        f'<img src="/static/{fallback_src}" srcset="{_srcset(fallback["variants"])}" '
+        f'sizes="{escape(sizes)}" width="{entry["width"]}" height="{entry["height"]}" '
+        f'alt="{escape(alt)}" loading="lazy" decoding="async"{extra}>')
+    parts.append('</picture>')
+    return Markup(''.join(parts))
+
+def image_set(name: str, max_width: Optional[int] = None) -> Markup:
+    """CSS image-set() value for background images, falling back to the original.
+
+    max_width picks the largest variant no wider than it, for use in media queries.
+    """
+    entry = load_manifest().get(name)
+    if not entry:
+        return Markup(f"url('/static/{escape(name)}')")
+    candidates = []
+    for source in entry['sources']:
+        fitting = [v for v in source['variants'] if max_width is None or v['width'] <= max_width]
+        chosen = fitting[-1] if fitting else source['variants'][0]
+        candidates.append(f"url('/static/{chosen['file']}') type('{source['type']}')")
+    return Markup(f"image-set({', '.join(candidates)})")
+
+def init_static_assets(app) -> None:
+    app.add_template_global(responsive_image)
+    app.add_template_global(image_set)
+
+    @app.after_request
+    def cache_fingerprinted_assets(response):
+        if request.path.startswith('/static/build/') and response.status_code == 200:
+            response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        return response
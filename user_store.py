@@ -0,0 +1,58 @@
+import os
+import logging
+from typing import Optional, Dict, Any
+from flask import g, session, has_app_context
+from werkzeug.local import LocalProxy
+from cache import TTLCache
+from init_database import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+# Only what templates render; never pull password_hash into a template context
+USER_COLUMNS = ('id', 'first_name', 'last_name', 'username', 'email', 'created_at', 'is_admin',
+                'role_version')
+
+_user_cache = TTLCache(
+    maxsize=int(os.getenv('USER_CACHE_SIZE', '1024')),
+    ttl=float(os.getenv('USER_CACHE_TTL', '60'))
+)
+
+def load_user(user_id: int) -> Optional[Dict[str, Any]]:
+    """Fetch a user's display columns, served from the shared cache when fresh"""
+    user = _user_cache.get(user_id)
+    if user is not None:
+        return user
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(f"SELECT {', '.join(USER_COLUMNS)} FROM users WHERE id = %s", (user_id,))
+        user = cursor.fetchone()
+        cursor.close()
+        conn.close()
+    except Exception as e:
+        logger.error(f"Error fetching user: {e}")
+        return None
+    if user is not None:
+        _user_cache.set(user_id, user)
+    return user
+
+def get_current_user() -> Optional[Dict[str, Any]]:
+    """The logged-in user, looked up at most once per request"""
+    user_id = session.get('user_id')
+    if not user_id:
+        return None
+    if 'current_user' not in g:
+        g.current_user = load_user(user_id)
+    return g.current_user
+
+def invalidate_user(user_id: int) -> None:
+    """Drop a user's cached row after it changed"""
+    _user_cache.pop(user_id)
+    if not has_app_context():
+        return
+    current = g.get('current_user')
+    if current is not None and current['id'] == user_id:
+        g.pop('current_user')
+
+# Resolved lazily, so templates that never touch `user` never hit the database
+current_user = LocalProxy(get_current_user)